@@ -0,0 +1,744 @@
+import pandas as pd
+import sqlalchemy as sa
+import threading
+from datetime import datetime, timezone
+from sqlalchemy.dialects import postgresql, sqlite
+from loguru import logger as log
+from config import CONFIG
+
+# Engines já criadas neste processo (string de conexão -> engine) e métricas do pool de cada uma
+_engines = {}
+_metricas_pool = {}
+_trava_engines = threading.Lock()
+
+
+def _opcoes_engine(url:sa.engine.URL) -> dict:
+    """
+    Monta as opções do create_engine a partir do CONFIG, de acordo com o banco e o driver da URL
+    """
+    opcoes = {}
+    if url.get_backend_name() != 'sqlite':
+        opcoes.update(pool_size=CONFIG['pool_tamanho'], max_overflow=CONFIG['pool_conexoes_extras'],
+                      pool_pre_ping=CONFIG['pool_pre_ping'])
+
+    if url.get_backend_name() == 'postgresql':
+        if CONFIG['timeout_comando_ms']:
+            opcoes['connect_args'] = {'options': f"-c statement_timeout={int(CONFIG['timeout_comando_ms'])}"}
+        if url.get_driver_name() == 'psycopg2':
+            opcoes['executemany_mode'] = CONFIG['executemany_mode']
+    elif url.get_backend_name() == 'mssql' and url.get_driver_name() == 'pyodbc':
+        opcoes['fast_executemany'] = True
+
+    return opcoes
+
+
+def _registrar_metricas_pool(engine:sa.engine.Engine):
+    """
+    Conta, pelos eventos do pool, as conexões abertas, os checkouts e o máximo de conexões em uso
+    """
+    metricas = {'conexoes_abertas': 0, 'checkouts': 0, 'em_uso': 0, 'maximo_em_uso': 0}
+    trava = threading.Lock()
+
+    @sa.event.listens_for(engine, 'connect')
+    def _conectou(conexao_dbapi, registro):
+        with trava:
+            metricas['conexoes_abertas'] += 1
+
+    @sa.event.listens_for(engine, 'checkout')
+    def _retirou(conexao_dbapi, registro, proxy):
+        with trava:
+            metricas['checkouts'] += 1
+            metricas['em_uso'] += 1
+            metricas['maximo_em_uso'] = max(metricas['maximo_em_uso'], metricas['em_uso'])
+
+    @sa.event.listens_for(engine, 'checkin')
+    def _devolveu(conexao_dbapi, registro):
+        with trava:
+            metricas['em_uso'] -= 1
+
+    _metricas_pool[engine] = metricas
+
+
+def criar_engine(string_conexao:str) -> sa.engine.Engine:
+    """
+    Retorna a engine da string de conexão, criando-a só na primeira chamada do processo
+    O pool (tamanho, conexões extras, pre-ping), o statement_timeout e o modo de executemany
+    vêm do CONFIG; todas as partes do ETL, inclusive workers em threads, compartilham o mesmo pool.
+    """
+    with _trava_engines:
+        engine = _engines.get(string_conexao)
+        if engine is None:
+            engine = sa.create_engine(string_conexao, **_opcoes_engine(sa.engine.make_url(string_conexao)))
+            _registrar_metricas_pool(engine)
+            _engines[string_conexao] = engine
+    return engine
+
+
+def metricas_pool(engine:sa.engine.Engine) -> dict:
+    """
+    Retorna as métricas de uso do pool de uma engine criada por criar_engine
+    (conexões abertas, checkouts, em uso agora e máximo em uso ao mesmo tempo)
+    """
+    metricas = dict(_metricas_pool.get(engine, {}))
+    if isinstance(engine.pool, sa.pool.QueuePool):
+        metricas.update(tamanho_pool=engine.pool.size(), excedentes=max(engine.pool.overflow(), 0))
+    return metricas
+
+# Tabelas de resumo mantidas a partir das agregações de criar_agregacoes:
+# nome da agregação -> (tabela, colunas de agrupamento, colunas somadas)
+TABELAS_AGREGADAS = {
+    'uf_evento': ('agg_uf_evento', ['uf', 'evento', 'categoria'],
+                  ['total_vitima', 'feminino', 'masculino', 'total', 'total_peso']),
+    'temporal': ('agg_temporal', ['ano', 'mes', 'evento', 'categoria'],
+                 ['total_vitima', 'feminino', 'masculino', 'total']),
+    'foco_uf': ('agg_foco_uf', ['uf', 'evento'],
+                ['total_vitima', 'feminino', 'masculino', 'total']),
+    'foco_temporal': ('agg_foco_temporal', ['ano', 'mes', 'evento'],
+                      ['total_vitima', 'feminino', 'masculino', 'total']),
+}
+
+# Colunas de agrupamento numéricas; as demais são texto
+COLUNAS_INTEIRAS = {'ano', 'mes'}
+
+# Medidas com valor absoluto abaixo deste limite são consideradas zeradas (somas de ponto flutuante)
+TOLERANCIA_ZERO = 1e-9
+
+
+def _tabela_agregada(metadata:sa.MetaData, nome:str) -> sa.Table:
+    """
+    Define a tabela de resumo de uma agregação, com as colunas de agrupamento como chave primária
+    """
+    tabela, chaves, medidas = TABELAS_AGREGADAS[nome]
+    colunas = [sa.Column(chave, sa.Integer() if chave in COLUNAS_INTEIRAS else sa.Text(), primary_key=True)
+               for chave in chaves]
+    colunas += [sa.Column(medida, sa.Float(precision=53), nullable=False, server_default='0')
+                for medida in medidas]
+    return sa.Table(tabela, metadata, *colunas, schema='public')
+
+
+def _funcao_insert(conexao):
+    """
+    Retorna o insert com suporte a ON CONFLICT do dialeto da conexão
+    """
+    if conexao.dialect.name == 'postgresql':
+        return postgresql.insert
+    if conexao.dialect.name == 'sqlite':
+        return sqlite.insert
+    raise NotImplementedError(f"Upsert das agregações não suportado para o banco {conexao.dialect.name}")
+
+
+def atualizar_agregacoes(conexao, agregacoes:dict, sinal:int=1):
+    """
+    Soma (ou subtrai, com sinal=-1) os deltas de um lote às tabelas de resumo
+
+    Cada agregação do lote (saída de criar_agregacoes) é aplicada com
+    INSERT ... ON CONFLICT DO UPDATE SET medida = medida + excluded.medida,
+    de forma que só os grupos presentes no lote são tocados e nada é recalculado
+    sobre o histórico da tabela principal. Grupos que diminuíram e ficaram com todas as
+    medidas zeradas são removidos da tabela de resumo.
+
+    Args:
+        conexao: Connection (ou Engine) do SQLAlchemy
+        agregacoes: Dicionário nome -> DataFrame agregado
+        sinal: 1 para somar o lote, -1 para retirá-lo (ex: antes de reprocessar um arquivo)
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return atualizar_agregacoes(transacao, agregacoes, sinal)
+
+    metadata = sa.MetaData()
+    insert = _funcao_insert(conexao)
+
+    for nome, df in agregacoes.items():
+        if nome not in TABELAS_AGREGADAS or df.empty:
+            continue
+
+        _, chaves, medidas = TABELAS_AGREGADAS[nome]
+        tabela = _tabela_agregada(metadata, nome)
+        tabela.create(conexao, checkfirst=True)
+
+        medidas_lote = [medida for medida in medidas if medida in df.columns]
+        deltas = df[chaves + medidas_lote].copy()
+        for medida in medidas_lote:
+            deltas[medida] = deltas[medida].astype('float64') * sinal
+
+        # Tipos do Python para o driver (categorias e inteiros numpy), em uma ordem fixa de chaves:
+        # transações concorrentes bloqueiam os grupos sempre na mesma ordem e não entram em deadlock
+        registros = deltas.astype(object).where(deltas.notna(), None).to_dict('records')
+        registros.sort(key=lambda registro: tuple(str(registro[chave]) for chave in chaves))
+
+        comando = insert(tabela)
+        comando = comando.on_conflict_do_update(
+            index_elements=chaves,
+            set_={medida: tabela.c[medida] + comando.excluded[medida] for medida in medidas_lote}
+        )
+        conexao.execute(comando, registros)
+
+        # Grupos que diminuíram e ficaram zerados em todas as medidas saem da tabela de resumo
+        # (mesma ordem de chaves do upsert, sobre linhas já bloqueadas por esta transação)
+        reduzidos = [registro for registro in registros
+                     if any((registro[medida] or 0) < 0 for medida in medidas_lote)]
+        if reduzidos:
+            condicao = sa.and_(*(tabela.c[chave] == sa.bindparam(f'chave_{chave}') for chave in chaves),
+                               *(sa.func.abs(tabela.c[medida]) < TOLERANCIA_ZERO for medida in medidas))
+            resultado = conexao.execute(sa.delete(tabela).where(condicao),
+                                        [{f'chave_{chave}': registro[chave] for chave in chaves} for registro in reduzidos])
+            if resultado.rowcount:
+                log.info(f"Removidos {resultado.rowcount} grupos zerados da tabela de resumo {tabela.name}")
+
+        log.info(f"Tabela de resumo {tabela.name} atualizada com {len(registros)} grupos")
+
+
+def criar_tabelas_auxiliares(conexao):
+    """
+    Cria as tabelas de resumo e a tabela de controle que ainda não existirem
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return criar_tabelas_auxiliares(transacao)
+
+    metadata = sa.MetaData()
+    for nome in TABELAS_AGREGADAS:
+        _tabela_agregada(metadata, nome)
+    _tabela_controle(metadata)
+    metadata.create_all(conexao, checkfirst=True)
+
+
+def combinar_agregacoes(partes) -> dict:
+    """
+    Soma várias saídas de criar_agregacoes em um único delta por agregação
+
+    Args:
+        partes: Iterável de pares (agregações, sinal), com sinal 1 para somar e -1 para subtrair
+
+    Returns:
+        dict: Nome da agregação -> DataFrame com os grupos e as medidas somadas
+    """
+    por_nome = {}
+    for agregacoes, sinal in partes:
+        for nome, df in agregacoes.items():
+            if nome not in TABELAS_AGREGADAS or df.empty:
+                continue
+            _, chaves, medidas = TABELAS_AGREGADAS[nome]
+            medidas_lote = [medida for medida in medidas if medida in df.columns]
+            delta = df[chaves + medidas_lote].astype({medida: 'float64' for medida in medidas_lote})
+            if sinal != 1:
+                delta[medidas_lote] = delta[medidas_lote] * sinal
+            por_nome.setdefault(nome, []).append(delta)
+
+    combinadas = {}
+    for nome, deltas in por_nome.items():
+        chaves = TABELAS_AGREGADAS[nome][1]
+        # Chaves como texto/objeto: categorias de blocos diferentes não precisam coincidir
+        juntos = pd.concat([delta.astype({chave: object for chave in chaves}) for delta in deltas], ignore_index=True)
+        combinadas[nome] = juntos.groupby(chaves, sort=False).sum().reset_index()
+    return combinadas
+
+
+def limpar_agregacoes(conexao):
+    """
+    Remove as tabelas de resumo (usado quando a tabela principal é recriada do zero)
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return limpar_agregacoes(transacao)
+
+    metadata = sa.MetaData()
+    for nome in TABELAS_AGREGADAS:
+        _tabela_agregada(metadata, nome).drop(conexao, checkfirst=True)
+    log.info("Tabelas de resumo removidas")
+
+
+# Tabela de controle com um registro por arquivo carregado na tabela principal
+TABELA_CONTROLE = 'arquivos_processados'
+
+
+def _tabela_controle(metadata:sa.MetaData) -> sa.Table:
+    """
+    Define a tabela de controle dos arquivos processados (nome do arquivo como chave primária)
+    """
+    return sa.Table(
+        TABELA_CONTROLE, metadata,
+        sa.Column('nome_arquivo', sa.Text(), primary_key=True),
+        sa.Column('hash_arquivo', sa.Text()),
+        sa.Column('linhas', sa.BigInteger()),
+        sa.Column('carregado_em', sa.DateTime(timezone=True)),
+        sa.Column('status', sa.Text(), nullable=False),
+        schema='public'
+    )
+
+
+def controle_existe(conexao) -> bool:
+    """
+    Indica se a tabela de controle já foi criada
+    """
+    return sa.inspect(conexao).has_table(TABELA_CONTROLE, schema='public')
+
+
+def criar_controle_arquivos(conexao):
+    """
+    Cria a tabela de controle, se ainda não existir
+    """
+    _tabela_controle(sa.MetaData()).create(conexao, checkfirst=True)
+
+
+def obter_controle_arquivos(conexao, nome_arquivo:str=None) -> dict:
+    """
+    Lê a tabela de controle (ou apenas o registro de um arquivo, pela chave primária)
+
+    Returns:
+        dict: nome do arquivo -> dicionário com hash_arquivo, linhas, carregado_em e status
+    """
+    tabela = _tabela_controle(sa.MetaData())
+    consulta = sa.select(tabela)
+    if nome_arquivo is not None:
+        consulta = consulta.where(tabela.c.nome_arquivo == nome_arquivo)
+
+    return {registro['nome_arquivo']: registro for registro in
+            (dict(linha) for linha in conexao.execute(consulta).mappings())}
+
+
+def registrar_arquivo(conexao, nome_arquivo:str, status:str, hash_arquivo:str=None, linhas:int=None):
+    """
+    Grava (ou atualiza) o registro de um arquivo na tabela de controle
+
+    Com status 'carregado', registra também o hash, o número de linhas e o horário da carga.
+    Com outro status (ex: 'erro'), só o status muda: o hash e as linhas continuam sendo os
+    da última carga concluída, que é o que continua na tabela principal.
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return registrar_arquivo(transacao, nome_arquivo, status, hash_arquivo, linhas)
+
+    criar_controle_arquivos(conexao)
+    tabela = _tabela_controle(sa.MetaData())
+
+    valores = {'status': status}
+    if status == 'carregado':
+        valores.update(hash_arquivo=hash_arquivo, linhas=linhas,
+                       carregado_em=datetime.now(timezone.utc))
+
+    comando = _funcao_insert(conexao)(tabela).values(nome_arquivo=nome_arquivo, **valores)
+    comando = comando.on_conflict_do_update(index_elements=['nome_arquivo'], set_=valores)
+    conexao.execute(comando)
+
+
+def total_registros_controle(conexao) -> int:
+    """
+    Soma as linhas dos arquivos carregados segundo a tabela de controle
+    Como cada arquivo é registrado na mesma transação em que seus registros são gravados,
+    a soma é o total da tabela principal sem precisar percorrê-la.
+    """
+    tabela = _tabela_controle(sa.MetaData())
+    consulta = sa.select(sa.func.coalesce(sa.func.sum(tabela.c.linhas), 0)).where(tabela.c.status == 'carregado')
+    return int(conexao.execute(consulta).scalar())
+
+
+def estimar_registros(conexao, nome_tabela:str):
+    """
+    Estimativa do número de registros pelas estatísticas do PostgreSQL (pg_class.reltuples),
+    somando as partições quando a tabela é particionada. Não lê a tabela.
+
+    Returns:
+        int: Estimativa, ou None se não houver estatísticas (tabela nunca analisada) ou o banco não for PostgreSQL
+    """
+    if conexao.dialect.name != 'postgresql':
+        return None
+    consulta = sa.text(
+        "SELECT SUM(c.reltuples) FILTER (WHERE c.reltuples >= 0), COUNT(*) FILTER (WHERE c.reltuples < 0) "
+        "FROM pg_class c WHERE c.relkind = 'r' AND (c.oid = to_regclass(:tabela) OR c.oid IN "
+        "(SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:tabela)))"
+    )
+    estimativa, sem_estatisticas = conexao.execute(consulta, {'tabela': f'public."{nome_tabela}"'}).one()
+    if estimativa is None or sem_estatisticas:
+        return None
+    return int(estimativa)
+
+
+def contar_registros(conexao, nome_tabela:str) -> int:
+    """
+    Contagem exata com SELECT COUNT(*) (percorre a tabela inteira; usar só quando pedido)
+    """
+    return int(conexao.execute(sa.text(f'SELECT COUNT(*) FROM public."{nome_tabela}"')).scalar())
+
+
+def limpar_controle_arquivos(conexao):
+    """
+    Remove a tabela de controle (usado quando a tabela principal é recriada do zero)
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return limpar_controle_arquivos(transacao)
+
+    _tabela_controle(sa.MetaData()).drop(conexao, checkfirst=True)
+    log.info("Tabela de controle dos arquivos processados removida")
+
+
+# Tabelas de dimensão (CONFIG['tabelas_dimensao']): UFs e municípios pelo código do IBGE
+TABELA_DIM_UF = 'dim_uf'
+TABELA_DIM_MUNICIPIO = 'dim_municipio'
+
+# Chaves de municípios já gravadas em dim_municipio por este processo, por banco
+_municipios_gravados = {}
+_trava_municipios = threading.Lock()
+
+
+def _tabelas_dimensao(metadata:sa.MetaData) -> tuple:
+    """
+    Define as tabelas de dimensão de UFs e de municípios (chaves inteiras como chave primária)
+    """
+    dim_uf = sa.Table(
+        TABELA_DIM_UF, metadata,
+        sa.Column('codigo_uf', sa.SmallInteger(), primary_key=True, autoincrement=False),
+        sa.Column('uf', sa.Text(), nullable=False, unique=True),
+        sa.Column('nome_estado', sa.Text()),
+        sa.Column('regiao', sa.Text()),
+        schema='public'
+    )
+    dim_municipio = sa.Table(
+        TABELA_DIM_MUNICIPIO, metadata,
+        sa.Column('codigo_municipio', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('codigo_uf', sa.SmallInteger()),
+        sa.Column('municipio', sa.Text(), nullable=False),
+        sa.Column('ibge', sa.Boolean(), nullable=False),
+        schema='public'
+    )
+    return dim_uf, dim_municipio
+
+
+def criar_tabelas_dimensao(conexao, registros_uf:list):
+    """
+    Cria as tabelas de dimensão que ainda não existirem e grava as UFs que faltarem
+
+    Args:
+        registros_uf: Linhas de dim_uf (ver dimensoes.registros_uf)
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return criar_tabelas_dimensao(transacao, registros_uf)
+
+    dim_uf, dim_municipio = _tabelas_dimensao(sa.MetaData())
+    dim_uf.create(conexao, checkfirst=True)
+    dim_municipio.create(conexao, checkfirst=True)
+    if registros_uf:
+        conexao.execute(_funcao_insert(conexao)(dim_uf).on_conflict_do_nothing(index_elements=['codigo_uf']),
+                        registros_uf)
+
+
+def garantir_municipios(engine, registros:list):
+    """
+    Grava em dim_municipio os municípios que ainda não estiverem lá (as linhas já gravadas ficam como estão)
+
+    Como em garantir_particoes, a gravação é feita antes da carga dos registros, em uma transação
+    própria e curta: cargas de arquivos em paralelo não esperam umas pelas outras por causa dos
+    mesmos municípios. As chaves gravadas ficam guardadas no processo e não são enviadas de novo.
+
+    Args:
+        registros: Linhas de dim_municipio (ver dimensoes.registros_municipio)
+    """
+    with _trava_municipios:
+        gravados = _municipios_gravados.setdefault(str(engine.url), set())
+        novos = [registro for registro in registros if registro['codigo_municipio'] not in gravados]
+    if not novos:
+        return
+
+    # Sempre na mesma ordem de chaves, para que transações concorrentes não entrem em deadlock
+    novos.sort(key=lambda registro: registro['codigo_municipio'])
+    _, dim_municipio = _tabelas_dimensao(sa.MetaData())
+    with engine.begin() as conexao:
+        comando = _funcao_insert(conexao)(dim_municipio).on_conflict_do_nothing(index_elements=['codigo_municipio'])
+        conexao.execute(comando, novos)
+
+    with _trava_municipios:
+        gravados.update(registro['codigo_municipio'] for registro in novos)
+    log.info(f"{len(novos)} municípios conferidos na tabela {TABELA_DIM_MUNICIPIO}")
+
+
+def criar_visao_dimensoes(conexao, nome_tabela:str):
+    """
+    Cria a view vw_<tabela> com a tabela principal e os nomes de UF, estado, região e município
+    das dimensões, para consultas que precisam dos textos
+    """
+    juncao = (f'SELECT u.uf, m.municipio, f.*, u.nome_estado, u.regiao FROM public."{nome_tabela}" f '
+              f'LEFT JOIN public.{TABELA_DIM_UF} u ON u.codigo_uf = f.codigo_uf '
+              f'LEFT JOIN public.{TABELA_DIM_MUNICIPIO} m ON m.codigo_municipio = f.codigo_municipio')
+    criar = 'CREATE OR REPLACE VIEW' if conexao.dialect.name == 'postgresql' else 'CREATE VIEW IF NOT EXISTS'
+    conexao.execute(sa.text(f'{criar} public."vw_{nome_tabela}" AS {juncao}'))
+
+
+# Esquema da tabela principal (colunas geradas por transformar_dados, com tipos compactos)
+COLUNAS_TABELA_PRINCIPAL = {
+    'uf': sa.Text(),
+    'municipio': sa.Text(),
+    'evento': sa.Text(),
+    'data_referencia': sa.Date(),
+    'agente': sa.Text(),
+    'arma': sa.Text(),
+    'faixa_etaria': sa.Text(),
+    'feminino': sa.Integer(),
+    'masculino': sa.Integer(),
+    'nao_informado': sa.Integer(),
+    'total_vitima': sa.Integer(),
+    'total': sa.Integer(),
+    'total_peso': sa.Float(precision=53),
+    'nome_arquivo': sa.Text(),
+    'ano': sa.SmallInteger(),
+    'mes': sa.SmallInteger(),
+    'regiao': sa.Text(),
+    'nome_estado': sa.Text(),
+    'categoria': sa.Text(),
+}
+
+# No modo de dimensões, colunas de texto substituídas pelas chaves inteiras das dimensões
+COLUNAS_SUBSTITUIDAS_POR_CHAVES = ('uf', 'municipio', 'regiao', 'nome_estado')
+COLUNAS_CHAVES_DIMENSAO = {
+    'codigo_uf': sa.SmallInteger(),
+    'codigo_municipio': sa.Integer(),
+}
+
+# Colunas indexadas (as que existirem na tabela); o índice de nome_arquivo é mantido durante
+# as cargas, pois é usado para remover os registros de um arquivo reprocessado
+COLUNAS_INDEXADAS = ['uf', 'codigo_uf', 'evento', 'data_referencia', 'nome_arquivo']
+INDICES_MANTIDOS_NA_CARGA = {'nome_arquivo'}
+
+
+def _nome_indice(nome_tabela:str, coluna:str) -> str:
+    """
+    Nome do índice de uma coluna da tabela principal
+    """
+    return f"ix_{nome_tabela}_{coluna}"
+
+
+def colunas_tabela_principal(dimensoes:bool=False) -> dict:
+    """
+    Esquema da tabela principal; com dimensoes=True, as chaves das dimensões no lugar dos textos
+    """
+    if not dimensoes:
+        return COLUNAS_TABELA_PRINCIPAL
+    colunas = {nome: tipo for nome, tipo in COLUNAS_TABELA_PRINCIPAL.items() if nome not in COLUNAS_SUBSTITUIDAS_POR_CHAVES}
+    return {**COLUNAS_CHAVES_DIMENSAO, **colunas}
+
+
+def criar_tabela_principal(conexao, nome_tabela:str, dimensoes:bool=False):
+    """
+    Cria a tabela principal com o esquema de COLUNAS_TABELA_PRINCIPAL e seus índices
+
+    No PostgreSQL a tabela é particionada por ano (PARTITION BY LIST), com uma partição
+    para registros sem data (ano nulo); as partições de cada ano são criadas sob demanda
+    por garantir_particoes. Nos demais bancos é criada uma tabela comum.
+    Com dimensoes=True, UF e município são guardados pelas chaves das tabelas de dimensão
+    (ver colunas_tabela_principal), e a view vw_<tabela> traz os nomes de volta.
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return criar_tabela_principal(transacao, nome_tabela, dimensoes)
+
+    postgres = conexao.dialect.name == 'postgresql'
+    colunas = [sa.Column(nome, tipo) for nome, tipo in colunas_tabela_principal(dimensoes).items()]
+    tabela = sa.Table(nome_tabela, sa.MetaData(), *colunas, schema='public',
+                      **({'postgresql_partition_by': 'LIST (ano)'} if postgres else {}))
+    tabela.create(conexao, checkfirst=True)
+
+    if postgres:
+        # Sem partição DEFAULT: com ela, criar a partição de um ano novo exigiria bloquear
+        # a partição padrão, o que conflita com cargas em andamento em outras conexões
+        conexao.execute(sa.text(f'CREATE TABLE IF NOT EXISTS public."{nome_tabela}_sem_ano" '
+                                f'PARTITION OF public."{nome_tabela}" FOR VALUES IN (NULL)'))
+
+    recriar_indices(conexao, nome_tabela, analisar=False)
+    if dimensoes:
+        criar_tabelas_dimensao(conexao, [])
+        criar_visao_dimensoes(conexao, nome_tabela)
+    log.info(f"Tabela {nome_tabela} criada" + (" com particionamento por ano" if postgres else "")
+             + (" e chaves das tabelas de dimensão" if dimensoes else ""))
+
+
+def tabela_particionada(conexao, nome_tabela:str) -> bool:
+    """
+    Indica se a tabela é particionada (tabelas criadas antes de criar_tabela_principal não são)
+    """
+    if conexao.dialect.name != 'postgresql':
+        return False
+    consulta = sa.text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                       "WHERE c.oid = to_regclass(:tabela)")
+    return conexao.execute(consulta, {'tabela': f'public."{nome_tabela}"'}).first() is not None
+
+
+def garantir_particoes(engine, nome_tabela:str, anos):
+    """
+    Cria as partições dos anos informados que ainda não existirem
+    Deve ser chamada antes de inserir registros desses anos, que de outra forma seriam rejeitados.
+
+    Cada partição é criada como tabela comum e anexada com ATTACH PARTITION, em uma transação
+    própria e curta: o ATTACH não bloqueia as inserções em andamento na tabela principal, de forma
+    que pode ser feito enquanto outras conexões carregam arquivos. Um advisory lock serializa a
+    criação entre processos e threads.
+    """
+    anos = sorted({int(ano) for ano in anos})
+    if not anos:
+        return
+
+    with engine.begin() as conexao:
+        conexao.execute(sa.text("SELECT pg_advisory_xact_lock(hashtext(:tabela))"), {'tabela': nome_tabela})
+        existentes = {nome for (nome,) in conexao.execute(sa.text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:tabela)"), {'tabela': f'public."{nome_tabela}"'})}
+
+        for ano in anos:
+            particao = f"{nome_tabela}_{ano}"
+            if particao in existentes:
+                continue
+            conexao.execute(sa.text(f'CREATE TABLE IF NOT EXISTS public."{particao}" '
+                                    f'(LIKE public."{nome_tabela}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+            conexao.execute(sa.text(f'ALTER TABLE public."{nome_tabela}" ATTACH PARTITION public."{particao}" '
+                                    f'FOR VALUES IN ({ano})'))
+            log.info(f"Partição {particao} criada")
+
+
+def remover_indices_secundarios(conexao, nome_tabela:str):
+    """
+    Remove os índices que não são usados durante a carga, para acelerar inserções em massa
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return remover_indices_secundarios(transacao, nome_tabela)
+
+    for coluna in COLUNAS_INDEXADAS:
+        if coluna not in INDICES_MANTIDOS_NA_CARGA:
+            conexao.execute(sa.text(f'DROP INDEX IF EXISTS public."{_nome_indice(nome_tabela, coluna)}"'))
+    log.info(f"Índices secundários da tabela {nome_tabela} removidos para a carga")
+
+
+def recriar_indices(conexao, nome_tabela:str, analisar:bool=True):
+    """
+    Cria os índices da tabela principal que não existirem (em tabelas particionadas,
+    o índice criado na tabela principal é propagado para todas as partições)
+    e atualiza as estatísticas do planejador depois de uma carga
+    """
+    if isinstance(conexao, sa.engine.Engine):
+        with conexao.begin() as transacao:
+            return recriar_indices(transacao, nome_tabela, analisar)
+
+    colunas_tabela = {col['name'] for col in sa.inspect(conexao).get_columns(nome_tabela, schema='public')}
+    for coluna in COLUNAS_INDEXADAS:
+        if coluna not in colunas_tabela:
+            continue
+        if conexao.dialect.name == 'sqlite':
+            # No SQLite o schema vai no nome do índice, e a tabela fica sem ele
+            comando = (f'CREATE INDEX IF NOT EXISTS public."{_nome_indice(nome_tabela, coluna)}" '
+                       f'ON "{nome_tabela}" ("{coluna}")')
+        else:
+            comando = (f'CREATE INDEX IF NOT EXISTS "{_nome_indice(nome_tabela, coluna)}" '
+                       f'ON public."{nome_tabela}" ("{coluna}")')
+        conexao.execute(sa.text(comando))
+    if analisar:
+        conexao.execute(sa.text(f'ANALYZE public."{nome_tabela}"'))
+        log.info(f"Índices da tabela {nome_tabela} recriados")
+
+
+# Reprocessamento por diferença (CONFIG['modo_reprocessamento'] = 'mesclar'): chave natural dos
+# registros de um arquivo; no modo de dimensões, uf e municipio dão lugar às chaves das dimensões
+CHAVE_NATURAL = ('nome_arquivo', 'uf', 'municipio', 'evento', 'data_referencia', 'agente', 'arma', 'faixa_etaria')
+SUBSTITUTAS_CHAVE_NATURAL = {'uf': 'codigo_uf', 'municipio': 'codigo_municipio'}
+
+
+def _lista_colunas(colunas, prefixo:str='') -> str:
+    """
+    Colunas entre aspas e separadas por vírgula, para montar comandos SQL
+    """
+    return ', '.join(f'{prefixo}"{coluna}"' for coluna in colunas)
+
+
+def chave_natural(colunas_tabela) -> list:
+    """
+    Colunas da CHAVE_NATURAL presentes na tabela, na mesma ordem
+    """
+    chave = []
+    for coluna in CHAVE_NATURAL:
+        if coluna not in colunas_tabela:
+            coluna = SUBSTITUTAS_CHAVE_NATURAL.get(coluna)
+        if coluna in colunas_tabela:
+            chave.append(coluna)
+    return chave
+
+
+def criar_tabela_carga(conexao, nome_tabela:str) -> str:
+    """
+    Cria uma tabela temporária com as colunas da tabela principal, para receber os registros
+    de um arquivo antes da mesclagem (ver mesclar_tabela_carga). Ela é removida no fim da transação.
+
+    Returns:
+        str: Nome da tabela temporária
+    """
+    tabela_carga = f"carga_{nome_tabela}"
+    conexao.execute(sa.text(f'CREATE TEMP TABLE "{tabela_carga}" (LIKE public."{nome_tabela}" INCLUDING DEFAULTS) '
+                            f'ON COMMIT DROP'))
+    return tabela_carga
+
+
+def mesclar_tabela_carga(conexao, nome_tabela:str, tabela_carga:str, nome_arquivo:str) -> tuple:
+    """
+    Aplica à tabela principal só a diferença entre os registros atuais de um arquivo e os da tabela de carga
+
+    Os dois lados são pareados pela chave natural (ver chave_natural). Como a mesma chave pode
+    aparecer mais de uma vez em um arquivo (linhas que só diferem em colunas não carregadas, como
+    'formulario'), a n-ésima ocorrência de cada chave de um lado é pareada com a n-ésima do outro,
+    com as ocorrências ordenadas pelos demais valores. Pares com valores diferentes são atualizados,
+    registros só da carga anterior são removidos e os só da nova, inseridos; os pares iguais não são tocados.
+    Só no PostgreSQL (os registros antigos são localizados pela partição e pelo ctid).
+
+    Returns:
+        tuple: (dicionário com o número de inseridos, atualizados, removidos e inalterados;
+                DataFrame dos registros antigos removidos ou atualizados;
+                DataFrame das versões novas dos registros inseridos ou atualizados)
+    """
+    colunas = [col['name'] for col in sa.inspect(conexao).get_columns(nome_tabela, schema='public')]
+    chave = chave_natural(colunas)
+    valores = [coluna for coluna in colunas if coluna not in chave]
+    diferencas = f"diferencas_{nome_tabela}"
+    parametros = {'arquivo': nome_arquivo}
+
+    # A chave e os valores de cada lado viram texto (ROW(...)::text distingue nulo de vazio),
+    # para que a junção possa ser feita por hash mesmo com colunas nulas
+    ocorrencia = f"row_number() OVER (PARTITION BY {_lista_colunas(chave)} ORDER BY {_lista_colunas(valores)})"
+    conexao.execute(sa.text(
+        f'CREATE TEMP TABLE "{diferencas}" ON COMMIT DROP AS '
+        f'WITH antigos AS ('
+        f'  SELECT tableoid AS particao, ctid AS linha, ROW({_lista_colunas(chave)})::text AS chave_texto, '
+        f'         {ocorrencia} AS ocorrencia, ROW({_lista_colunas(valores)})::text AS valores_texto '
+        f'  FROM public."{nome_tabela}" WHERE nome_arquivo = :arquivo'
+        f'), novos AS ('
+        f'  SELECT {_lista_colunas(colunas)}, ROW({_lista_colunas(chave)})::text AS chave_texto, '
+        f'         {ocorrencia} AS ocorrencia, ROW({_lista_colunas(valores)})::text AS valores_texto '
+        f'  FROM "{tabela_carga}"'
+        f') '
+        f'SELECT a.particao, a.linha, n.ocorrencia IS NOT NULL AS tem_novo, {_lista_colunas(colunas, "n.")} '
+        f'FROM antigos a FULL JOIN novos n ON n.chave_texto = a.chave_texto AND n.ocorrencia = a.ocorrencia '
+        f'WHERE a.linha IS NULL OR n.ocorrencia IS NULL OR n.valores_texto <> a.valores_texto'
+    ), parametros)
+
+    inseridos, atualizados, removidos = conexao.execute(sa.text(
+        f'SELECT COUNT(*) FILTER (WHERE linha IS NULL), COUNT(*) FILTER (WHERE linha IS NOT NULL AND tem_novo), '
+        f'COUNT(*) FILTER (WHERE NOT tem_novo) FROM "{diferencas}"')).one()
+    total_novos = conexao.execute(sa.text(f'SELECT COUNT(*) FROM "{tabela_carga}"')).scalar()
+    contagens = {'inseridos': inseridos, 'atualizados': atualizados, 'removidos': removidos,
+                 'inalterados': total_novos - inseridos - atualizados}
+
+    if not inseridos + atualizados + removidos:
+        return contagens, pd.DataFrame(), pd.DataFrame()
+
+    # Registros antigos que saem (removidos e versões anteriores dos atualizados) e versões novas que entram
+    correspondencia = 'f.tableoid = d.particao AND f.ctid = d.linha'
+    antigos = pd.read_sql(sa.text(f'SELECT f.* FROM public."{nome_tabela}" f JOIN "{diferencas}" d '
+                                  f'ON {correspondencia} WHERE f.nome_arquivo = :arquivo'), conexao, params=parametros)
+    novos = pd.read_sql(sa.text(f'SELECT {_lista_colunas(colunas)} FROM "{diferencas}" WHERE tem_novo'), conexao)
+
+    conexao.execute(sa.text(f'DELETE FROM public."{nome_tabela}" f USING "{diferencas}" d '
+                            f'WHERE f.nome_arquivo = :arquivo AND {correspondencia} AND NOT d.tem_novo'), parametros)
+    atribuicoes = ', '.join(f'"{coluna}" = d."{coluna}"' for coluna in valores)
+    conexao.execute(sa.text(f'UPDATE public."{nome_tabela}" f SET {atribuicoes} FROM "{diferencas}" d '
+                            f'WHERE f.nome_arquivo = :arquivo AND {correspondencia} AND d.tem_novo'), parametros)
+    conexao.execute(sa.text(f'INSERT INTO public."{nome_tabela}" ({_lista_colunas(colunas)}) '
+                            f'SELECT {_lista_colunas(colunas)} FROM "{diferencas}" WHERE linha IS NULL'))
+
+    return contagens, antigos, novos
@@ -0,0 +1,338 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime, timezone
+import pandas as pd
+import sqlalchemy as sa
+from openpyxl import Workbook
+from loguru import logger as log
+from config import CONFIG
+from log import pico_memoria_mb
+from banco import criar_engine
+import etl
+
+# Colunas das planilhas bancovde publicadas, na ordem em que aparecem no cabeçalho
+COLUNAS_PLANILHA = ['uf', 'municipio', 'evento', 'data_referencia', 'agente', 'arma', 'faixa_etaria',
+                    'feminino', 'masculino', 'nao_informado', 'total_vitima', 'total', 'total_peso', 'formulario']
+
+# Etapas medidas, na ordem do pipeline
+ETAPAS = ['extrair_dados', 'transformar_datas', 'ajustar_colunas', 'categorizar_eventos',
+          'criar_agregacoes', 'salvar_no_banco']
+
+# Tabela usada pela etapa salvar_no_banco (substituída a cada repetição e removida no final)
+TABELA_BENCHMARK = 'benchmark_dados_seguranca_publica'
+
+ARQUIVO_BASELINE = 'benchmark_baseline.json'
+
+# Valores das colunas descritivas, no formato das planilhas (com as variações de caixa das originais)
+AGENTES = ['Civil', 'Militar', 'Penal', None]
+ARMAS = ['Arma de fogo', 'Arma branca', 'Outros', None]
+FAIXAS_ETARIAS = ['0 a 11 anos', '12 a 17 anos', '18 a 24 anos', '25 a 29 anos', '30 a 64 anos', '65 anos ou mais', None]
+FORMULARIOS = ['Formulário 1', 'Formulário 2']
+
+
+def mistura_padrao_eventos(fracao_eventos_novos:float=0.02) -> dict:
+    """
+    Pesos dos eventos: todos os eventos conhecidos com o mesmo peso e uma fração de eventos
+    que não estão em CATEGORIAS_EVENTOS (vão para 'Não Classificado')
+    """
+    eventos = [evento for lista in etl.CATEGORIAS_EVENTOS.values() for evento in lista]
+    peso = (1 - fracao_eventos_novos) / len(eventos)
+    mistura = {evento: peso for evento in eventos}
+    if fracao_eventos_novos > 0:
+        novos = [f"Evento novo {i}" for i in range(1, 4)]
+        mistura.update({evento: fracao_eventos_novos / len(novos) for evento in novos})
+    return mistura
+
+
+def gerar_planilha(caminho:str, linhas:int, ano:int, ufs:list, municipios_por_uf:int, mistura_eventos:dict,
+                   semente:int=0):
+    """
+    Gera uma planilha sintética no formato das bancovde do Sinesp VDE
+    (mesmo cabeçalho, datas como data do Excel, números inteiros e contagens com nulos)
+    """
+    aleatorio = random.Random(f"{semente}-{ano}")
+    eventos = list(mistura_eventos)
+    pesos = list(mistura_eventos.values())
+
+    # Municípios por UF, metade em minúsculas como em algumas planilhas originais
+    municipios = {uf: [f"município {uf} {i}" if i % 2 else f"MUNICÍPIO {uf} {i}" for i in range(1, municipios_por_uf + 1)]
+                  for uf in ufs}
+
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet('Sheet1')
+    aba.append(COLUNAS_PLANILHA)
+
+    for evento in aleatorio.choices(eventos, weights=pesos, k=linhas):
+        uf = aleatorio.choice(ufs)
+        feminino = aleatorio.randint(0, 5)
+        masculino = aleatorio.randint(0, 5)
+        aba.append([
+            uf if aleatorio.random() < 0.9 else uf.lower(),
+            aleatorio.choice(municipios[uf]),
+            evento,
+            datetime(ano, aleatorio.randint(1, 12), 1),
+            aleatorio.choice(AGENTES),
+            aleatorio.choice(ARMAS),
+            aleatorio.choice(FAIXAS_ETARIAS),
+            feminino,
+            masculino,
+            aleatorio.choice([0, 0, 1, None]),
+            feminino + masculino,
+            aleatorio.randint(0, 20),
+            round(aleatorio.random() * 5, 3) if aleatorio.random() < 0.2 else None,
+            aleatorio.choice(FORMULARIOS),
+        ])
+
+    planilha.save(caminho)
+
+
+def gerar_planilhas(pasta:str, linhas:int, anos:list, ufs:list, municipios_por_uf:int, mistura_eventos:dict,
+                    semente:int=0) -> list:
+    """
+    Gera uma planilha bancovde-<ano>.xlsx por ano, dividindo as linhas entre os anos
+    Se a pasta já tem as planilhas geradas com os mesmos parâmetros, elas são reaproveitadas.
+
+    Returns:
+        list: Caminhos das planilhas
+    """
+    os.makedirs(pasta, exist_ok=True)
+    parametros = {'linhas': linhas, 'anos': anos, 'ufs': ufs, 'municipios_por_uf': municipios_por_uf,
+                  'mistura_eventos': mistura_eventos, 'semente': semente}
+    caminho_parametros = os.path.join(pasta, 'parametros_benchmark.json')
+    caminhos = [os.path.join(pasta, f"bancovde-{ano}.xlsx") for ano in anos]
+
+    if os.path.exists(caminho_parametros) and all(os.path.exists(caminho) for caminho in caminhos):
+        with open(caminho_parametros, encoding='utf-8') as arquivo:
+            if json.load(arquivo) == parametros:
+                log.info(f"Reaproveitando as planilhas sintéticas de {pasta}")
+                return caminhos
+
+    linhas_por_ano = [linhas // len(anos) + (1 if i < linhas % len(anos) else 0) for i in range(len(anos))]
+    for caminho, ano, linhas_ano in zip(caminhos, anos, linhas_por_ano):
+        inicio = time.perf_counter()
+        gerar_planilha(caminho, linhas_ano, ano, ufs, municipios_por_uf, mistura_eventos, semente)
+        log.info(f"Planilha {os.path.basename(caminho)} gerada: {linhas_ano} linhas em {time.perf_counter() - inicio:.1f}s")
+
+    with open(caminho_parametros, 'w', encoding='utf-8') as arquivo:
+        json.dump(parametros, arquivo, ensure_ascii=False, indent=2)
+    return caminhos
+
+
+def _engine_sqlite(caminho:str) -> sa.engine.Engine:
+    """
+    Engine SQLite para a etapa salvar_no_banco
+    O ETL grava sempre no schema 'public'; no SQLite o arquivo é anexado com esse nome
+    a um banco principal em memória.
+    """
+    engine = criar_engine("sqlite://")
+
+    @sa.event.listens_for(engine, 'connect')
+    def _anexar_public(conexao_dbapi, registro):
+        conexao_dbapi.execute(f"ATTACH DATABASE '{caminho}' AS public")
+
+    return engine
+
+
+def _medir(funcao, repeticoes:int) -> tuple:
+    """
+    Executa a função o número de repetições pedido
+
+    Returns:
+        tuple: (tempos de cada repetição em segundos, resultado da última execução)
+    """
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, resultado
+
+
+def executar_benchmark(pasta:str, engine, repeticoes:int=3, metodo_carga:str='copy', usar_cache:bool=False) -> dict:
+    """
+    Mede separadamente cada etapa do ETL sobre as planilhas da pasta
+
+    Cada etapa recebe o resultado da anterior, como no pipeline, e é repetida 'repeticoes'
+    vezes sobre a mesma entrada. O cache Parquet fica desligado, a não ser que usar_cache
+    seja True (nesse caso a primeira leitura, que preenche o cache, não é medida).
+
+    Returns:
+        dict: Resultado com, por etapa, o melhor tempo, a mediana, as linhas e a vazão
+    """
+    usar_cache_original = CONFIG['usar_cache']
+    CONFIG['usar_cache'] = usar_cache
+    try:
+        if usar_cache:
+            etl.extrair_dados(pasta)
+
+        dados = None
+        etapas = {}
+        passos = {
+            'extrair_dados': lambda: etl.extrair_dados(pasta),
+            'transformar_datas': lambda: etl.transformar_datas(dados),
+            'ajustar_colunas': lambda: etl.ajustar_colunas(dados),
+            'categorizar_eventos': lambda: etl.categorizar_eventos(dados),
+            'criar_agregacoes': lambda: etl.criar_agregacoes(dados),
+            'salvar_no_banco': lambda: etl.salvar_no_banco(dados, TABELA_BENCHMARK, engine, 'replace', metodo_carga),
+        }
+
+        for etapa in ETAPAS:
+            linhas = 0 if dados is None else len(dados)
+            tempos, resultado = _medir(passos[etapa], repeticoes)
+            if etapa == 'extrair_dados':
+                linhas = len(resultado)
+            if etapa == 'salvar_no_banco' and not resultado:
+                raise RuntimeError(f"Falha ao salvar os dados na tabela {TABELA_BENCHMARK}")
+
+            mediana = statistics.median(tempos)
+            etapas[etapa] = {
+                'melhor_s': round(min(tempos), 4),
+                'mediana_s': round(mediana, 4),
+                'tempos_s': [round(tempo, 4) for tempo in tempos],
+                'linhas': linhas,
+                'linhas_por_s': round(linhas / mediana, 1) if mediana else None,
+                'pico_rss_mb': pico_memoria_mb(),
+            }
+            log.info(f"{etapa}: mediana {mediana:.3f}s, melhor {min(tempos):.3f}s ({linhas} linhas)")
+
+            # As transformações alimentam a etapa seguinte; agregações e carga não alteram os dados
+            if etapa not in ('criar_agregacoes', 'salvar_no_banco'):
+                dados = resultado
+    finally:
+        CONFIG['usar_cache'] = usar_cache_original
+        with engine.begin() as conexao:
+            conexao.execute(sa.text(f'DROP TABLE IF EXISTS public."{TABELA_BENCHMARK}"'))
+
+    return {
+        'data': datetime.now(timezone.utc).isoformat(),
+        'ambiente': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'sqlalchemy': sa.__version__,
+            'plataforma': platform.platform(),
+            'banco': engine.dialect.name,
+            'metodo_carga': metodo_carga,
+            'usar_cache': usar_cache,
+        },
+        'repeticoes': repeticoes,
+        'etapas': etapas,
+    }
+
+
+def comparar_com_baseline(resultado:dict, baseline:dict, tolerancia:float=0.10) -> list:
+    """
+    Compara a mediana de cada etapa com a da baseline e mostra a variação
+
+    Returns:
+        list: Etapas que ficaram mais lentas que a baseline além da tolerância (fração, 0.10 = 10%)
+    """
+    if baseline.get('parametros') != resultado.get('parametros'):
+        log.warning("A baseline foi gerada com outros parâmetros de planilha; a comparação é apenas indicativa")
+    if baseline.get('ambiente') != resultado.get('ambiente'):
+        log.warning(f"Ambiente diferente do da baseline: {baseline.get('ambiente')}")
+
+    regressoes = []
+    print(f"\n{'etapa':<22}{'baseline (s)':>14}{'atual (s)':>12}{'variação':>11}")
+    for etapa, valores in resultado['etapas'].items():
+        anterior = baseline.get('etapas', {}).get(etapa)
+        if not anterior or not anterior['mediana_s']:
+            print(f"{etapa:<22}{'-':>14}{valores['mediana_s']:>12.4f}{'-':>11}")
+            continue
+
+        variacao = valores['mediana_s'] / anterior['mediana_s'] - 1
+        marcador = ''
+        if variacao > tolerancia:
+            regressoes.append(etapa)
+            marcador = '  <- mais lenta'
+        print(f"{etapa:<22}{anterior['mediana_s']:>14.4f}{valores['mediana_s']:>12.4f}{variacao:>+10.1%}{marcador}")
+    print()
+    return regressoes
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do ETL com planilhas sintéticas do Sinesp VDE")
+    parser.add_argument('--linhas', type=int, default=100000, help="Total de linhas, divididas entre os anos")
+    parser.add_argument('--anos', type=int, nargs='+', default=[2022, 2023, 2024], help="Um arquivo por ano")
+    parser.add_argument('--ufs', nargs='+', default=sorted(etl.MAPA_ESTADOS), help="UFs sorteadas nas linhas")
+    parser.add_argument('--municipios-por-uf', type=int, default=50)
+    parser.add_argument('--fracao-eventos-novos', type=float, default=0.02,
+                        help="Fração de linhas com eventos fora de CATEGORIAS_EVENTOS")
+    parser.add_argument('--mistura-eventos', help="JSON {evento: peso} que substitui a mistura padrão de eventos")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--pasta', help="Pasta das planilhas geradas (padrão: pasta temporária)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--banco', choices=['sqlite', 'postgres'], default='sqlite',
+                        help="sqlite usa um arquivo temporário; postgres usa a conexão do CONFIG")
+    parser.add_argument('--metodo-carga', choices=['copy', 'insert'], default=CONFIG['metodo_carga'])
+    parser.add_argument('--usar-cache', action='store_true', help="Medir a extração lendo do cache Parquet")
+    parser.add_argument('--baseline', default=ARQUIVO_BASELINE, help="Arquivo JSON da baseline")
+    parser.add_argument('--salvar-baseline', action='store_true', help="Gravar o resultado como nova baseline")
+    parser.add_argument('--saida', help="Gravar também o resultado desta execução neste arquivo JSON")
+    parser.add_argument('--tolerancia', type=float, default=0.10,
+                        help="Variação acima da qual uma etapa é considerada mais lenta (0.10 = 10%%)")
+    parser.add_argument('--log-detalhado', action='store_true', help="Mostrar o log das funções do ETL")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    argumentos = _argumentos()
+
+    # O log de cada chamada das funções do ETL atrapalha a leitura (e a medição): desligado para
+    # todos os módulos (etl, banco, leitores, esquema...), menos as mensagens do próprio benchmark
+    if not argumentos.log_detalhado:
+        log.disable('')
+        log.enable(__name__)
+
+    if argumentos.mistura_eventos:
+        mistura_eventos = json.loads(argumentos.mistura_eventos)
+    else:
+        mistura_eventos = mistura_padrao_eventos(argumentos.fracao_eventos_novos)
+
+    with tempfile.TemporaryDirectory(prefix='benchmark_sinesp_') as pasta_temporaria:
+        pasta = argumentos.pasta or pasta_temporaria
+        gerar_planilhas(pasta, argumentos.linhas, argumentos.anos, argumentos.ufs,
+                        argumentos.municipios_por_uf, mistura_eventos, argumentos.semente)
+
+        if argumentos.banco == 'sqlite':
+            engine = _engine_sqlite(os.path.join(pasta_temporaria, 'benchmark.db'))
+        else:
+            engine = etl.criar_conexao_bd(CONFIG['tipo_bd'], CONFIG['usuario'], CONFIG['senha'],
+                                          CONFIG['host'], CONFIG['porta'], CONFIG['nome_bd'])
+
+        resultado = executar_benchmark(pasta, engine, argumentos.repeticoes,
+                                       argumentos.metodo_carga, argumentos.usar_cache)
+        engine.dispose()
+
+    resultado['parametros'] = {
+        'linhas': argumentos.linhas, 'anos': argumentos.anos, 'ufs': argumentos.ufs,
+        'municipios_por_uf': argumentos.municipios_por_uf, 'mistura_eventos': mistura_eventos,
+        'semente': argumentos.semente,
+    }
+
+    regressoes = []
+    if os.path.exists(argumentos.baseline) and not argumentos.salvar_baseline:
+        with open(argumentos.baseline, encoding='utf-8') as arquivo:
+            regressoes = comparar_com_baseline(resultado, json.load(arquivo), argumentos.tolerancia)
+    else:
+        print(f"\n{'etapa':<22}{'mediana (s)':>12}{'melhor (s)':>12}{'linhas/s':>14}")
+        for etapa, valores in resultado['etapas'].items():
+            print(f"{etapa:<22}{valores['mediana_s']:>12.4f}{valores['melhor_s']:>12.4f}{valores['linhas_por_s'] or 0:>14.1f}")
+        print()
+
+    for caminho in (argumentos.saida, argumentos.baseline if argumentos.salvar_baseline else None):
+        if caminho:
+            with open(caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+            print(f"Resultado gravado em {caminho}")
+
+    if regressoes:
+        print(f"Etapas mais lentas que a baseline: {', '.join(regressoes)}")
+    sys.exit(1 if regressoes else 0)
@@ -0,0 +1,202 @@
+import os
+import glob
+import importlib.util
+import pandas as pd
+from loguru import logger as log
+from config import CONFIG
+from esquema import ASSINATURA_ESQUEMA
+from verificacao_rapida import calcular_hash_arquivo
+
+# Versão dos leitores (ver leitores.py): incrementar sempre que a forma de ler os arquivos mudar,
+# para que as entradas antigas do cache deixem de ser usadas
+# (mudanças no registro do esquema já mudam a chave, pela ASSINATURA_ESQUEMA)
+VERSAO_LEITOR = 2
+
+PYARROW_DISPONIVEL = importlib.util.find_spec('pyarrow') is not None
+
+
+def cache_habilitado() -> bool:
+    """
+    Indica se o cache Parquet deve ser usado (configuração ligada e pyarrow instalado)
+    """
+    if not CONFIG['usar_cache']:
+        return False
+    if not PYARROW_DISPONIVEL:
+        log.warning("pyarrow não está instalado. Cache Parquet desativado.")
+        return False
+    return True
+
+
+def pasta_do_cache(pasta_dados:str) -> str:
+    """
+    Retorna a pasta do cache, que fica dentro da pasta de dados
+    """
+    return os.path.join(pasta_dados, '.cache')
+
+
+def _caminho_no_cache(pasta_cache:str, nome_arquivo:str, hash_arquivo:str) -> str:
+    """
+    Monta o caminho da entrada do cache: nome do arquivo + hash do conteúdo + versão do leitor
+    e do registro do esquema (o plano de leitura define as colunas gravadas)
+    """
+    return os.path.join(pasta_cache, f"{nome_arquivo}.{hash_arquivo[:16]}.v{VERSAO_LEITOR}-{ASSINATURA_ESQUEMA}.parquet")
+
+
+def _remover(caminho:str):
+    """
+    Remove um arquivo ignorando o caso de ele já ter sido removido por outro processo
+    """
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+def _remover_entradas_antigas(pasta_cache:str, nome_arquivo:str, caminho_atual:str):
+    """
+    Remove as entradas do mesmo arquivo com outro hash ou outra versão do leitor
+    """
+    for caminho in glob.glob(os.path.join(pasta_cache, f"{glob.escape(nome_arquivo)}.*.parquet")):
+        if caminho != caminho_atual:
+            log.info(f"Removendo entrada desatualizada do cache: {os.path.basename(caminho)}")
+            _remover(caminho)
+
+
+def limitar_tamanho_cache(pasta_cache:str, tamanho_maximo_mb:float=None):
+    """
+    Remove as entradas usadas há mais tempo até o cache ficar abaixo do tamanho máximo
+    """
+    if tamanho_maximo_mb is None:
+        tamanho_maximo_mb = CONFIG['cache_tamanho_maximo_mb']
+
+    entradas = []
+    for caminho in glob.glob(os.path.join(pasta_cache, '*.parquet')):
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            continue
+        entradas.append((info.st_mtime, info.st_size, caminho))
+
+    tamanho_total = sum(tamanho for _, tamanho, _ in entradas)
+    limite = tamanho_maximo_mb * 1024 * 1024
+
+    # As mais antigas primeiro (o mtime é atualizado a cada leitura)
+    for _, tamanho, caminho in sorted(entradas):
+        if tamanho_total <= limite:
+            break
+        log.info(f"Cache acima de {tamanho_maximo_mb} MB. Removendo {os.path.basename(caminho)}")
+        _remover(caminho)
+        tamanho_total -= tamanho
+
+
+def _registrar_uso(caminho:str):
+    """
+    Atualiza o mtime da entrada, usado como critério de uso recente na limpeza do cache
+    """
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+
+
+def ler_com_cache(arquivo:str, leitor, pasta_cache:str) -> pd.DataFrame:
+    """
+    Lê o arquivo pelo cache Parquet quando possível
+    Se não houver entrada válida, usa `leitor(arquivo)` e grava o resultado no cache
+
+    Args:
+        arquivo: Caminho do arquivo de dados
+        leitor: Função que lê o arquivo e retorna um DataFrame (ex: pd.read_excel)
+        pasta_cache: Pasta onde ficam as entradas do cache
+
+    Returns:
+        DataFrame: Dados do arquivo
+    """
+    if not cache_habilitado():
+        return leitor(arquivo)
+
+    nome_arquivo = os.path.basename(arquivo)
+    caminho_cache = _caminho_no_cache(pasta_cache, nome_arquivo, calcular_hash_arquivo(arquivo))
+
+    if os.path.exists(caminho_cache):
+        log.info(f"Lendo {nome_arquivo} do cache Parquet")
+        _registrar_uso(caminho_cache)
+        return pd.read_parquet(caminho_cache, memory_map=True)
+
+    df = leitor(arquivo)
+
+    caminho_temporario = f"{caminho_cache}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(pasta_cache, exist_ok=True)
+        df.to_parquet(caminho_temporario, index=False)
+        os.replace(caminho_temporario, caminho_cache)
+        log.info(f"Arquivo {nome_arquivo} gravado no cache Parquet")
+        _remover_entradas_antigas(pasta_cache, nome_arquivo, caminho_cache)
+        limitar_tamanho_cache(pasta_cache)
+    except Exception as e:
+        log.warning(f"Não foi possível gravar {nome_arquivo} no cache: {str(e)}")
+        _remover(caminho_temporario)
+
+    return df
+
+
+def ler_em_blocos_com_cache(arquivo:str, leitor_blocos, tamanho_bloco:int, pasta_cache:str):
+    """
+    Versão em blocos de ler_com_cache
+    Na presença de entrada válida, lê o Parquet em lotes de `tamanho_bloco` linhas.
+    Caso contrário, repassa os blocos de `leitor_blocos(arquivo, tamanho_bloco)` e os grava
+    no cache à medida que passam; a entrada só é publicada se o arquivo for lido até o fim.
+
+    Yields:
+        DataFrame: Blocos de até `tamanho_bloco` registros
+    """
+    if not cache_habilitado():
+        yield from leitor_blocos(arquivo, tamanho_bloco)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    nome_arquivo = os.path.basename(arquivo)
+    caminho_cache = _caminho_no_cache(pasta_cache, nome_arquivo, calcular_hash_arquivo(arquivo))
+
+    if os.path.exists(caminho_cache):
+        log.info(f"Lendo {nome_arquivo} do cache Parquet em blocos")
+        _registrar_uso(caminho_cache)
+        parquet = pq.ParquetFile(caminho_cache, memory_map=True)
+        for lote in parquet.iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+        return
+
+    os.makedirs(pasta_cache, exist_ok=True)
+    caminho_temporario = f"{caminho_cache}.{os.getpid()}.tmp"
+    escritor = None
+    gravando = True
+    concluido = False
+
+    try:
+        for bloco in leitor_blocos(arquivo, tamanho_bloco):
+            if gravando:
+                try:
+                    tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+                    if escritor is None:
+                        escritor = pq.ParquetWriter(caminho_temporario, tabela.schema)
+                    elif not tabela.schema.equals(escritor.schema):
+                        tabela = tabela.cast(escritor.schema)
+                    escritor.write_table(tabela)
+                except Exception as e:
+                    # Tipos diferentes entre blocos: segue sem cache para este arquivo
+                    log.warning(f"Não foi possível gravar {nome_arquivo} no cache: {str(e)}")
+                    gravando = False
+            yield bloco
+        concluido = True
+    finally:
+        if escritor is not None:
+            escritor.close()
+        if concluido and gravando and escritor is not None:
+            os.replace(caminho_temporario, caminho_cache)
+            log.info(f"Arquivo {nome_arquivo} gravado no cache Parquet")
+            _remover_entradas_antigas(pasta_cache, nome_arquivo, caminho_cache)
+            limitar_tamanho_cache(pasta_cache)
+        else:
+            _remover(caminho_temporario)
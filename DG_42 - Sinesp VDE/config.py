@@ -11,6 +11,84 @@ CONFIG = {
     'host': 'localhost',
     'porta': '5433',
     'nome_bd': 'data_glow_up',
+
+    # Extração em blocos: 'blocos' lê as planilhas linha a linha (memória limitada ao tamanho do bloco),
+    # 'completo' mantém a leitura antiga com pd.read_excel do arquivo inteiro
+    'modo_extracao': 'blocos',
+    'tamanho_bloco': 50000,
+
+    # Número de processos para extrair e transformar arquivos em paralelo (1 = sem paralelismo)
+    'num_processos': 4,
+
+    # Cache Parquet das planilhas já lidas (pasta .cache dentro de pasta_dados), chaveado pelo hash do arquivo
+    'usar_cache': True,
+    'cache_tamanho_maximo_mb': 2048,
+
+    # Carga no banco: 'copy' usa COPY FROM STDIN no PostgreSQL, 'insert' usa os INSERTs em lote do to_sql
+    'metodo_carga': 'copy',
+
+    # Pool de conexões da engine (criada uma vez por processo e reaproveitada)
+    'pool_tamanho': 5,
+    'pool_conexoes_extras': 5,
+    'pool_pre_ping': True,
+
+    # Tempo máximo de cada comando no PostgreSQL, em milissegundos (0 = sem limite)
+    'timeout_comando_ms': 0,
+
+    # INSERTs em lote do psycopg2 ('values_only' ou 'values_plus_batch'), usados com metodo_carga 'insert'
+    'executemany_mode': 'values_plus_batch',
+
+    # Carga paralela: número de arquivos gravados ao mesmo tempo, cada um em sua conexão (1 = um por vez),
+    # e blocos transformados que podem esperar na fila de cada escritor antes de a extração parar.
+    # Cada escritor usa até 2 conexões do pool (a carga e a criação de partições)
+    'escritores_banco': 2,
+    'blocos_em_espera': 2,
+
+    # Arquivos republicados (já carregados antes): 'substituir' remove os registros da versão anterior e grava
+    # o arquivo inteiro; 'mesclar' (só PostgreSQL) compara as duas versões pela chave natural (arquivo, UF,
+    # município, evento, data, agente, arma e faixa etária) e aplica só os registros inseridos, alterados ou removidos
+    'modo_reprocessamento': 'substituir',
+
+    # Conferir o total da tabela com SELECT COUNT(*) no final da carga (percorre a tabela inteira);
+    # sem isso o total vem da soma das linhas registradas por arquivo
+    'contagem_exata': False,
+
+    # Relatório de cada execução (tempo, linhas, linhas/s, bytes e pico de memória por etapa):
+    # uma linha JSON por execução, e opcionalmente um arquivo .prom para o textfile collector do Prometheus
+    'arquivo_metricas': 'metricas_etl.jsonl',
+    'arquivo_prometheus': None,
+
+    # Tempo máximo esperado (em segundos) para o executar.py decidir que não há dados novos,
+    # antes de importar pandas/SQLAlchemy; acima disso é registrado um aviso
+    'orcamento_verificacao_rapida_s': 1.0,
+
+    # Modo serviço (executar.py --servico): 'pagina' consulta a página do governo a cada intervalo,
+    # 'pasta' só observa os arquivos de dados de pasta_dados; o intervalo (em segundos) varia ±servico_variacao
+    'servico_modo': 'pagina',
+    'servico_intervalo_s': 900,
+    'servico_variacao': 0.1,
+
+    # Endpoint local de saúde do serviço (GET /saude); responde 503 depois de N execuções seguidas com falha
+    'servico_host': '127.0.0.1',
+    'servico_porta': 8089,
+    'servico_falhas_para_alerta': 3,
+
+    # Número de arquivos baixados ao mesmo tempo da página do governo
+    'downloads_simultaneos': 4,
+
+    # sha256 publicados para os arquivos (nome do arquivo -> sha256), conferidos após o download
+    'checksums_publicados': {},
+
+    # Formato (strftime) das datas em texto de data_referencia, ex: '%d/%m/%Y' (None = inferir entre os formatos comuns)
+    'formato_data': None,
+
+    # Tabelas de dimensão: UF e município viram chaves inteiras (códigos do IBGE, ver dimensoes.py) na tabela
+    # principal, com os nomes em dim_uf/dim_municipio e na view vw_dados_seguranca_publica.
+    # Só vale para tabelas novas: uma tabela já criada no outro modo precisa ser recriada
+    'tabelas_dimensao': False,
+
+    # JSON opcional {categoria: [eventos]} para classificar eventos novos sem alterar o código (None = só as categorias padrão)
+    'arquivo_categorias_eventos': None,
     
     # URL da página do governo com os arquivos de dados 
     'url_base': "https://www.gov.br/mj/pt-br/assuntos/sua-seguranca/seguranca-publica/estatistica/dados-nacionais-1/base-de-dados-e-notas-metodologicas-dos-gestores-estaduais-sinesp-vde-2022-e-2023"
@@ -0,0 +1,188 @@
+import os
+import zlib
+from functools import lru_cache
+import pandas as pd
+from loguru import logger as log
+from esquema import normalizar_nome
+
+# Referência do IBGE para as tabelas de dimensão (CONFIG['tabelas_dimensao'])
+# municipios_ibge.csv traz o código de 7 dígitos, a UF e o nome (em minúsculas, sem acentos)
+# dos 5570 municípios; o código da UF são os 2 primeiros dígitos do código do município.
+ARQUIVO_MUNICIPIOS_IBGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'municipios_ibge.csv')
+
+# Dicionários para mapeamento da UF
+MAPA_REGIOES = {
+    'AC': 'Norte', 'AM': 'Norte', 'AP': 'Norte', 'PA': 'Norte', 'RO': 'Norte', 'RR': 'Norte', 'TO': 'Norte',
+    'AL': 'Nordeste', 'BA': 'Nordeste', 'CE': 'Nordeste', 'MA': 'Nordeste', 'PB': 'Nordeste',
+    'PE': 'Nordeste', 'PI': 'Nordeste', 'RN': 'Nordeste', 'SE': 'Nordeste',
+    'DF': 'Centro-Oeste', 'GO': 'Centro-Oeste', 'MS': 'Centro-Oeste', 'MT': 'Centro-Oeste',
+    'ES': 'Sudeste', 'MG': 'Sudeste', 'RJ': 'Sudeste', 'SP': 'Sudeste',
+    'PR': 'Sul', 'RS': 'Sul', 'SC': 'Sul'
+}
+
+MAPA_ESTADOS = {
+    'AC': 'Acre',
+    'AL': 'Alagoas',
+    'AP': 'Amapá',
+    'AM': 'Amazonas',
+    'BA': 'Bahia',
+    'CE': 'Ceará',
+    'DF': 'Distrito Federal',
+    'ES': 'Espírito Santo',
+    'GO': 'Goiás',
+    'MA': 'Maranhão',
+    'MT': 'Mato Grosso',
+    'MS': 'Mato Grosso do Sul',
+    'MG': 'Minas Gerais',
+    'PA': 'Pará',
+    'PB': 'Paraíba',
+    'PR': 'Paraná',
+    'PE': 'Pernambuco',
+    'PI': 'Piauí',
+    'RJ': 'Rio de Janeiro',
+    'RN': 'Rio Grande do Norte',
+    'RS': 'Rio Grande do Sul',
+    'RO': 'Rondônia',
+    'RR': 'Roraima',
+    'SC': 'Santa Catarina',
+    'SP': 'São Paulo',
+    'SE': 'Sergipe',
+    'TO': 'Tocantins'
+}
+
+# Nomes antigos (já normalizados, ver esquema.normalizar_nome) de municípios renomeados:
+# (UF, nome antigo) -> nome atual na referência do IBGE
+SINONIMOS_MUNICIPIOS = {
+    ('SP', 'embu'): 'embu_das_artes',
+    ('RJ', 'parati'): 'paraty',
+    ('RN', 'presidente_juscelino'): 'serra_caiada',
+    ('RN', 'augusto_severo'): 'campo_grande',
+    ('PB', 'santarem'): 'joca_claudino',
+    ('PB', 'serido'): 'sao_vicente_do_serido',
+    ('TO', 'sao_valerio_da_natividade'): 'sao_valerio',
+    ('CE', 'itapage'): 'itapaje',
+    ('PA', 'eldorado_dos_carajas'): 'eldorado_do_carajas',
+    ('BA', 'muquem_de_sao_francisco'): 'muquem_do_sao_francisco',
+}
+
+# Nomes que indicam município ausente na planilha (sem chave)
+MUNICIPIOS_NAO_INFORMADOS = {'', 'nao_informado', 'nao_informada', 'ignorado', 'nan'}
+
+
+@lru_cache(maxsize=None)
+def _referencia_municipios() -> dict:
+    """
+    (UF, nome normalizado) -> código IBGE do município, lido uma vez por processo
+    """
+    referencia = pd.read_csv(ARQUIVO_MUNICIPIOS_IBGE, dtype={'codigo_ibge': 'int64', 'uf': 'str', 'municipio': 'str'})
+    chaves = zip(referencia['uf'], referencia['municipio'].map(normalizar_nome))
+    return dict(zip(chaves, referencia['codigo_ibge'].tolist()))
+
+
+@lru_cache(maxsize=None)
+def codigos_uf() -> dict:
+    """
+    UF -> código IBGE da UF (2 primeiros dígitos dos códigos dos seus municípios)
+    """
+    return {uf: codigo // 100000 for (uf, _), codigo in _referencia_municipios().items()}
+
+
+def chave_municipio(uf, nome):
+    """
+    Chave inteira do município na dimensão, sem diferenciar maiúsculas, acentos e pontuação
+
+    Returns:
+        tuple: (chave, True se encontrado na referência do IBGE). A chave é o código IBGE
+               ou, para nomes fora da referência, um número negativo calculado de UF + nome
+               (o mesmo em todas as execuções). (None, False) para município não informado.
+    """
+    nome_normalizado = normalizar_nome(nome)
+    if nome_normalizado in MUNICIPIOS_NAO_INFORMADOS:
+        return None, False
+    uf = str(uf).strip().upper()
+    nome_normalizado = SINONIMOS_MUNICIPIOS.get((uf, nome_normalizado), nome_normalizado)
+
+    codigo = _referencia_municipios().get((uf, nome_normalizado))
+    if codigo is not None:
+        return codigo, True
+    return -(zlib.crc32(f"{uf}|{nome_normalizado}".encode('utf-8')) & 0x7FFFFFFF) - 1, False
+
+
+def adicionar_chaves(df:pd.DataFrame):
+    """
+    Adiciona as chaves das dimensões (codigo_uf e codigo_municipio), alterando o próprio DataFrame
+
+    uf e municipio devem ser categóricas: cada UF e cada par (UF, município) distinto é
+    procurado uma vez na referência, e o resultado é distribuído pelos registros.
+    Municípios fora da referência são informados no log.
+    """
+    if 'uf' not in df.columns:
+        return
+
+    # A última posição corresponde ao código -1 (registro sem UF)
+    ufs = list(df['uf'].cat.categories)
+    codigos = codigos_uf()
+    chaves_uf = pd.array([codigos.get(str(uf).strip().upper()) for uf in ufs] + [None], dtype='Int8')
+    df['codigo_uf'] = pd.Series(chaves_uf[df['uf'].cat.codes.to_numpy()], index=df.index)
+
+    if 'municipio' not in df.columns:
+        return
+
+    # Pares (UF, município) distintos a partir dos códigos das duas categorias
+    # (códigos somados de 1, para que 0 seja o valor ausente)
+    municipios = list(df['municipio'].cat.categories)
+    codigos_uf_registro = df['uf'].cat.codes.to_numpy().astype('int64') + 1
+    codigos_municipio_registro = df['municipio'].cat.codes.to_numpy().astype('int64') + 1
+    pares, pares_distintos = pd.factorize(codigos_uf_registro * (len(municipios) + 1) + codigos_municipio_registro)
+
+    chaves = []
+    fora_da_referencia = []
+    for par in pares_distintos:
+        posicao_uf, posicao_municipio = divmod(int(par), len(municipios) + 1)
+        if posicao_uf == 0 or posicao_municipio == 0:
+            chaves.append(None)
+            continue
+        posicao_uf, posicao_municipio = posicao_uf - 1, posicao_municipio - 1
+        chave, encontrado = chave_municipio(ufs[posicao_uf], municipios[posicao_municipio])
+        chaves.append(chave)
+        if chave is not None and not encontrado:
+            fora_da_referencia.append(f"{municipios[posicao_municipio]}/{ufs[posicao_uf]}")
+
+    df['codigo_municipio'] = pd.Series(pd.array(chaves, dtype='Int32')[pares], index=df.index)
+
+    if fora_da_referencia:
+        log.warning(f"{len(fora_da_referencia)} municípios fora da referência do IBGE (chave negativa na dimensão): "
+                    f"{', '.join(fora_da_referencia[:10])}{' ...' if len(fora_da_referencia) > 10 else ''}")
+
+
+def registros_uf() -> list:
+    """
+    Linhas da dimensão de UFs: código IBGE, sigla, nome do estado e região
+    """
+    return [{'codigo_uf': codigo, 'uf': uf, 'nome_estado': MAPA_ESTADOS.get(uf), 'regiao': MAPA_REGIOES.get(uf)}
+            for uf, codigo in sorted(codigos_uf().items(), key=lambda item: item[1])]
+
+
+def registros_municipio(df:pd.DataFrame) -> list:
+    """
+    Linhas da dimensão de municípios presentes no DataFrame (uma por chave), com o nome
+    como aparece nos dados já ajustados
+    """
+    if 'codigo_municipio' not in df.columns:
+        return []
+    primeiros = ~df['codigo_municipio'].duplicated() & df['codigo_municipio'].notna()
+    distintos = df.loc[primeiros.to_numpy(), ['codigo_municipio', 'codigo_uf', 'municipio']]
+    return [{'codigo_municipio': int(chave), 'codigo_uf': None if pd.isna(codigo_uf) else int(codigo_uf),
+             'municipio': str(municipio), 'ibge': int(chave) > 0}
+            for chave, codigo_uf, municipio in distintos.itertuples(index=False)]
+
+
+def restaurar_uf(df:pd.DataFrame) -> pd.DataFrame:
+    """
+    Recoloca a coluna uf (sigla) a partir de codigo_uf em registros lidos da tabela principal
+    no modo de dimensões, para recalcular as agregações por UF
+    """
+    if 'uf' not in df.columns and 'codigo_uf' in df.columns:
+        uf_por_codigo = {codigo: uf for uf, codigo in codigos_uf().items()}
+        df['uf'] = df['codigo_uf'].map(uf_por_codigo)
+    return df
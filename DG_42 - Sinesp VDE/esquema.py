@@ -0,0 +1,159 @@
+import re
+import json
+import hashlib
+import unicodedata
+from functools import lru_cache
+import pandas as pd
+from loguru import logger as log
+
+# Registro do esquema das planilhas do Sinesp VDE
+# Cada cabeçalho (de cada ano de publicação) é mapeado para as colunas canônicas abaixo.
+# Colunas do cabeçalho que não estão no registro (ex: 'formulario') não são lidas.
+
+# Colunas canônicas e o tipo de cada uma logo após a leitura:
+# 'texto' -> str (vira 'category' em ajustar_colunas), 'numero' -> float64 (reduzida em ajustar_colunas),
+# 'data' -> como vem da planilha (convertida em transformar_datas)
+COLUNAS_CANONICAS = {
+    'uf': 'texto',
+    'municipio': 'texto',
+    'evento': 'texto',
+    'data_referencia': 'data',
+    'agente': 'texto',
+    'arma': 'texto',
+    'faixa_etaria': 'texto',
+    'feminino': 'numero',
+    'masculino': 'numero',
+    'nao_informado': 'numero',
+    'total_vitima': 'numero',
+    'total': 'numero',
+    'total_peso': 'numero',
+}
+
+# Colunas sem as quais a planilha não é carregada
+COLUNAS_OBRIGATORIAS = ('uf', 'municipio', 'evento', 'data_referencia')
+
+# dtype do pandas de cada tipo do registro (None = sem conversão)
+TIPOS_PANDAS = {'texto': 'str', 'numero': 'float64', 'data': None}
+
+# Outros nomes (já normalizados, ver normalizar_nome) com que as colunas aparecem nos cabeçalhos
+SINONIMOS = {
+    'municipio': ['cidade', 'nome_municipio'],
+    'evento': ['tipo_evento'],
+    'data_referencia': ['data', 'data_ref', 'mes_referencia'],
+    'faixa_etaria': ['idade'],
+    'nao_informado': ['sexo_nao_informado'],
+    'total_vitima': ['total_vitimas', 'vitimas'],
+}
+
+# Ajustes por ano de publicação (ano do nome bancovde-AAAA.xlsx), com prioridade sobre os sinônimos:
+# {ano: {nome normalizado no cabeçalho: coluna canônica, ou None para não ler a coluna}}
+ESQUEMAS_POR_ANO = {}
+
+# Identifica a versão do registro; faz parte da chave do cache Parquet (as entradas guardam
+# apenas as colunas do plano, já com os nomes canônicos)
+ASSINATURA_ESQUEMA = hashlib.sha256(
+    json.dumps([COLUNAS_CANONICAS, TIPOS_PANDAS, SINONIMOS, ESQUEMAS_POR_ANO], sort_keys=True).encode()
+).hexdigest()[:8]
+
+PADRAO_ANO_ARQUIVO = re.compile(r'bancovde-(\d{4})', re.IGNORECASE)
+
+
+def normalizar_nome(nome) -> str:
+    """
+    Forma comparável de um nome de coluna: minúsculas, sem acentos e com '_' no lugar
+    de espaços e pontuação ('Total Vítima ' -> 'total_vitima')
+    """
+    if nome is None:
+        return ''
+    sem_acentos = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '_', sem_acentos.lower()).strip('_')
+
+
+def ano_do_arquivo(caminho:str):
+    """
+    Ano de publicação pelo nome do arquivo (bancovde-AAAA.xlsx), ou None
+    """
+    encontrado = PADRAO_ANO_ARQUIVO.search(str(caminho))
+    return int(encontrado.group(1)) if encontrado else None
+
+
+@lru_cache(maxsize=None)
+def _mapa_nomes(ano) -> dict:
+    """
+    Nome normalizado -> coluna canônica, com os ajustes do ano aplicados por último
+    """
+    mapa = {coluna: coluna for coluna in COLUNAS_CANONICAS}
+    for coluna, sinonimos in SINONIMOS.items():
+        mapa.update({sinonimo: coluna for sinonimo in sinonimos})
+    mapa.update(ESQUEMAS_POR_ANO.get(ano, {}))
+    return mapa
+
+
+def mapear_cabecalho(cabecalho, ano=None) -> tuple:
+    """
+    Associa as colunas do cabeçalho às colunas canônicas (a primeira ocorrência de cada uma vale)
+
+    Returns:
+        tuple: (posições mapeadas, colunas canônicas na mesma ordem, nomes do cabeçalho não mapeados)
+    """
+    mapa = _mapa_nomes(ano)
+    indices, colunas, ignoradas = [], [], []
+
+    for indice, nome in enumerate(cabecalho):
+        coluna = mapa.get(normalizar_nome(nome))
+        if coluna is None or coluna in colunas:
+            if nome is not None:
+                ignoradas.append(str(nome))
+            continue
+        indices.append(indice)
+        colunas.append(coluna)
+
+    return indices, colunas, ignoradas
+
+
+@lru_cache(maxsize=None)
+def compilar_plano(cabecalho:tuple, ano=None) -> dict:
+    """
+    Compila o plano de leitura de um cabeçalho: quais posições ler e com que nome e tipo
+    O resultado é guardado por (cabeçalho, ano) e não deve ser alterado por quem o recebe.
+
+    Returns:
+        dict: indices (posições lidas, em ordem), colunas (nomes canônicos na mesma ordem),
+              tipos (dtype do pandas por coluna), faltantes (canônicas ausentes) e
+              ignoradas (colunas do cabeçalho que não são lidas)
+
+    Raises:
+        ValueError: Se faltar alguma das COLUNAS_OBRIGATORIAS
+    """
+    indices, colunas, ignoradas = mapear_cabecalho(cabecalho, ano)
+
+    faltantes = [coluna for coluna in COLUNAS_CANONICAS if coluna not in colunas]
+    obrigatorias_faltantes = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna in faltantes]
+    if obrigatorias_faltantes:
+        raise ValueError(f"Colunas esperadas não encontradas no cabeçalho: {', '.join(obrigatorias_faltantes)}")
+
+    if faltantes:
+        log.warning(f"Planilha{f' de {ano}' if ano else ''} sem as colunas {', '.join(faltantes)}: "
+                    f"as transformações que dependem delas não serão aplicadas")
+    if ignoradas:
+        log.info(f"Colunas da planilha{f' de {ano}' if ano else ''} que não serão lidas: {', '.join(ignoradas)}")
+
+    tipos = {coluna: TIPOS_PANDAS[COLUNAS_CANONICAS[coluna]] for coluna in colunas
+             if TIPOS_PANDAS[COLUNAS_CANONICAS[coluna]] is not None}
+
+    return {'indices': indices, 'colunas': colunas, 'tipos': tipos, 'faltantes': faltantes, 'ignoradas': ignoradas}
+
+
+def aplicar_tipos(df:pd.DataFrame, plano:dict) -> pd.DataFrame:
+    """
+    Converte as colunas lidas para os tipos do plano, alterando o próprio DataFrame
+    Valores não numéricos em colunas numéricas viram nulos (como no pd.to_numeric com errors='coerce').
+    """
+    for coluna, tipo in plano['tipos'].items():
+        if coluna not in df.columns or df[coluna].dtype == tipo:
+            continue
+        if tipo == 'float64':
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype('float64')
+        else:
+            df[coluna] = df[coluna].astype(tipo)
+    return df
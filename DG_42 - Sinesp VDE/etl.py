@@ -1,4 +1,7 @@
 import pandas as pd
+import numpy as np
+import numbers
+import datetime
 import os
 import glob
 import sqlalchemy as sa
@@ -6,20 +9,72 @@ from loguru import logger as log
 from log import log_decorator
 import sys
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, unquote
 from config import CONFIG
+from cache import pasta_do_cache
+from esquema import COLUNAS_CANONICAS
+from dimensoes import MAPA_REGIOES, MAPA_ESTADOS, adicionar_chaves, registros_uf, registros_municipio, restaurar_uf
+from leitores import ler_arquivo, ler_arquivo_em_blocos, arquivo_suportado, validar_arquivo
+from verificacao_rapida import (ARQUIVO_MANIFESTO, listar_links_dados, nome_arquivo_do_link, calcular_hash_arquivo,
+                                assinatura_arquivo, hash_arquivo_local)
+import metricas
+from banco import (atualizar_agregacoes, combinar_agregacoes, limpar_agregacoes, criar_tabelas_auxiliares, controle_existe, criar_controle_arquivos,
+                   obter_controle_arquivos, registrar_arquivo, limpar_controle_arquivos,
+                   criar_tabela_principal, tabela_particionada, garantir_particoes,
+                   remover_indices_secundarios, recriar_indices, criar_engine, metricas_pool,
+                   TABELA_CONTROLE, total_registros_controle, estimar_registros, contar_registros,
+                   criar_tabelas_dimensao, garantir_municipios, COLUNAS_SUBSTITUIDAS_POR_CHAVES,
+                   criar_tabela_carga, mesclar_tabela_carga, TABELAS_AGREGADAS, TABELA_DIM_UF)
 import time
+import io
+import csv
+import shutil
+import tempfile
+import json
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from contextlib import nullcontext
+
+
+def criar_sessao_http(downloads_simultaneos:int=4) -> requests.Session:
+    """
+    Cria a sessão HTTP dos downloads, com headers de navegador e um pool de conexões
+    do tamanho do número de downloads simultâneos
+    """
+    session = requests.Session()
+    
+    # Headers para simular um navegador
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet, application/vnd.oasis.opendocument.spreadsheet, text/csv, application/octet-stream',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive'
+    })
+    
+    adaptador = HTTPAdapter(pool_connections=downloads_simultaneos, pool_maxsize=downloads_simultaneos)
+    session.mount('http://', adaptador)
+    session.mount('https://', adaptador)
+    return session
 
 
 @log_decorator
-def verificar_e_baixar_arquivos(pasta_destino: str, url_base: str) -> list:
+def verificar_e_baixar_arquivos(pasta_destino: str, url_base: str, downloads_simultaneos: int = 4,
+                                sessao_http:requests.Session=None) -> list:
     """
-    Verifica se os arquivos XLSX da página da web existem na pasta de destino (Data).
-    Se não existirem, faz o download dos arquivos .
+    Verifica se os arquivos de dados (xlsx, ods, csv ou parquet) da página da web existem na pasta de destino (Data).
+    Se não existirem, faz o download dos arquivos, até `downloads_simultaneos` ao mesmo tempo.
+    Arquivos que já existem são revalidados com If-None-Match/If-Modified-Since a partir
+    do manifesto de downloads, e baixados de novo se o governo publicou uma nova versão.
+    Com sessao_http (ex: no modo serviço), as conexões da sessão são reaproveitadas entre
+    execuções; caso contrário uma sessão é criada e fechada nesta chamada.
+    
+    Returns:
+        list: Nomes dos arquivos novos ou atualizados (que precisam ser processados)
     """
     
-    log.info(f"Verificando arquivos XLSX na pasta {pasta_destino}")
+    log.info(f"Verificando arquivos de dados na pasta {pasta_destino}")
     
     # Criar a pasta de destino se não existir
     if not os.path.exists(pasta_destino):
@@ -30,165 +85,70 @@ def verificar_e_baixar_arquivos(pasta_destino: str, url_base: str) -> list:
     arquivos_existentes = set(os.listdir(pasta_destino))
     log.info(f"Encontrados {len(arquivos_existentes)} arquivos na pasta")
     
-    # Headers para simular um navegador
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet, application/octet-stream',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive'
-    }
+    # Manifesto com ETag/Last-Modified/tamanho/sha256 dos downloads anteriores
+    manifesto = _carregar_manifesto(pasta_destino)
     
-    # Scrapping da página para encontrar links para arquivos XLSX
+    # Scrapping da página para encontrar links para os arquivos de dados
     try:
         log.info(f"Acessando a URL: {url_base}")
-        with requests.Session() as session:
-            session.headers.update(headers)
+        with nullcontext(sessao_http) if sessao_http else criar_sessao_http(downloads_simultaneos) as session:
             response = session.get(url_base, timeout=30)
             response.raise_for_status()  # Verificar se a requisição foi bem-sucedida
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # Encontrar todos os links para arquivos de dados (mesma regra da verificação rápida)
+            links_dados = listar_links_dados(response.text)
             
-            # Encontrar todos os links para arquivos XLSX
-            links_xlsx = []
-            # Procurar por links em tags <a> que contenham "bancovde" e ".xlsx"
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                # Verificar se é um link para arquivo XLSX do banco VDE
-                if 'bancovde-' in href.lower() and '.xlsx' in href.lower():
-                    links_xlsx.append(href)
-                # Verificar também os links com download/file no formato que você compartilhou
-                elif '/download/file' in href and '.xlsx' in href.lower():
-                    links_xlsx.append(href)
-            
-            log.info(f"Encontrados {len(links_xlsx)} arquivos XLSX na página")
-            for l in links_xlsx:
+            log.info(f"Encontrados {len(links_dados)} arquivos de dados na página")
+            for l in links_dados:
                 log.info(f"Link encontrado: {l}")
             
-            # Arquivos baixados
-            arquivos_baixados = []
+            # Arquivos que precisam ser baixados: (nome do arquivo, URL completa)
+            downloads_pendentes = []
             
             # Verificar quais arquivos precisam ser baixados
-            for link in links_xlsx:
-                # Métodos diferentes dependendo do formato do link
-                if "bancovde-" in link.lower():
-                    # Formato: https://.../bancovde-2025.xlsx/... 
-                    # Extrair o nome bancovde-AAAA.xlsx
-                    import re
-                    match = re.search(r'bancovde-\d{4}\.xlsx', link.lower())
-                    if match:
-                        nome_arquivo = match.group(0)
-                    else:
-                        # Extrair nome usando o padrão final do link
-                        parts = link.split('/')
-                        nome_arquivo = next((p for p in parts if '.xlsx' in p.lower()), f"bancovde_{len(arquivos_baixados)}.xlsx")
-                else:
-                    # Último recurso: obter parte final do URL e remover parâmetros
-                    parts = link.split('/')
-                    nome_arquivo = next((p for p in reversed(parts) if p and '.xlsx' in p.lower()), f"arquivo_{len(arquivos_baixados)}.xlsx")
-                    # Limpar parâmetros da URL, se houver
-                    nome_arquivo = nome_arquivo.split('?')[0]
+            for link in links_dados:
+                # Nome com que o arquivo é gravado (bancovde-AAAA.xlsx, ou o final do link)
+                nome_arquivo = nome_arquivo_do_link(link, len(downloads_pendentes))
                 
-                # Verificar se usamos @@download/file no final
-                if '@@download/file' in nome_arquivo:
-                    nome_arquivo = nome_arquivo.replace('@@download/file', '')
+                log.info(f"Nome do arquivo extraído: {nome_arquivo}")
                 
-                # Limpar o nome do arquivo de caracteres inválidos
-                import re
-                nome_arquivo = re.sub(r'[^\w\-\. ]', '_', nome_arquivo)
+                # URL completa para download
+                url_download = link
                 
-                log.info(f"Nome do arquivo extraído: {nome_arquivo}")
+                # Garantir que a URL está completa
+                if not url_download.startswith('http'):
+                    url_download = urljoin(url_base, url_download)
                 
                 # Verificar se o arquivo já existe na pasta
                 if nome_arquivo not in arquivos_existentes:
                     log.info(f"Arquivo {nome_arquivo} não encontrado localmente. Iniciando download...")
-                    
-                    # URL completa para download
-                    url_download = link
-                    
-                    # Garantir que a URL está completa
-                    if not url_download.startswith('http'):
-                        url_download = urljoin(url_base, url_download)
-                    
-                    # Tentar baixar com várias tentativas
-                    max_tentativas = 3
-                    for tentativa in range(1, max_tentativas + 1):
-                        try:
-                            log.info(f"Tentativa {tentativa} de {max_tentativas} para baixar {nome_arquivo}")
-                            
-                            # Caminho completo para o arquivo
-                            caminho_completo = os.path.join(pasta_destino, nome_arquivo)
-                            
-                            # Baixar usando a sessão
-                            with session.get(url_download, stream=True, timeout=60) as arquivo_response:
-                                arquivo_response.raise_for_status()
-                                
-                                # Verificar se o Content-Length está presente
-                                tamanho_esperado = None
-                                if 'Content-Length' in arquivo_response.headers:
-                                    tamanho_esperado = int(arquivo_response.headers['Content-Length'])
-                                    log.info(f"Tamanho esperado do arquivo: {tamanho_esperado} bytes")
-                                
-                                # Baixar o arquivo em chunks
-                                tamanho_baixado = 0
-                                with open(caminho_completo, 'wb') as arquivo:
-                                    for chunk in arquivo_response.iter_content(chunk_size=8192):
-                                        if chunk:  # filtrar keep-alive chunks
-                                            arquivo.write(chunk)
-                                            tamanho_baixado += len(chunk)
-                            
-                            # Verificar se o tamanho baixado corresponde ao esperado
-                            if tamanho_esperado is not None and tamanho_baixado != tamanho_esperado:
-                                log.warning(f"Tamanho do arquivo baixado ({tamanho_baixado} bytes) não corresponde ao esperado ({tamanho_esperado} bytes)")
-                                # Remove o arquivo incompleto
-                                if os.path.exists(caminho_completo):
-                                    os.remove(caminho_completo)
-                                # Continua para a próxima tentativa
-                                continue
-                            
-                            # Verificar se o arquivo é um XLSX válido
-                            try:
-                                import pandas as pd
-                                # Tentar abrir o arquivo com pandas para verificar se é válido
-                                df = pd.read_excel(caminho_completo, nrows=5)
-                                if df.empty:
-                                    log.warning(f"Arquivo XLSX vazio ou inválido")
-                                    if os.path.exists(caminho_completo):
-                                        os.remove(caminho_completo)
-                                    continue
-                                
-                                log.info(f"Arquivo XLSX válido verificado")
-                                arquivos_baixados.append(nome_arquivo)
-                                # Arquivo válido, interrompe as tentativas
-                                break
-                            except Exception as e:
-                                log.warning(f"Arquivo baixado não é um XLSX válido: {str(e)}")
-                                # Remove o arquivo corrompido
-                                if os.path.exists(caminho_completo):
-                                    os.remove(caminho_completo)
-                                # Se for a última tentativa, registra o erro
-                                if tentativa == max_tentativas:
-                                    log.error(f"Falha em todas as {max_tentativas} tentativas para baixar {nome_arquivo}")
-                                else:
-                                    # Espera antes da próxima tentativa (com backoff exponencial)
-                                    tempo_espera = 2 ** tentativa
-                                    log.info(f"Aguardando {tempo_espera} segundos antes da próxima tentativa")
-                                    time.sleep(tempo_espera)
-                        
-                        except Exception as e:
-                            log.error(f"Erro na tentativa {tentativa} ao baixar {nome_arquivo}: {str(e)}")
-                            # Remove qualquer arquivo parcial
-                            if os.path.exists(caminho_completo):
-                                os.remove(caminho_completo)
-                            
-                            # Se não for a última tentativa, espera e tenta novamente
-                            if tentativa < max_tentativas:
-                                tempo_espera = 2 ** tentativa
-                                log.info(f"Aguardando {tempo_espera} segundos antes da próxima tentativa")
-                                time.sleep(tempo_espera)
                 else:
-                    log.info(f"Arquivo {nome_arquivo} já existe localmente")
+                    log.info(f"Arquivo {nome_arquivo} já existe localmente. Verificando se foi atualizado...")
+                
+                downloads_pendentes.append((nome_arquivo, url_download))
             
-            log.info(f"Verificação e download concluídos. {len(arquivos_baixados)} arquivos foram baixados")
+            # Baixar/revalidar os arquivos em paralelo, reaproveitando as conexões da sessão
+            arquivos_baixados = []
+            if downloads_pendentes:
+                with ThreadPoolExecutor(max_workers=downloads_simultaneos) as executor:
+                    futuros = {
+                        executor.submit(_atualizar_arquivo, session, url_download, pasta_destino, nome_arquivo,
+                                        manifesto.get(nome_arquivo)): nome_arquivo
+                        for nome_arquivo, url_download in downloads_pendentes
+                    }
+                    for futuro in as_completed(futuros):
+                        nome_arquivo = futuros[futuro]
+                        entrada = futuro.result()
+                        if entrada is None:
+                            continue
+                        
+                        if entrada.pop('modificado'):
+                            arquivos_baixados.append(nome_arquivo)
+                        manifesto[nome_arquivo] = entrada
+                
+                _salvar_manifesto(pasta_destino, manifesto)
+            
+            log.info(f"Verificação e download concluídos. {len(arquivos_baixados)} arquivos novos ou atualizados foram baixados")
             return arquivos_baixados
             
     except Exception as e:
@@ -196,25 +156,243 @@ def verificar_e_baixar_arquivos(pasta_destino: str, url_base: str) -> list:
         return []
 
 
+def _carregar_manifesto(pasta_destino:str) -> dict:
+    """
+    Lê o manifesto de downloads da pasta de destino
+    Para cada arquivo: url, etag, last_modified, tamanho, modificado_em_ns e sha256 do último download
+    e, enquanto houver um download interrompido, 'parcial' com os validadores do '<nome>.part'
+    """
+    caminho_manifesto = os.path.join(pasta_destino, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho_manifesto):
+        return {}
+    
+    try:
+        with open(caminho_manifesto, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except Exception as e:
+        log.warning(f"Manifesto de downloads inválido, será recriado: {str(e)}")
+        return {}
 
-@log_decorator
-def extrair_dados(pasta:str, arquivos_para_processar=None) -> pd.DataFrame:
+
+def _salvar_manifesto(pasta_destino:str, manifesto:dict):
     """
-    Extrai dados de arquivos xlsx específicos ou todos da pasta e retorna um DataFrame
-    Adiciona uma coluna com o nome do arquivo para cada registro
+    Grava o manifesto de downloads (em arquivo temporário e depois renomeado)
+    """
+    caminho_manifesto = os.path.join(pasta_destino, ARQUIVO_MANIFESTO)
+    caminho_temporario = caminho_manifesto + '.tmp'
+    with open(caminho_temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, indent=2, ensure_ascii=False)
+    os.replace(caminho_temporario, caminho_manifesto)
+
+
+def _atualizar_arquivo(session, url_download:str, pasta_destino:str, nome_arquivo:str, entrada=None):
+    """
+    Garante que a cópia local do arquivo é a versão publicada
     
-    Args:
-        pasta: Caminho da pasta com os arquivos
-        arquivos_para_processar: Lista de nomes de arquivos para processar (opcional)
-                                Se None, processa todos os arquivos
+    - Arquivo inexistente: download completo
+    - Arquivo com validadores (ETag/Last-Modified) no manifesto: pedido condicional
+      (If-None-Match/If-Modified-Since), que custa um 304 quando nada mudou
+    - Arquivo baixado antes do manifesto existir, ou registrado sem validadores (servidor que
+      não os envia): HEAD para registrar ETag/Last-Modified, baixando de novo só se o tamanho
+      publicado for diferente do local
     
     Returns:
-        DataFrame: Dados combinados com coluna adicional 'nome_arquivo'
+        dict: Nova entrada do manifesto com a chave 'modificado', ou None em caso de falha
+    """
+    caminho_completo = os.path.join(pasta_destino, nome_arquivo)
+    headers_condicionais = {}
+    
+    if os.path.exists(caminho_completo):
+        if entrada is not None:
+            if entrada.get('etag'):
+                headers_condicionais['If-None-Match'] = entrada['etag']
+            if entrada.get('last_modified'):
+                headers_condicionais['If-Modified-Since'] = entrada['last_modified']
+        
+        if not headers_condicionais:
+            try:
+                resposta = session.head(url_download, timeout=30, allow_redirects=True,
+                                        headers={'Accept-Encoding': 'identity'})
+                resposta.raise_for_status()
+                tamanho_publicado = resposta.headers.get('Content-Length')
+                if tamanho_publicado is not None and int(tamanho_publicado) == os.path.getsize(caminho_completo):
+                    if entrada is None:
+                        log.info(f"Arquivo {nome_arquivo} registrado no manifesto de downloads")
+                    else:
+                        log.info(f"Arquivo {nome_arquivo} tem o mesmo tamanho publicado, mantido sem novo download")
+                    return {
+                        'url': url_download,
+                        'etag': resposta.headers.get('ETag'),
+                        'last_modified': resposta.headers.get('Last-Modified'),
+                        **assinatura_arquivo(caminho_completo),
+                        'sha256': hash_arquivo_local(pasta_destino, nome_arquivo, entrada),
+                        'modificado': False
+                    }
+            except Exception as e:
+                log.warning(f"Não foi possível verificar {nome_arquivo} com HEAD: {str(e)}")
+                return None
+            
+            # O download só conta como modificação se o conteúdo for diferente do arquivo local
+            entrada = dict(entrada or {}, sha256=hash_arquivo_local(pasta_destino, nome_arquivo, entrada))
+    
+    return _baixar_arquivo(session, url_download, pasta_destino, nome_arquivo, entrada, headers_condicionais)
+
+
+def _baixar_arquivo(session, url_download:str, pasta_destino:str, nome_arquivo:str, entrada=None,
+                    headers_condicionais=None, max_tentativas:int=3, tamanho_buffer:int=64 * 1024):
+    """
+    Baixa um arquivo para a pasta de destino, com várias tentativas
+    
+    O conteúdo é gravado em '<nome>.part'. Se uma tentativa falhar no meio, a próxima
+    (ou a próxima execução do ETL) continua de onde parou com um pedido HTTP Range, sempre
+    com If-Range: o ETag/Last-Modified da resposta que começou o .part fica na chave 'parcial'
+    da entrada do manifesto. Um .part sem validador conhecido é descartado e baixado do início.
+    O arquivo só recebe o nome final depois de validado.
+    A espera entre tentativas bloqueia apenas a thread deste arquivo.
+    
+    Returns:
+        dict: Entrada do manifesto com a chave 'modificado' (False em um 304, ou se o
+              conteúdo baixado tem o mesmo sha256 do manifesto). Se todas as tentativas
+              falharem: a entrada anterior com a chave 'parcial' (e 'modificado' False) quando
+              o .part pode ser retomado na próxima execução, ou None
+    """
+    caminho_completo = os.path.join(pasta_destino, nome_arquivo)
+    caminho_parcial = caminho_completo + '.part'
+    # Validadores da resposta que começou o .part (de uma execução anterior, se houver)
+    parcial = dict((entrada or {}).get('parcial') or {})
+    
+    for tentativa in range(1, max_tentativas + 1):
+        try:
+            log.info(f"Tentativa {tentativa} de {max_tentativas} para baixar {nome_arquivo}")
+            
+            # Retomar a partir do que já foi baixado
+            tamanho_parcial = os.path.getsize(caminho_parcial) if os.path.exists(caminho_parcial) else 0
+            validador = _validador_if_range(parcial)
+            if tamanho_parcial and not validador:
+                # Sem If-Range, um Range poderia juntar ao .part bytes de outra versão do arquivo
+                log.info(f"Download parcial de {nome_arquivo} sem ETag/Last-Modified: recomeçando do início")
+                tamanho_parcial = 0
+            headers = {'Accept-Encoding': 'identity'}
+            if tamanho_parcial:
+                headers['Range'] = f"bytes={tamanho_parcial}-"
+                headers['If-Range'] = validador
+                log.info(f"Retomando download de {nome_arquivo} a partir de {tamanho_parcial} bytes")
+            elif headers_condicionais:
+                headers.update(headers_condicionais)
+            
+            with session.get(url_download, stream=True, timeout=60, headers=headers) as arquivo_response:
+                if arquivo_response.status_code == 304:
+                    log.info(f"Arquivo {nome_arquivo} não foi modificado desde o último download")
+                    return dict(entrada, modificado=False)
+                
+                if arquivo_response.status_code == 416:
+                    # O servidor não tem mais bytes a enviar: o .part (da versão do If-Range) já está
+                    # completo, e os validadores continuam os da resposta que o começou
+                    tamanho_esperado = tamanho_parcial
+                    tamanho_baixado = tamanho_parcial
+                else:
+                    arquivo_response.raise_for_status()
+                    
+                    # 206: continuação do .part; 200: o servidor enviou o arquivo inteiro (também quando
+                    # o If-Range não confere), que começa um novo .part com os validadores desta resposta
+                    if arquivo_response.status_code == 206:
+                        modo_escrita = 'ab'
+                        tamanho_baixado = tamanho_parcial
+                    else:
+                        modo_escrita = 'wb'
+                        tamanho_baixado = 0
+                        parcial = {'etag': arquivo_response.headers.get('ETag'),
+                                   'last_modified': arquivo_response.headers.get('Last-Modified')}
+                    
+                    # Verificar se o Content-Length está presente
+                    tamanho_esperado = None
+                    if 'Content-Length' in arquivo_response.headers:
+                        tamanho_esperado = tamanho_baixado + int(arquivo_response.headers['Content-Length'])
+                        log.info(f"Tamanho esperado do arquivo: {tamanho_esperado} bytes")
+                    
+                    # Baixar o arquivo em chunks
+                    with open(caminho_parcial, modo_escrita) as arquivo:
+                        for chunk in arquivo_response.iter_content(chunk_size=tamanho_buffer):
+                            if chunk:  # filtrar keep-alive chunks
+                                arquivo.write(chunk)
+                                tamanho_baixado += len(chunk)
+            
+            # Verificar se o tamanho baixado corresponde ao esperado
+            if tamanho_esperado is not None and tamanho_baixado != tamanho_esperado:
+                # Mantém o .part para retomar na próxima tentativa
+                raise IOError(f"Tamanho do arquivo baixado ({tamanho_baixado} bytes) não corresponde ao esperado ({tamanho_esperado} bytes)")
+            
+        except Exception as e:
+            log.error(f"Erro na tentativa {tentativa} ao baixar {nome_arquivo}: {str(e)}")
+            
+            # Se não for a última tentativa, espera e tenta novamente
+            if tentativa < max_tentativas:
+                tempo_espera = 2 ** tentativa
+                log.info(f"Aguardando {tempo_espera} segundos antes da próxima tentativa de {nome_arquivo}")
+                time.sleep(tempo_espera)
+            continue
+        
+        # Verificar se o arquivo é válido
+        try:
+            # Validação rápida: cabeçalho (e estrutura do ZIP, no xlsx), sem ler o arquivo inteiro
+            validar_arquivo(caminho_parcial, nome_arquivo, sha256_esperado=CONFIG['checksums_publicados'].get(nome_arquivo))
+            
+            os.replace(caminho_parcial, caminho_completo)
+            log.info(f"Arquivo válido verificado: {nome_arquivo}")
+            
+            sha256 = calcular_hash_arquivo(caminho_completo)
+            modificado = entrada is None or entrada.get('sha256') != sha256
+            if not modificado:
+                log.info(f"Arquivo {nome_arquivo} baixado novamente, mas o conteúdo não mudou")
+            
+            return {
+                'url': url_download,
+                'etag': parcial.get('etag'),
+                'last_modified': parcial.get('last_modified'),
+                **assinatura_arquivo(caminho_completo),
+                'sha256': sha256,
+                'modificado': modificado
+            }
+        except Exception as e:
+            log.warning(f"Arquivo baixado não é válido: {str(e)}")
+            # Remove o arquivo corrompido para que a próxima tentativa comece do zero
+            if os.path.exists(caminho_parcial):
+                os.remove(caminho_parcial)
+            
+            if tentativa < max_tentativas:
+                # Espera antes da próxima tentativa (com backoff exponencial)
+                tempo_espera = 2 ** tentativa
+                log.info(f"Aguardando {tempo_espera} segundos antes da próxima tentativa de {nome_arquivo}")
+                time.sleep(tempo_espera)
+    
+    log.error(f"Falha em todas as {max_tentativas} tentativas para baixar {nome_arquivo}")
+    if os.path.exists(caminho_parcial) and _validador_if_range(parcial):
+        # Validadores do .part no manifesto, para a próxima execução retomar com If-Range
+        return dict(entrada or {}, parcial=parcial, modificado=False)
+    return None
+
+
+def _validador_if_range(parcial:dict) -> str:
+    """
+    Validador para o If-Range: o ETag, se for forte (um ETag fraco, W/"...", não pode ser usado
+    em If-Range), ou então o Last-Modified
+    """
+    etag = parcial.get('etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return parcial.get('last_modified')
+
+
+def _listar_arquivos(pasta: str, arquivos_para_processar=None) -> list:
+    """
+    Lista os caminhos dos arquivos de dados a processar na pasta
+    Se arquivos_para_processar for None, retorna todos os arquivos da pasta com leitor
+    registrado (ver leitores.py)
     """
     log.info(f"Buscando arquivos na pasta {pasta}")
     
-    # Obter todos os arquivos Excel da pasta
-    todos_arquivos = glob.glob(os.path.join(pasta, '*.xlsx'))
+    # Obter todos os arquivos de dados da pasta
+    todos_arquivos = [arquivo for arquivo in glob.glob(os.path.join(pasta, '*')) if arquivo_suportado(arquivo)]
     
     # Filtrar apenas os arquivos que precisam ser processados, se especificado
     if arquivos_para_processar is not None:
@@ -223,10 +401,30 @@ def extrair_dados(pasta:str, arquivos_para_processar=None) -> pd.DataFrame:
         log.info(f"Processando apenas {len(arquivos)} arquivos específicos")
     else:
         arquivos = todos_arquivos
-        log.info(f"Processando todos os {len(arquivos)} arquivos Excel encontrados")
+        log.info(f"Processando todos os {len(arquivos)} arquivos de dados encontrados")
+    
+    return arquivos
+
+
+@log_decorator
+def extrair_dados(pasta:str, arquivos_para_processar=None) -> pd.DataFrame:
+    """
+    Extrai dados de arquivos específicos ou todos da pasta e retorna um DataFrame
+    Cada arquivo é lido pelo leitor do seu formato (ver leitores.py)
+    Adiciona uma coluna com o nome do arquivo para cada registro
+    
+    Args:
+        pasta: Caminho da pasta com os arquivos
+        arquivos_para_processar: Lista de nomes de arquivos para processar (opcional)
+                                Se None, processa todos os arquivos
+    
+    Returns:
+        DataFrame: Dados combinados com coluna adicional 'nome_arquivo'
+    """
+    arquivos = _listar_arquivos(pasta, arquivos_para_processar)
     
     if not arquivos:
-        log.warning(f"Nenhum arquivo Excel encontrado para processar em: {pasta}")
+        log.warning(f"Nenhum arquivo de dados encontrado para processar em: {pasta}")
         return pd.DataFrame()
 
     dataframes = []
@@ -235,8 +433,10 @@ def extrair_dados(pasta:str, arquivos_para_processar=None) -> pd.DataFrame:
             # Extrair apenas o nome do arquivo sem o caminho
             nome_arquivo = os.path.basename(arquivo)
             
-            # Ler o arquivo Excel
-            df = pd.read_excel(arquivo)
+            # Ler o arquivo (ou a cópia Parquet em cache, se o arquivo não mudou)
+            with metricas.medir('extracao', bytes_lidos=os.path.getsize(arquivo)) as medicao:
+                df = ler_arquivo(arquivo, pasta_do_cache(pasta))
+                medicao['linhas_saida'] = len(df)
             
             # Adicionar coluna com o nome do arquivo a cada registro
             df['nome_arquivo'] = nome_arquivo
@@ -256,87 +456,387 @@ def extrair_dados(pasta:str, arquivos_para_processar=None) -> pd.DataFrame:
 
     return dados_combinados
 
-@log_decorator
-def ajustar_colunas(dados:pd.DataFrame) -> pd.DataFrame:
+def extrair_arquivo_em_blocos(arquivo:str, tamanho_bloco:int=50000):
     """
-    Ajusta os tipos de colunas e trata valores faltantes
+    Extrai um único arquivo em blocos de no máximo `tamanho_bloco` registros
+    Os leitores de xlsx, csv e parquet leem em streaming (o xlsx linha a linha, com openpyxl
+    em modo read_only), de forma que a memória usada depende do tamanho do bloco e não do
+    tamanho do arquivo. Um erro de leitura é propagado para quem consome os blocos, que assim
+    sabe que o arquivo não foi lido até o fim.
+    
+    Yields:
+        DataFrame: Bloco de dados com coluna adicional 'nome_arquivo'
     """
-    # Criar uma cópia para não modificar o original
-    df_ajustado = dados.copy()
+    # Extrair apenas o nome do arquivo sem o caminho
+    nome_arquivo = os.path.basename(arquivo)
+    total_registros = 0
     
-    # Converter colunas numéricas
-    colunas_numericas = ['feminino', 'masculino', 'nao_informado', 'total_vitima', 'total', 'total_peso']
-    for col in colunas_numericas:
-        if col in df_ajustado.columns:
-            df_ajustado[col] = pd.to_numeric(df_ajustado[col], errors='coerce')
-            df_ajustado[col].fillna(0, inplace=True)
+    blocos = ler_arquivo_em_blocos(arquivo, tamanho_bloco, pasta_do_cache(os.path.dirname(arquivo)))
+    blocos = metricas.medir_blocos('extracao', blocos, bytes_lidos=os.path.getsize(arquivo))
+    for bloco in blocos:
+        # Adicionar coluna com o nome do arquivo a cada registro
+        bloco['nome_arquivo'] = nome_arquivo
+        total_registros += len(bloco)
+        yield bloco
+    
+    log.info(f"Arquivo {nome_arquivo} processado com sucesso: {total_registros} registros")
 
-    # Para colunas categóricas
-    colunas_categoricas = ['uf', 'municipio', 'evento', 'agente', 'arma', 'faixa_etaria']
-    for col in colunas_categoricas:
-        if col in df_ajustado.columns:
-            df_ajustado[col].fillna('Não informado', inplace=True)
 
-    # Remover a coluna 'formulario' se ela existir
-    if 'formulario' in df_ajustado.columns:
-        df_ajustado = df_ajustado.drop('formulario', axis=1)
+# Colunas numéricas e categóricas (baixa cardinalidade) das planilhas do Sinesp VDE, pelo registro do esquema
+COLUNAS_NUMERICAS = [coluna for coluna, tipo in COLUNAS_CANONICAS.items() if tipo == 'numero']
+COLUNAS_CATEGORICAS = [coluna for coluna, tipo in COLUNAS_CANONICAS.items() if tipo == 'texto']
+
+# Definição das categorias dos eventos
+CATEGORIAS_EVENTOS = {
+    'Crimes Violentos Letais': [
+        'Homicídio doloso',
+        'Feminicídio',
+        'Lesão corporal seguida de morte',
+        'Roubo seguido de morte (latrocínio)',
+        'Morte por intervenção de Agente do Estado'
+    ],
+    'Crimes Violentos Não Letais': [
+        'Tentativa de homicídio',
+        'Tentativa de feminicídio',
+        'Estupro',
+        'Estupro de vulnerável'
+    ],
+    'Crimes Contra Patrimônio': [
+        'Roubo de veículo',
+        'Furto de veículo',
+        'Roubo a instituição financeira',
+        'Roubo de carga'
+    ],
+    'Tráfico e Apreensões': [
+        'Tráfico de drogas',
+        'Apreensão de Cocaína',
+        'Apreensão de Maconha',
+        'Arma de Fogo Apreendida'
+    ],
+    'Mortes Diversas': [
+        'Morte no trânsito ou em decorrência dele (exceto homicídio doloso)',
+        'Mortes a esclarecer (sem indício de crime)',
+        'Suicídio',
+        'Suicídio de Agente do Estado',
+        'Morte de Agente do Estado'
+    ],
+    'Outros': [
+        'Pessoa Desaparecida',
+        'Pessoa Localizada',
+        'Mandado de prisão cumprido',
+        'Busca e salvamento',
+        'Combate a incêndios',
+        'Atendimento pré-hospitalar',
+        'Emissão de Alvarás de licença',
+        'Realização de vistorias'
+    ]
+}
+
+
+def compilar_indice_eventos(caminho_arquivo:str=None) -> dict:
+    """
+    Monta o índice reverso evento -> categoria a partir de CATEGORIAS_EVENTOS
+    
+    Se `caminho_arquivo` apontar para um JSON no formato {categoria: [eventos]}, os eventos
+    do arquivo são acrescentados ao índice (e têm prioridade sobre os definidos no código),
+    permitindo classificar novos eventos do Sinesp sem alterar o código.
+    """
+    indice = {}
+    for categoria, eventos in CATEGORIAS_EVENTOS.items():
+        for evento in eventos:
+            # Em caso de evento repetido vale a primeira categoria, como na busca linear
+            indice.setdefault(evento, categoria)
+    
+    if caminho_arquivo:
+        try:
+            with open(caminho_arquivo, encoding='utf-8') as arquivo:
+                categorias_extras = json.load(arquivo)
+            for categoria, eventos in categorias_extras.items():
+                for evento in eventos:
+                    indice[evento] = categoria
+            log.info(f"Categorias de eventos carregadas de {caminho_arquivo}")
+        except FileNotFoundError:
+            log.warning(f"Arquivo de categorias de eventos {caminho_arquivo} não encontrado. Usando apenas as categorias padrão.")
+    
+    return indice
+
+
+# Índice evento -> categoria, compilado uma única vez na importação do módulo
+INDICE_EVENTOS = compilar_indice_eventos(CONFIG['arquivo_categorias_eventos'])
+
+
+def classificar_evento(evento: str) -> str:
+    """
+    Retorna a categoria de um evento, ou 'Não Classificado'
+    """
+    return INDICE_EVENTOS.get(evento, 'Não Classificado')
+
+
+def _recodificar_categorias(serie:pd.Series, valores_novos, valor_ausente=None) -> pd.Series:
+    """
+    Cria uma coluna categórica a partir de outra, trocando o valor de cada categoria
+    
+    `valores_novos` tem um valor por categoria de `serie` (na mesma ordem); categorias que
+    passam a ter o mesmo valor são unidas. Registros sem valor recebem `valor_ausente`.
+    O custo depende do número de categorias, não do número de registros.
+    """
+    # A última posição corresponde ao código -1 (registro sem valor)
+    codigos_novos, categorias_novas = pd.factorize(pd.Index(list(valores_novos) + [valor_ausente]))
+    codigos = codigos_novos[serie.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codigos, categorias_novas), index=serie.index, name=serie.name)
+
+
+def _reduzir_numerica(serie:pd.Series) -> pd.Series:
+    """
+    Converte a coluna para número (inválidos viram 0) no menor tipo que representa os valores:
+    inteiro se todos os valores forem inteiros, float32 se não houver perda, senão float64
+    """
+    serie = pd.to_numeric(serie, errors='coerce').fillna(0)
+    
+    inteira = pd.to_numeric(serie, downcast='integer')
+    if inteira.dtype.kind in 'iu':
+        return inteira
+    
+    reduzida = serie.astype('float32')
+    if (reduzida.astype('float64') == serie).all():
+        return reduzida
+    return serie
+
+
+# Formatos tentados, em ordem, nas datas em texto quando CONFIG['formato_data'] é None
+FORMATOS_DATA = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%Y-%m', '%m/%Y')
+
+# Números de série do Excel aceitos como data (dias desde 30/12/1899): 03/10/1954 a 10/01/2119.
+# Outros números (ex: só o ano, 2022) não são datas e ficam nulos
+SERIAL_EXCEL_MINIMO, SERIAL_EXCEL_MAXIMO = 20000, 80000
+
+# Datas já interpretadas ((tipo do valor, valor, formato_data) -> Timestamp ou NaT), reaproveitadas
+# entre os blocos e arquivos do mesmo processo; esvaziado ao passar do limite
+_datas_interpretadas = {}
+_NAO_INTERPRETADA = object()
+LIMITE_DATAS_INTERPRETADAS = 100000
+
+
+def _numero(valor):
+    """
+    Valor numérico (número ou texto numérico) como float, ou None se não for um número
+    """
+    if isinstance(valor, (bool, np.bool_)):
+        return None
+    if isinstance(valor, numbers.Real):
+        return float(valor)
+    if isinstance(valor, str):
+        try:
+            return float(valor.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def _serial_excel(numero:float):
+    """
+    Data do número de série do Excel, ou NaT fora da faixa aceita
+    """
+    if not SERIAL_EXCEL_MINIMO <= numero <= SERIAL_EXCEL_MAXIMO:
+        return pd.NaT
+    return pd.Timestamp('1899-12-30') + pd.to_timedelta(numero, unit='D')
+
+
+def _interpretar_textos(textos:list, formato:str=None) -> pd.DatetimeIndex:
+    """
+    Converte datas em texto com formatos explícitos: formato (CONFIG['formato_data']) ou, sem ele,
+    cada um dos FORMATOS_DATA nos valores que os anteriores não converteram. O que sobrar passa
+    pela inferência do pandas (dia antes do mês, como nas datas brasileiras).
+    """
+    textos = pd.Index(textos, dtype=object).str.strip()
+    datas = pd.Series(pd.NaT, index=range(len(textos)), dtype='datetime64[ns]')
+    
+    for candidato in ((formato,) if formato else FORMATOS_DATA):
+        faltantes = datas.isna().to_numpy()
+        if not faltantes.any():
+            break
+        datas[faltantes] = pd.to_datetime(textos[faltantes], format=candidato, errors='coerce')
+    
+    faltantes = datas.isna().to_numpy()
+    if faltantes.any() and not formato:
+        datas[faltantes] = pd.to_datetime(textos[faltantes], format='mixed', dayfirst=True, errors='coerce')
+    return pd.DatetimeIndex(datas)
+
+
+def _interpretar_datas(valores) -> list:
+    """
+    Converte valores distintos de data (datas, números de série do Excel ou texto) para Timestamp
+    Valores já convertidos antes (ver _datas_interpretadas) não são convertidos de novo. A chave
+    inclui o tipo do valor (1, 1.0 e True são iguais para o Python) e o CONFIG['formato_data'].
+    
+    Returns:
+        list: Um Timestamp (ou NaT, se o valor não for uma data) por valor, na mesma ordem
+    """
+    if len(_datas_interpretadas) > LIMITE_DATAS_INTERPRETADAS:
+        _datas_interpretadas.clear()
+    
+    # O memo é compartilhado pelas threads produtoras da carga paralela: o resultado desta
+    # chamada é montado em um dicionário próprio, que não depende do memo continuar cheio
+    formato = CONFIG['formato_data']
+    chaves = [(type(valor), valor, formato) for valor in valores]
+    interpretadas = {}
+    textos = []
+    for chave in dict.fromkeys(chaves):
+        data = _datas_interpretadas.get(chave, _NAO_INTERPRETADA)
+        if data is not _NAO_INTERPRETADA:
+            interpretadas[chave] = data
+            continue
+        valor = chave[1]
+        numero = _numero(valor)
+        if numero is not None:
+            interpretadas[chave] = _serial_excel(numero)
+        elif isinstance(valor, str):
+            textos.append(chave)
+        elif isinstance(valor, (datetime.date, np.datetime64)):
+            # datetime, date ou Timestamp
+            interpretadas[chave] = pd.to_datetime(valor, errors='coerce')
+        else:
+            # bool ou outro valor que não é data
+            interpretadas[chave] = pd.NaT
+    
+    if textos:
+        interpretadas.update(zip(textos, _interpretar_textos([chave[1] for chave in textos], formato)))
+    _datas_interpretadas.update(interpretadas)
+    return [interpretadas[chave] for chave in chaves]
+
 
+def _fatorar_datas(serie:pd.Series) -> tuple:
+    """
+    pd.factorize dos valores da coluna de datas, separando valores iguais de tipos diferentes
+    (1, 1.0 e True) quando a coluna mistura números com outros tipos
+
+    Returns:
+        tuple: (código de cada registro, -1 sem valor; lista dos valores distintos)
+    """
+    codigos, valores = pd.factorize(serie)
+    if serie.dtype != object or not any(isinstance(valor, numbers.Number) for valor in valores):
+        return codigos, list(valores)
+
+    # Código do valor combinado com o código do tipo; cada par distinto volta ao primeiro registro com ele
+    codigos_tipo, tipos = pd.factorize(serie.map(type, na_action='ignore'))
+    combinados = pd.Series(codigos.astype('int64') * (len(tipos) + 1) + codigos_tipo).where(codigos >= 0)
+    codigos, _ = pd.factorize(combinados)
+    distintos, primeiros = np.unique(codigos, return_index=True)
+    primeiros = primeiros[distintos >= 0]
+    valores_originais = serie.to_numpy()
+    return codigos, [valores_originais[posicao] for posicao in primeiros]
+
+
+def _converter_datas(df:pd.DataFrame):
+    """
+    Converte a coluna de datas e extrai ano e mês, alterando o próprio DataFrame
+    
+    As planilhas têm poucas dezenas de datas distintas (uma por mês): cada valor distinto é
+    convertido uma vez, com formato explícito ou número de série do Excel, e o resultado é
+    distribuído pelos registros. Valores que não são datas ficam nulos e são informados no log.
+    """
+    # Verificar se a coluna existe antes de transformar
+    if 'data_referencia' not in df.columns:
+        log.warning("Coluna 'data_referencia' não encontrada. Pulando transformação de datas.")
+        return
+    
+    # Extrair componentes da data para análise temporal
+    # (inteiros pequenos que aceitam nulo, como as colunas SMALLINT da tabela, mesmo com datas inválidas)
+    if pd.api.types.is_datetime64_any_dtype(df['data_referencia']):
+        # Lida como data (ex: células de data do xlsx): nada a converter
+        df['ano'] = df['data_referencia'].dt.year.astype('Int16')
+        df['mes'] = df['data_referencia'].dt.month.astype('Int8')
+    else:
+        # A última posição corresponde ao código -1 (registro sem data)
+        codigos, valores = _fatorar_datas(df['data_referencia'])
+        datas_distintas = pd.DatetimeIndex(_interpretar_datas(valores) + [pd.NaT])
+        datas = pd.Series(datas_distintas.to_numpy()[codigos], index=df.index, name='data_referencia')
+        
+        invalidas = [posicao for posicao in range(len(valores)) if pd.isna(datas_distintas[posicao])]
+        if invalidas:
+            registros_invalidos = pd.Series(codigos).isin(invalidas).to_numpy()
+            exemplos = ', '.join(repr(valores[posicao]) for posicao in invalidas[:5])
+            origem = ''
+            if 'nome_arquivo' in df.columns:
+                origem = f" em {', '.join(map(str, df.loc[registros_invalidos, 'nome_arquivo'].unique()))}"
+            log.warning(f"{registros_invalidos.sum()} registros{origem} com data_referencia que não é uma data "
+                        f"(ficam sem data): {exemplos}{' ...' if len(invalidas) > 5 else ''}")
+        df['data_referencia'] = datas
+        # Ano e mês também calculados só nas datas distintas
+        df['ano'] = pd.Series(pd.array(datas_distintas.year, dtype='Int16')[codigos], index=df.index)
+        df['mes'] = pd.Series(pd.array(datas_distintas.month, dtype='Int8')[codigos], index=df.index)
+
+
+def _ajustar_colunas(df:pd.DataFrame):
+    """
+    Ajusta os tipos de colunas e trata valores faltantes, alterando o próprio DataFrame
+    
+    Colunas numéricas são reduzidas ao menor tipo que comporta os valores e colunas de
+    baixa cardinalidade viram 'category'; as normalizações de texto e os mapeamentos de
+    região/estado são feitos sobre as categorias (valores únicos), não sobre cada registro.
+    Com CONFIG['tabelas_dimensao'], em vez de região e nome do estado são adicionadas as
+    chaves das dimensões (codigo_uf e codigo_municipio, ver dimensoes.adicionar_chaves).
+    """
+    # Converter colunas numéricas
+    for col in COLUNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = _reduzir_numerica(df[col])
+    
+    # Para colunas categóricas
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            serie = df[col].astype('category')
+            df[col] = _recodificar_categorias(serie, serie.cat.categories, valor_ausente='Não informado')
+    
+    # Remover a coluna 'formulario' se ela existir
+    if 'formulario' in df.columns:
+        df.drop(columns='formulario', inplace=True)
+    
     # Muda UFs para maiúsculo
-    if 'uf' in df_ajustado.columns:
-        df_ajustado['uf'] = df_ajustado['uf'].str.upper()
+    if 'uf' in df.columns:
+        df['uf'] = _recodificar_categorias(df['uf'], pd.Series(df['uf'].cat.categories).str.upper())
     
     # nomes dos municípios primeira letra maiúscula
-    if 'municipio' in df_ajustado.columns:
-        df_ajustado['municipio'] = df_ajustado['municipio'].str.title()
-
-    # Adicionar região e nome do estado - método otimizado
-    if 'uf' in df_ajustado.columns:
-        # Dicionários para mapeamento
-        mapa_regioes = {
-            'AC': 'Norte', 'AM': 'Norte', 'AP': 'Norte', 'PA': 'Norte', 'RO': 'Norte', 'RR': 'Norte', 'TO': 'Norte',
-            'AL': 'Nordeste', 'BA': 'Nordeste', 'CE': 'Nordeste', 'MA': 'Nordeste', 'PB': 'Nordeste',
-            'PE': 'Nordeste', 'PI': 'Nordeste', 'RN': 'Nordeste', 'SE': 'Nordeste',
-            'DF': 'Centro-Oeste', 'GO': 'Centro-Oeste', 'MS': 'Centro-Oeste', 'MT': 'Centro-Oeste',
-            'ES': 'Sudeste', 'MG': 'Sudeste', 'RJ': 'Sudeste', 'SP': 'Sudeste',
-            'PR': 'Sul', 'RS': 'Sul', 'SC': 'Sul'
-        }
-        
-        mapa_estados = {
-            'AC': 'Acre',
-            'AL': 'Alagoas',
-            'AP': 'Amapá',
-            'AM': 'Amazonas',
-            'BA': 'Bahia',
-            'CE': 'Ceará',
-            'DF': 'Distrito Federal',
-            'ES': 'Espírito Santo',
-            'GO': 'Goiás',
-            'MA': 'Maranhão',
-            'MT': 'Mato Grosso',
-            'MS': 'Mato Grosso do Sul',
-            'MG': 'Minas Gerais',
-            'PA': 'Pará',
-            'PB': 'Paraíba',
-            'PR': 'Paraná',
-            'PE': 'Pernambuco',
-            'PI': 'Piauí',
-            'RJ': 'Rio de Janeiro',
-            'RN': 'Rio Grande do Norte',
-            'RS': 'Rio Grande do Sul',
-            'RO': 'Rondônia',
-            'RR': 'Roraima',
-            'SC': 'Santa Catarina',
-            'SP': 'São Paulo',
-            'SE': 'Sergipe',
-            'TO': 'Tocantins'
-        }
-        
-        # Usar .map() para aplicar os dicionários - muito mais eficiente que iterrows
-        df_ajustado['regiao'] = df_ajustado['uf'].map(mapa_regioes).fillna('Não informado')
-        df_ajustado['nome_estado'] = df_ajustado['uf'].map(mapa_estados).fillna('Não informado')
+    if 'municipio' in df.columns:
+        df['municipio'] = _recodificar_categorias(df['municipio'], pd.Series(df['municipio'].cat.categories).str.title())
+    
+    if CONFIG['tabelas_dimensao']:
+        adicionar_chaves(df)
+        return
+    
+    # Adicionar região e nome do estado a partir das categorias da UF
+    if 'uf' in df.columns:
+        ufs = pd.Series(df['uf'].cat.categories)
+        df['regiao'] = _recodificar_categorias(df['uf'], ufs.map(MAPA_REGIOES).fillna('Não informado'), 'Não informado')
+        df['nome_estado'] = _recodificar_categorias(df['uf'], ufs.map(MAPA_ESTADOS).fillna('Não informado'), 'Não informado')
         
         log.info(f"Adicionadas colunas 'regiao' e 'nome_estado' ao DataFrame")
+
+
+def _categorizar_eventos(df:pd.DataFrame):
+    """
+    Adiciona a coluna de categoria dos eventos, alterando o próprio DataFrame
+    """
+    # Verificar se a coluna evento existe
+    if 'evento' not in df.columns:
+        log.warning("Coluna 'evento' não encontrada. Pulando categorização de eventos.")
+        return
+    
+    eventos = df['evento'] if isinstance(df['evento'].dtype, pd.CategoricalDtype) else df['evento'].astype('category')
     
+    # Classificar apenas os eventos distintos (map vetorizado no índice) e repassar aos registros pelos códigos
+    categorias = pd.Series(eventos.cat.categories).map(INDICE_EVENTOS).fillna('Não Classificado')
+    df['categoria'] = _recodificar_categorias(eventos, categorias, 'Não Classificado')
+
+
+@log_decorator
+def ajustar_colunas(dados:pd.DataFrame) -> pd.DataFrame:
+    """
+    Ajusta os tipos de colunas e trata valores faltantes
+    """
+    # Criar uma cópia para não modificar o original
+    df_ajustado = dados.copy()
+    _ajustar_colunas(df_ajustado)
     return df_ajustado
 
 @log_decorator
@@ -346,19 +846,8 @@ def transformar_datas(dados_planilha:pd.DataFrame) -> pd.DataFrame:
     """
     # Criar uma cópia para não modificar o original
     df_prep_data = dados_planilha.copy()
-
-    # Verificar se a coluna existe antes de transformar
-    if 'data_referencia' not in df_prep_data.columns:
-        log.warning("Coluna 'data_referencia' não encontrada. Pulando transformação de datas.")
-        return df_prep_data
+    _converter_datas(df_prep_data)
     
-    # Converter a coluna de data para datetime
-    df_prep_data['data_referencia'] = pd.to_datetime(df_prep_data['data_referencia'], errors='coerce')
-        
-    # Extrair componentes da data para análise temporal
-    df_prep_data['ano'] = df_prep_data['data_referencia'].dt.year
-    df_prep_data['mes'] = df_prep_data['data_referencia'].dt.month
-
     log.info(f"Transformação de datas realizada com sucesso")
     return df_prep_data
 
@@ -367,71 +856,143 @@ def categorizar_eventos(df:pd.DataFrame) -> pd.DataFrame:
     """
     Adiciona uma coluna de categoria aos eventos criminais para facilitar a análise
     """
-    # Verificar se a coluna evento existe
-    if 'evento' not in df.columns:
-        log.warning("Coluna 'evento' não encontrada. Pulando categorização de eventos.")
-        return df
-        
-    # Definição das categorias
-    categorias_eventos = {
-        'Crimes Violentos Letais': [
-            'Homicídio doloso',
-            'Feminicídio',
-            'Lesão corporal seguida de morte',
-            'Roubo seguido de morte (latrocínio)',
-            'Morte por intervenção de Agente do Estado'
-        ],
-        'Crimes Violentos Não Letais': [
-            'Tentativa de homicídio',
-            'Tentativa de feminicídio',
-            'Estupro',
-            'Estupro de vulnerável'
-        ],
-        'Crimes Contra Patrimônio': [
-            'Roubo de veículo',
-            'Furto de veículo',
-            'Roubo a instituição financeira',
-            'Roubo de carga'
-        ],
-        'Tráfico e Apreensões': [
-            'Tráfico de drogas',
-            'Apreensão de Cocaína',
-            'Apreensão de Maconha',
-            'Arma de Fogo Apreendida'
-        ],
-        'Mortes Diversas': [
-            'Morte no trânsito ou em decorrência dele (exceto homicídio doloso)',
-            'Mortes a esclarecer (sem indício de crime)',
-            'Suicídio',
-            'Suicídio de Agente do Estado',
-            'Morte de Agente do Estado'
-        ],
-        'Outros': [
-            'Pessoa Desaparecida',
-            'Pessoa Localizada',
-            'Mandado de prisão cumprido',
-            'Busca e salvamento',
-            'Combate a incêndios',
-            'Atendimento pré-hospitalar',
-            'Emissão de Alvarás de licença',
-            'Realização de vistorias'
-        ]
-    }
-   
-    # Função auxiliar para classificar
-    def classificar_evento(evento: str) -> str:
-        for categoria, eventos in categorias_eventos.items():
-            if evento in eventos:
-                return categoria
-        return 'Não Classificado'
-    
     # Cópia para não modificar o original
     df_cat = df.copy()
+    _categorizar_eventos(df_cat)
+    return df_cat
+
+
+@log_decorator
+def transformar_dados(df:pd.DataFrame) -> pd.DataFrame:
+    """
+    Etapa única de transformação (datas -> colunas -> eventos) que altera o próprio DataFrame
+    Equivale a categorizar_eventos(ajustar_colunas(transformar_datas(df))), sem as três cópias
     
-    # Adicionar categoria a cada registro
-    df_cat['categoria'] = df_cat['evento'].apply(classificar_evento)
+    Returns:
+        DataFrame: O mesmo DataFrame recebido, já transformado
+    """
+    # Cada passo é medido com o nome da função pública equivalente
+    for etapa, passo in (('transformar_datas', _converter_datas), ('ajustar_colunas', _ajustar_colunas),
+                         ('categorizar_eventos', _categorizar_eventos)):
+        with metricas.medir(etapa, linhas_entrada=len(df)) as medicao:
+            passo(df)
+            medicao['linhas_saida'] = len(df)
     
-    return df_cat
+    log.info(f"Transformação de {len(df)} registros realizada com sucesso")
+    return df
+
+
+def transformar_em_blocos(blocos):
+    """
+    Aplica a cadeia de transformações (datas -> colunas -> eventos) a cada bloco extraído
+    Generator: cada bloco é transformado apenas quando o carregamento pede o próximo
+    """
+    for bloco in blocos:
+        yield transformar_dados(bloco)
+
+
+@log_decorator
+def processar_arquivo(arquivo:str, pasta_blocos:str, tamanho_bloco:int=50000) -> tuple:
+    """
+    Extrai e transforma um único arquivo em blocos (datas -> colunas -> eventos)
+    Função de nível de módulo para poder ser executada em um processo separado.
+    Cada bloco transformado é gravado em `pasta_blocos` assim que fica pronto, de modo que
+    nem o processo filho nem o principal mantêm o arquivo inteiro na memória.
+    
+    Args:
+        arquivo: Caminho completo do arquivo
+        pasta_blocos: Pasta temporária onde os blocos transformados são gravados
+        tamanho_bloco: Número máximo de registros por bloco
+    
+    Returns:
+        tuple: (caminhos dos blocos gravados, em ordem; métricas do processo filho)
+    """
+    caminhos = []
+    
+    # As métricas do processo filho voltam ao processo principal junto com os caminhos dos blocos
+    with metricas.capturar() as metricas_arquivo:
+        for bloco in transformar_em_blocos(extrair_arquivo_em_blocos(arquivo, tamanho_bloco)):
+            caminho = os.path.join(pasta_blocos, f"{len(caminhos):06d}.pkl")
+            bloco.to_pickle(caminho)
+            caminhos.append(caminho)
+    
+    return caminhos, metricas_arquivo
+
+
+def _blocos_gravados(caminhos:list, pasta_blocos:str):
+    """
+    Lê de volta, um por vez, os blocos gravados por processar_arquivo
+    Generator: cada bloco é apagado depois de entregue, e a pasta temporária é removida
+    ao fim da leitura ou quando o generator é descartado (ex: erro na carga do arquivo).
+    """
+    try:
+        for caminho in caminhos:
+            bloco = pd.read_pickle(caminho)
+            os.remove(caminho)
+            yield bloco
+    finally:
+        shutil.rmtree(pasta_blocos, ignore_errors=True)
+
+
+def transformar_em_paralelo(pasta:str, arquivos_para_processar=None, num_processos:int=4, tamanho_bloco:int=50000):
+    """
+    Extrai e transforma cada arquivo em um processo separado (ProcessPoolExecutor)
+    Generator: entrega pares (nome do arquivo, blocos transformados do arquivo) na ordem em que
+    os arquivos terminam. Os blocos ficam em disco até a carga pedi-los, um por vez.
+    No máximo `num_processos` arquivos ficam em processamento ao mesmo tempo, para que
+    resultados prontos não se acumulem enquanto a carga está ocupada.
+    Um erro em um arquivo é registrado no log e não interrompe os demais.
+    """
+    arquivos = _listar_arquivos(pasta, arquivos_para_processar)
+    
+    if not arquivos:
+        log.warning(f"Nenhum arquivo de dados encontrado para processar em: {pasta}")
+        return
+    
+    log.info(f"Processando {len(arquivos)} arquivos com {num_processos} processos em paralelo")
+    
+    pendentes = list(reversed(arquivos))
+    with ProcessPoolExecutor(max_workers=num_processos) as executor:
+        em_execucao = {}
+        while pendentes or em_execucao:
+            # Manter o pool ocupado sem submeter todos os arquivos de uma vez
+            while pendentes and len(em_execucao) < num_processos:
+                arquivo = pendentes.pop()
+                pasta_blocos = tempfile.mkdtemp(prefix='etl_blocos_')
+                futuro = executor.submit(processar_arquivo, arquivo, pasta_blocos, tamanho_bloco)
+                em_execucao[futuro] = (arquivo, pasta_blocos)
+            
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                arquivo, pasta_blocos = em_execucao.pop(futuro)
+                try:
+                    caminhos, metricas_arquivo = futuro.result()
+                except Exception as e:
+                    log.error(f"Erro ao processar o arquivo {arquivo}: {str(e)}")
+                    shutil.rmtree(pasta_blocos, ignore_errors=True)
+                    continue
+                
+                metricas.incorporar(metricas_arquivo)
+                
+                if not caminhos:
+                    shutil.rmtree(pasta_blocos, ignore_errors=True)
+                    continue
+                
+                yield os.path.basename(arquivo), _blocos_gravados(caminhos, pasta_blocos)
+
+
+# Eventos das agregações de foco (foco_uf e foco_temporal)
+EVENTOS_FOCO = [
+    'Feminicídio', 
+    'Tentativa de feminicídio',
+    'Suicídio',
+    'Homicídio doloso',
+    'Estupro',
+    'Estupro de vulnerável',
+    'Roubo de veículo',
+    'Furto de veículo'
+]
+AGREGACOES_FOCO = ('foco_uf', 'foco_temporal')
 
 
 @log_decorator
@@ -439,6 +1000,7 @@ def criar_agregacoes(df:pd.DataFrame) -> dict:
     """
     Cria agregações úteis para análises
     Retorna um dicionário com diferentes DataFrames agregados
+    (observed=True: com colunas categóricas, apenas as combinações presentes nos dados)
     """
     agregacoes = {}
     
@@ -449,7 +1011,7 @@ def criar_agregacoes(df:pd.DataFrame) -> dict:
         
         if colunas_disponiveis:
             agg_dict = {col: 'sum' for col in colunas_disponiveis}
-            agg_uf_evento = df.groupby(['uf', 'evento', 'categoria']).agg(agg_dict).reset_index()
+            agg_uf_evento = df.groupby(['uf', 'evento', 'categoria'], observed=True).agg(agg_dict).reset_index()
             agregacoes['uf_evento'] = agg_uf_evento
     
     # Agregação temporal (por mês e ano)
@@ -459,23 +1021,12 @@ def criar_agregacoes(df:pd.DataFrame) -> dict:
         
         if colunas_disponiveis:
             agg_dict = {col: 'sum' for col in colunas_disponiveis}
-            agg_temporal = df.groupby(['ano', 'mes', 'evento', 'categoria']).agg(agg_dict).reset_index()
+            agg_temporal = df.groupby(['ano', 'mes', 'evento', 'categoria'], observed=True).agg(agg_dict).reset_index()
             agregacoes['temporal'] = agg_temporal
     
     # Agregação para foco específico nas categorias solicitadas
     if 'evento' in df.columns:
-        categorias_foco = [
-            'Feminicídio', 
-            'Tentativa de feminicídio',
-            'Suicídio',
-            'Homicídio doloso',
-            'Estupro',
-            'Estupro de vulnerável',
-            'Roubo de veículo',
-            'Furto de veículo'
-        ]
-        
-        df_foco = df[df['evento'].isin(categorias_foco)]
+        df_foco = df[df['evento'].isin(EVENTOS_FOCO)]
         if not df_foco.empty:
             # Por UF
             if 'uf' in df.columns:
@@ -484,7 +1035,7 @@ def criar_agregacoes(df:pd.DataFrame) -> dict:
                 
                 if colunas_disponiveis:
                     agg_dict = {col: 'sum' for col in colunas_disponiveis}
-                    agg_foco_uf = df_foco.groupby(['uf', 'evento']).agg(agg_dict).reset_index()
+                    agg_foco_uf = df_foco.groupby(['uf', 'evento'], observed=True).agg(agg_dict).reset_index()
                     agregacoes['foco_uf'] = agg_foco_uf
             
             # Temporal
@@ -494,21 +1045,56 @@ def criar_agregacoes(df:pd.DataFrame) -> dict:
                 
                 if colunas_disponiveis:
                     agg_dict = {col: 'sum' for col in colunas_disponiveis}
-                    agg_foco_temporal = df_foco.groupby(['ano', 'mes', 'evento']).agg(agg_dict).reset_index()
+                    agg_foco_temporal = df_foco.groupby(['ano', 'mes', 'evento'], observed=True).agg(agg_dict).reset_index()
                     agregacoes['foco_temporal'] = agg_foco_temporal
     
     log.info(f"Criadas {len(agregacoes)} agregações para análise")
     return agregacoes
 
 
+def _inserir_com_copy(tabela, conn, colunas, linhas):
+    """
+    Método de inserção para o DataFrame.to_sql que usa COPY ... FROM STDIN do PostgreSQL
+    As linhas de cada chunk são escritas em um buffer CSV em memória e enviadas com copy_expert
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(linhas)
+    buffer.seek(0)
+    
+    colunas_sql = ', '.join(f'"{coluna}"' for coluna in colunas)
+    nome_tabela = f'"{tabela.schema}"."{tabela.name}"' if tabela.schema else f'"{tabela.name}"'
+    
+    conexao_dbapi = conn.connection
+    with conexao_dbapi.cursor() as cursor:
+        cursor.copy_expert(f"COPY {nome_tabela} ({colunas_sql}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
 @log_decorator
-def salvar_no_banco(df, tabela_nome, engine, if_exists='replace'):
+def salvar_no_banco(df, tabela_nome, engine, if_exists='replace', metodo_carga='copy', schema='public'):
     """
     carrega o DataFrame no banco de dados
+    
+    Com metodo_carga 'copy' e PostgreSQL (psycopg2), os dados são enviados com COPY FROM STDIN.
+    Para outros bancos, ou com metodo_carga 'insert', usa os INSERTs em lote do to_sql.
+    schema=None grava na tabela visível pelo search_path (ex: uma tabela temporária).
     """
+    # As colunas numéricas chegam com o menor tipo que comporta cada bloco (int8, float32...);
+    # ao criar a tabela, usar tipos que comportem os valores dos blocos seguintes
+    tipos_colunas = {}
+    for col, tipo in df.dtypes.items():
+        if tipo.kind in 'iu':
+            tipos_colunas[col] = sa.Integer()
+        elif tipo.kind == 'f':
+            tipos_colunas[col] = sa.Float(precision=53)
+    
     try:
-        df.to_sql(tabela_nome, engine, if_exists=if_exists, index=False, 
-                 schema='public', chunksize=1000)
+        with metricas.medir('salvar_no_banco', linhas_entrada=len(df)):
+            if metodo_carga == 'copy' and engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2':
+                df.to_sql(tabela_nome, engine, if_exists=if_exists, index=False, 
+                         schema=schema, chunksize=50000, method=_inserir_com_copy, dtype=tipos_colunas)
+            else:
+                df.to_sql(tabela_nome, engine, if_exists=if_exists, index=False, 
+                         schema=schema, chunksize=1000, dtype=tipos_colunas)
         log.info(f"Dados salvos com sucesso na tabela {tabela_nome}")
         return True
     except Exception as e:
@@ -520,10 +1106,12 @@ def salvar_no_banco(df, tabela_nome, engine, if_exists='replace'):
 def criar_conexao_bd(tipo_bd, usuario, senha, host, porta, nome_bd):
     """
     Cria uma conexão com o banco de dados
+    A engine (e seu pool de conexões) é criada uma vez por processo e reaproveitada nas
+    chamadas seguintes; o pool é configurado pelo CONFIG (ver banco.criar_engine)
     """
     try:
         string_conexao = f"postgresql+psycopg2://{usuario}:{senha}@{host}:{porta}/{nome_bd}"   
-        engine = sa.create_engine(string_conexao)
+        engine = criar_engine(string_conexao)
         log.info(f"Conexão com banco de dados {tipo_bd} em {host}:{porta} estabelecida com sucesso")
         return engine
     except Exception as e:
@@ -533,53 +1121,430 @@ def criar_conexao_bd(tipo_bd, usuario, senha, host, porta, nome_bd):
 
 
 @log_decorator
-def obter_arquivos_processados(engine, nome_tabela='dados_seguranca_publica'):
+def obter_arquivos_processados(engine, nome_tabela='dados_seguranca_publica', inspector=None):
     """
-    Consulta o banco de dados para obter a lista de arquivos já processados.
+    Consulta a tabela de controle para obter os arquivos já carregados por completo.
+    
+    Na primeira execução depois da criação da tabela de controle, ela é preenchida a partir
+    dos arquivos presentes na tabela principal (única vez em que a tabela principal é lida).
     
     Args:
         engine: Conexão com o banco de dados
-        nome_tabela: Nome da tabela onde os arquivos processados estão armazenados
+        nome_tabela: Nome da tabela onde os dados dos arquivos estão armazenados
+        inspector: Inspector do SQLAlchemy a reaproveitar (opcional)
         
     Returns:
-        set: Conjunto de nomes de arquivos que já foram processados
+        dict: Nome de cada arquivo já processado -> hash do conteúdo carregado
     """
     try:
         
         # Verificar se a tabela existe
-        inspector = sa.inspect(engine)
+        inspector = inspector or sa.inspect(engine)
         tabelas_existentes = inspector.get_table_names(schema='public')
         
         if nome_tabela not in tabelas_existentes:
             log.info(f"Tabela {nome_tabela} não existe no banco de dados")
-            return set()
+            return {}
         
-        # Verificar se a coluna nome_arquivo existe
-        colunas = inspector.get_columns(nome_tabela)
-        colunas_nomes = [col['name'] for col in colunas]
+        if TABELA_CONTROLE not in tabelas_existentes:
+            _migrar_controle_arquivos(engine, nome_tabela)
         
-        if 'nome_arquivo' not in colunas_nomes:
-            log.warning(f"Coluna 'nome_arquivo' não existe na tabela {nome_tabela}")
-            return set()
-        
-        # Consultar os arquivos já processados
-        query = f"SELECT DISTINCT nome_arquivo FROM {nome_tabela} WHERE nome_arquivo IS NOT NULL"
-        df_arquivos = pd.read_sql_query(query, engine)
+        with engine.connect() as conexao:
+            controle = obter_controle_arquivos(conexao)
         
-        arquivos_processados = set(df_arquivos['nome_arquivo'].tolist())
+        arquivos_processados = {nome: registro['hash_arquivo'] for nome, registro in controle.items()
+                                if registro['status'] == 'carregado'}
         log.info(f"Encontrados {len(arquivos_processados)} arquivos já processados no banco")
         
         return arquivos_processados
         
     except Exception as e:
         log.error(f"Erro ao consultar arquivos processados: {str(e)}")
-        return set()
+        return {}
+
+
+def _migrar_controle_arquivos(engine, nome_tabela):
+    """
+    Cria a tabela de controle para uma tabela principal carregada antes dela existir,
+    registrando os arquivos presentes e suas contagens de linhas (sem hash)
+    """
+    colunas = [col['name'] for col in sa.inspect(engine).get_columns(nome_tabela, schema='public')]
+    
+    with engine.begin() as conexao:
+        criar_controle_arquivos(conexao)
+        if 'nome_arquivo' in colunas:
+            consulta = (f"SELECT nome_arquivo, COUNT(*) AS linhas FROM {nome_tabela} "
+                        f"WHERE nome_arquivo IS NOT NULL GROUP BY nome_arquivo")
+            for nome_arquivo, linhas in conexao.execute(sa.text(consulta)):
+                registrar_arquivo(conexao, nome_arquivo, 'carregado', linhas=linhas)
+        else:
+            log.warning(f"Coluna 'nome_arquivo' não existe na tabela {nome_tabela}")
+    
+    log.info(f"Tabela de controle dos arquivos processados criada a partir da tabela {nome_tabela}")
+
+
+def _agregacoes_dos_arquivos(conexao, arquivos, nome_tabela) -> dict:
+    """
+    Calcula no banco (GROUP BY) as agregações dos registros dos arquivos, no mesmo formato
+    de criar_agregacoes: só os grupos são lidos, não os registros
+    """
+    colunas = {col['name'] for col in sa.inspect(conexao).get_columns(nome_tabela, schema='public')}
+    expressoes = {coluna: f"t.{coluna}" for coluna in colunas}
+    juncao = ''
+    # No modo de dimensões a tabela guarda codigo_uf: a sigla das agregações por UF vem de dim_uf
+    if 'uf' not in colunas and 'codigo_uf' in colunas:
+        expressoes['uf'] = 'd.uf'
+        juncao = f"LEFT JOIN {TABELA_DIM_UF} d ON d.codigo_uf = t.codigo_uf"
+    
+    agregacoes = {}
+    for nome, (_, chaves, medidas) in TABELAS_AGREGADAS.items():
+        medidas_disponiveis = [medida for medida in medidas if medida in colunas]
+        if not medidas_disponiveis or any(chave not in expressoes for chave in chaves):
+            continue
+        
+        # Grupos com chave nula ficam de fora, como no groupby de criar_agregacoes
+        condicoes = ["t.nome_arquivo IN :arquivos"] + [f"{expressoes[chave]} IS NOT NULL" for chave in chaves]
+        parametros = [sa.bindparam('arquivos', expanding=True)]
+        valores = {'arquivos': list(arquivos)}
+        if nome in AGREGACOES_FOCO:
+            condicoes.append("t.evento IN :eventos_foco")
+            parametros.append(sa.bindparam('eventos_foco', expanding=True))
+            valores['eventos_foco'] = EVENTOS_FOCO
+        
+        grupos = ', '.join(expressoes[chave] for chave in chaves)
+        somas = ', '.join(f"COALESCE(SUM(t.{medida}), 0) AS {medida}" for medida in medidas_disponiveis)
+        consulta = sa.text(
+            f"SELECT {', '.join(f'{expressoes[chave]} AS {chave}' for chave in chaves)}, {somas} "
+            f"FROM {nome_tabela} t {juncao} WHERE {' AND '.join(condicoes)} GROUP BY {grupos}"
+        ).bindparams(*parametros)
+        df = pd.read_sql(consulta, conexao, params=valores)
+        if not df.empty:
+            agregacoes[nome] = df
+    
+    return agregacoes
+
+
+def _remover_dados_arquivos(conexao, arquivos, nome_tabela):
+    """
+    Remove os registros dos arquivos na transação da conexão recebida
+    As agregações dos registros removidos são calculadas no banco antes da remoção.
+    
+    Returns:
+        tuple: (número de registros removidos, agregações dos registros removidos)
+    """
+    agregacoes_antigas = _agregacoes_dos_arquivos(conexao, arquivos, nome_tabela)
+    
+    resultado = conexao.execute(
+        sa.text(f"DELETE FROM {nome_tabela} WHERE nome_arquivo IN :arquivos")
+          .bindparams(sa.bindparam('arquivos', expanding=True)),
+        {'arquivos': list(arquivos)}
+    )
+    return resultado.rowcount, agregacoes_antigas
 
 
 @log_decorator
-def executar_etl(pasta_dados, tipo_bd, usuario, senha, host, porta, nome_bd, url_base=None):
+def remover_dados_arquivos(engine, arquivos, nome_tabela='dados_seguranca_publica'):
+    """
+    Remove da tabela os registros carregados a partir dos arquivos informados
+    Os agregados desses registros são subtraídos das tabelas de resumo na mesma transação.
+    
+    Returns:
+        bool: True se os registros foram removidos
+    """
+    try:
+        with engine.begin() as conexao:
+            removidos, agregacoes_antigas = _remover_dados_arquivos(conexao, arquivos, nome_tabela)
+            atualizar_agregacoes(conexao, agregacoes_antigas, sinal=-1)
+        log.info(f"Removidos {removidos} registros de {len(arquivos)} arquivos da tabela {nome_tabela}")
+        return True
+    except Exception as e:
+        log.error(f"Erro ao remover registros da tabela {nome_tabela}: {str(e)}")
+        return False
+
+
+@log_decorator
+def carregar_arquivo(engine, nome_arquivo, blocos, hash_arquivo=None, nome_tabela='dados_seguranca_publica',
+                     metodo_carga='copy', modo_reprocessamento='substituir'):
+    """
+    Carrega os blocos de um arquivo em uma única transação
+    
+    Na mesma transação: remove os registros de uma carga anterior do arquivo (se a tabela de
+    controle tiver registro dele), grava os blocos, aplica às tabelas de resumo a diferença
+    entre os agregados novos e os removidos e registra o arquivo como 'carregado'. Se qualquer
+    passo falhar, nada do arquivo fica gravado, a versão anterior continua valendo e o arquivo
+    é marcado com 'erro' para ser refeito.
+    
+    Com modo_reprocessamento 'mesclar' (só no PostgreSQL), um arquivo já carregado não é
+    removido e gravado de novo: os blocos vão para uma tabela temporária e só os registros
+    inseridos, alterados ou removidos na nova versão são aplicados (ver mesclar_tabela_carga),
+    assim como as tabelas de resumo só recebem os agregados desses registros.
+    
+    A tabela principal já deve existir (ver criar_tabela_principal). As colunas dos blocos que
+    não fazem parte dela são descartadas e, se ela for particionada, as partições dos anos
+    de cada bloco são criadas (em transação separada) antes da gravação.
+    
+    As tabelas de resumo só são tocadas no final da transação, de uma vez: cargas de arquivos
+    diferentes em paralelo só disputam os mesmos grupos nesse último passo.
+    
+    Args:
+        blocos: Iterável de DataFrames transformados do arquivo
+    
+    Returns:
+        int: Número de registros carregados, ou None em caso de falha
+    """
+    registros = 0
+    try:
+        with metricas.medir('carga') as medicao, engine.begin() as conexao:
+            colunas_tabela = {col['name'] for col in sa.inspect(conexao).get_columns(nome_tabela, schema='public')}
+            particionada = tabela_particionada(conexao, nome_tabela)
+            anos_com_particao = set()
+            agregacoes = []
+            tabela_carga = None
+            
+            if controle_existe(conexao):
+                anterior = obter_controle_arquivos(conexao, nome_arquivo).get(nome_arquivo)
+                if anterior is not None and anterior['linhas']:
+                    if modo_reprocessamento == 'mesclar':
+                        tabela_carga = criar_tabela_carga(conexao, nome_tabela)
+                    else:
+                        removidos, agregacoes_antigas = _remover_dados_arquivos(conexao, [nome_arquivo], nome_tabela)
+                        agregacoes.append((agregacoes_antigas, -1))
+                        log.info(f"Removidos {removidos} registros da carga anterior de {nome_arquivo}")
+            
+            for bloco in metricas.descontar_espera(blocos, medicao):
+                descartadas = [col for col in bloco.columns if col not in colunas_tabela]
+                inesperadas = [col for col in descartadas if 'codigo_municipio' not in colunas_tabela
+                               or col not in COLUNAS_SUBSTITUIDAS_POR_CHAVES]
+                if inesperadas and registros == 0:
+                    log.warning(f"Colunas de {nome_arquivo} fora do esquema da tabela descartadas: {', '.join(inesperadas)}")
+                if 'codigo_municipio' in colunas_tabela:
+                    # Municípios do bloco gravados na dimensão antes dos registros que apontam para eles
+                    garantir_municipios(engine, registros_municipio(bloco))
+                if particionada and 'ano' in bloco.columns:
+                    anos_novos = set(bloco['ano'].dropna().unique()) - anos_com_particao
+                    if anos_novos:
+                        garantir_particoes(engine, nome_tabela, anos_novos)
+                        anos_com_particao |= anos_novos
+                
+                registros_tabela = bloco.drop(columns=descartadas) if descartadas else bloco
+                if tabela_carga:
+                    salvo = salvar_no_banco(registros_tabela, tabela_carga, conexao, 'append', metodo_carga, schema=None)
+                else:
+                    salvo = salvar_no_banco(registros_tabela, nome_tabela, conexao, 'append', metodo_carga)
+                    agregacoes.append((criar_agregacoes(bloco), 1))
+                if not salvo:
+                    raise RuntimeError(f"Falha ao salvar um bloco de {nome_arquivo}")
+                registros += len(bloco)
+            
+            if registros == 0:
+                raise RuntimeError(f"Nenhum registro extraído de {nome_arquivo}")
+            
+            if tabela_carga:
+                with metricas.medir('mesclagem', linhas_entrada=registros) as medicao_mesclagem:
+                    contagens, antigos, novos = mesclar_tabela_carga(conexao, nome_tabela, tabela_carga, nome_arquivo)
+                    medicao_mesclagem['linhas_saida'] = contagens['inseridos'] + contagens['atualizados'] + contagens['removidos']
+                # No modo de dimensões a tabela guarda codigo_uf: a sigla é recolocada para as agregações por UF
+                if not antigos.empty:
+                    agregacoes.append((criar_agregacoes(restaurar_uf(antigos)), -1))
+                if not novos.empty:
+                    agregacoes.append((criar_agregacoes(restaurar_uf(novos)), 1))
+                log.info(f"Nova versão de {nome_arquivo} mesclada: {contagens['inseridos']} registros inseridos, "
+                         f"{contagens['atualizados']} atualizados, {contagens['removidos']} removidos e "
+                         f"{contagens['inalterados']} sem alteração")
+            
+            atualizar_agregacoes(conexao, combinar_agregacoes(agregacoes))
+            registrar_arquivo(conexao, nome_arquivo, 'carregado', hash_arquivo, registros)
+            medicao['linhas_entrada'] = medicao['linhas_saida'] = registros
+        
+        log.info(f"Arquivo {nome_arquivo} carregado na tabela {nome_tabela}: {registros} registros")
+        return registros
+    
+    except Exception as e:
+        log.error(f"Erro ao carregar o arquivo {nome_arquivo}, nenhuma alteração foi mantida: {str(e)}")
+        try:
+            registrar_arquivo(engine, nome_arquivo, 'erro')
+        except Exception as erro_controle:
+            log.warning(f"Não foi possível registrar a falha de {nome_arquivo}: {str(erro_controle)}")
+        return None
+
+
+# Marcador de fim dos blocos de um arquivo (e de fim dos trabalhos) nas filas da carga paralela
+_FIM_DA_FILA = object()
+
+
+def _blocos_da_fila(fila, fim_recebido):
+    """
+    Entrega os blocos recebidos pela fila até o marcador de fim (e então marca fim_recebido)
+    Uma exceção colocada na fila (erro na extração do arquivo) é relançada para o consumidor
+    """
+    while True:
+        item = fila.get()
+        if item is _FIM_DA_FILA:
+            fim_recebido.set()
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def _produzir_blocos(blocos, fila, cancelado):
+    """
+    Produtor de um arquivo na carga paralela: extrai e transforma os blocos em uma thread
+    própria e os entrega pela fila, até o fim do arquivo ou até a carga ser cancelada
+    """
+    try:
+        for bloco in _blocos_ate_erro(blocos):
+            if cancelado.is_set():
+                break
+            fila.put(bloco)
+    finally:
+        fila.put(_FIM_DA_FILA)
+
+
+def _escritor_banco(numero, engine, trabalhos, resultados, nome_tabela, metodo_carga, modo_reprocessamento,
+                    blocos_em_espera):
+    """
+    Worker da carga paralela: carrega arquivos da fila de trabalhos até receber o marcador de fim
+    Cada arquivo usa uma conexão do pool e uma transação própria (ver carregar_arquivo), e tem
+    seu próprio produtor (ver _produzir_blocos): enquanto o escritor grava um bloco, o produtor
+    já prepara os próximos, até `blocos_em_espera` blocos na fila.
+    """
+    arquivos = 0
+    registros_total = 0
+    tempo_ocupado = 0.0
+    
+    while True:
+        trabalho = trabalhos.get()
+        if trabalho is _FIM_DA_FILA:
+            break
+        nome_arquivo, hash_arquivo, blocos = trabalho
+        
+        inicio = time.perf_counter()
+        fila = queue.Queue(maxsize=blocos_em_espera)
+        cancelado = threading.Event()
+        fim_recebido = threading.Event()
+        produtor = threading.Thread(target=_produzir_blocos, args=(blocos, fila, cancelado),
+                                    name=f"produtor-{numero}", daemon=True)
+        produtor.start()
+        registros = carregar_arquivo(engine, nome_arquivo, _blocos_da_fila(fila, fim_recebido), hash_arquivo,
+                                     nome_tabela, metodo_carga, modo_reprocessamento)
+        
+        if registros is None:
+            # Avisar o produtor para parar e esvaziar a fila até o fim do arquivo,
+            # para que ele não fique bloqueado esperando espaço na fila
+            cancelado.set()
+            while not fim_recebido.is_set():
+                if fila.get() is _FIM_DA_FILA:
+                    fim_recebido.set()
+        else:
+            arquivos += 1
+            registros_total += registros
+        produtor.join()
+        tempo_ocupado += time.perf_counter() - inicio
+        resultados.append((nome_arquivo, registros))
+    
+    vazao = registros_total / tempo_ocupado if tempo_ocupado else 0
+    log.info(f"Escritor {numero}: {arquivos} arquivos, {registros_total} registros em {tempo_ocupado:.2f}s "
+             f"({vazao:.0f} registros/s)")
+
+
+def _blocos_ate_erro(blocos):
+    """
+    Repassa os blocos de um arquivo e, se a extração falhar, entrega a exceção como último item
+    """
+    try:
+        yield from blocos
+    except Exception as e:
+        log.error(f"Erro na extração durante a carga paralela: {str(e)}")
+        yield e
+
+
+@log_decorator
+def carregar_em_paralelo(engine, dados_por_arquivo, hashes_arquivos, escritores=2, blocos_em_espera=2,
+                         nome_tabela='dados_seguranca_publica', metodo_carga='copy', modo_reprocessamento='substituir'):
+    """
+    Carrega os arquivos com `escritores` conexões gravando ao mesmo tempo
+    
+    A thread principal só distribui os arquivos; cada escritor extrai e transforma o arquivo que
+    recebeu em uma thread produtora própria, que entrega os blocos por uma fila limitada a
+    `blocos_em_espera` blocos: se a carga ficar para trás, a extração daquele arquivo espera
+    (back-pressure) em vez de acumular blocos na memória, sem segurar os outros escritores.
+    No máximo `escritores` arquivos ficam em carga ao mesmo tempo, cada um em sua própria
+    transação, e as linhas vão para as partições do ano pelo roteamento do PostgreSQL.
+    
+    Args:
+        dados_por_arquivo: Iterável de pares (nome do arquivo, blocos transformados do arquivo);
+                           os blocos de cada arquivo são consumidos na thread do seu produtor
+        hashes_arquivos: Função que recebe o nome do arquivo e retorna o hash do conteúdo
+    
+    Returns:
+        list: Pares (nome do arquivo, registros carregados ou None em caso de falha)
+    """
+    # As tabelas auxiliares são criadas antes: CREATE TABLE simultâneos da mesma tabela falhariam
+    criar_tabelas_auxiliares(engine)
+    
+    trabalhos = queue.Queue(maxsize=escritores)
+    resultados = []
+    threads = [threading.Thread(target=_escritor_banco, name=f"escritor-{numero}",
+                                args=(numero, engine, trabalhos, resultados, nome_tabela, metodo_carga,
+                                      modo_reprocessamento, blocos_em_espera))
+               for numero in range(1, escritores + 1)]
+    for thread in threads:
+        thread.start()
+    
+    try:
+        for nome_arquivo, blocos in dados_por_arquivo:
+            trabalhos.put((nome_arquivo, hashes_arquivos(nome_arquivo), blocos))
+    finally:
+        for _ in threads:
+            trabalhos.put(_FIM_DA_FILA)
+        for thread in threads:
+            thread.join()
+    
+    return resultados
+
+
+def carregar_arquivos(engine, dados_por_arquivo, hashes_arquivos, escritores=1, blocos_em_espera=2,
+                      nome_tabela='dados_seguranca_publica', metodo_carga='copy', modo_reprocessamento='substituir'):
+    """
+    Carrega os arquivos um a um na thread atual ou, com escritores > 1, com carregar_em_paralelo
+    
+    Returns:
+        list: Pares (nome do arquivo, registros carregados ou None em caso de falha)
+    """
+    if escritores > 1:
+        return carregar_em_paralelo(engine, dados_por_arquivo, hashes_arquivos, escritores,
+                                    blocos_em_espera, nome_tabela, metodo_carga, modo_reprocessamento)
+    
+    return [(nome_arquivo, carregar_arquivo(engine, nome_arquivo, blocos, hashes_arquivos(nome_arquivo),
+                                            nome_tabela, metodo_carga, modo_reprocessamento))
+            for nome_arquivo, blocos in dados_por_arquivo]
+
+
+@log_decorator
+@metricas.relatorio_de_execucao
+def executar_etl(pasta_dados, tipo_bd, usuario, senha, host, porta, nome_bd, url_base=None,
+                 modo_extracao='blocos', tamanho_bloco=50000, num_processos=1, metodo_carga='copy',
+                 downloads_simultaneos=4, escritores_banco=1, blocos_em_espera=2, contagem_exata=False,
+                 modo_reprocessamento='substituir', sessao_http=None):
     """
     Executa o pipeline do ETL com verificação de arquivos já processados
+    
+    Com num_processos > 1 e mais de um arquivo novo, cada arquivo é extraído e transformado
+    em blocos de até `tamanho_bloco` registros em um processo separado; os blocos ficam em
+    disco e são entregues à carga, um por vez, assim que o arquivo termina.
+    Caso contrário, no modo_extracao 'blocos' a extração, as transformações e a carga formam
+    um pipeline de generators, processando no máximo `tamanho_bloco` registros por vez.
+    No modo 'completo' todos os arquivos são lidos e transformados de uma vez.
+    Em todos os modos, cada arquivo é carregado em uma transação própria (ver carregar_arquivo);
+    com escritores_banco > 1, até escritores_banco arquivos são gravados ao mesmo tempo
+    (ver carregar_em_paralelo).
+    Os arquivos republicados (já carregados antes) são substituídos por inteiro, com
+    modo_reprocessamento 'substituir', ou recebem só a diferença para a versão anterior,
+    com 'mesclar' (apenas no PostgreSQL; ver carregar_arquivo).
+    O total de registros informado no final vem da tabela de controle; com contagem_exata=True
+    a tabela principal também é contada com SELECT COUNT(*).
+    sessao_http é repassada a verificar_e_baixar_arquivos (o modo serviço mantém uma sessão aberta).
     """
     log.info(f" === INICIANDO PROCESSO  ===")
     log.info(f"Origem dos dados: {pasta_dados}")
@@ -588,20 +1553,22 @@ def executar_etl(pasta_dados, tipo_bd, usuario, senha, host, porta, nome_bd, url
     arquivos_baixados = []
     if url_base:
         log.info(f"Verificando se todos os arquivos necessários estão disponíveis...")
-        arquivos_baixados = verificar_e_baixar_arquivos(pasta_dados, url_base)
+        with metricas.medir('download') as medicao:
+            arquivos_baixados = verificar_e_baixar_arquivos(pasta_dados, url_base, downloads_simultaneos, sessao_http)
+            medicao['bytes_lidos'] = sum(os.path.getsize(os.path.join(pasta_dados, nome)) for nome in arquivos_baixados)
         if arquivos_baixados:
             log.info(f"Foram baixados {len(arquivos_baixados)} arquivos: {', '.join(arquivos_baixados)}")
     
     # Obter a lista de todos os arquivos na pasta
     try:
-        arquivos_disponiveis = [f for f in os.listdir(pasta_dados) if f.endswith('.xlsx')]
-        log.info(f"Encontrados {len(arquivos_disponiveis)} arquivos Excel na pasta")
+        arquivos_disponiveis = [f for f in os.listdir(pasta_dados) if arquivo_suportado(f)]
+        log.info(f"Encontrados {len(arquivos_disponiveis)} arquivos de dados na pasta")
     except Exception as e:
         log.error(f"Erro ao listar arquivos na pasta {pasta_dados}: {str(e)}")
         return False
     
     if not arquivos_disponiveis:
-        log.warning(f"Nenhum arquivo Excel encontrado na pasta {pasta_dados}")
+        log.warning(f"Nenhum arquivo de dados encontrado na pasta {pasta_dados}")
         return False
     
     # Criar conexão com o banco de dados
@@ -610,15 +1577,44 @@ def executar_etl(pasta_dados, tipo_bd, usuario, senha, host, porta, nome_bd, url
         log.error("Falha na conexão com o banco de dados. Encerrando processo.")
         return False
     
-    # Verificar quais arquivos já foram processados
-    arquivos_processados = obter_arquivos_processados(engine)
+    if modo_reprocessamento not in ('substituir', 'mesclar'):
+        log.error(f"Modo de reprocessamento inválido: {modo_reprocessamento} (use 'substituir' ou 'mesclar')")
+        return False
+    if modo_reprocessamento == 'mesclar' and engine.dialect.name != 'postgresql':
+        log.warning(f"O modo de reprocessamento 'mesclar' só é suportado no PostgreSQL: "
+                    f"os arquivos republicados serão substituídos por inteiro")
+        modo_reprocessamento = 'substituir'
+    
+    # Um único inspector para as verificações de tabelas desta execução
+    inspector = sa.inspect(engine)
+    
+    # Verificar quais arquivos já foram processados (e com qual conteúdo)
+    arquivos_processados = obter_arquivos_processados(engine, inspector=inspector)
+    
+    # Hash do conteúdo atual de cada arquivo: o do manifesto dos downloads, se o arquivo não mudou
+    # na pasta desde o download, ou calculado do arquivo (ver hash_arquivo_local)
+    manifesto = _carregar_manifesto(pasta_dados)
+    hashes_atuais = {}
+    
+    def hash_atual(arquivo):
+        if arquivo not in hashes_atuais:
+            hashes_atuais[arquivo] = hash_arquivo_local(pasta_dados, arquivo, manifesto.get(arquivo))
+        return hashes_atuais[arquivo]
+    
+    # Determinar quais arquivos precisam ser processados: novos, baixados novamente,
+    # ou com conteúdo diferente do carregado (ex: download concluído e carga interrompida,
+    # ou arquivo trocado na pasta sem download, como no modo serviço 'pasta')
+    def conteudo_mudou(arquivo):
+        hash_carregado = arquivos_processados.get(arquivo)
+        return bool(hash_carregado and hash_atual(arquivo) != hash_carregado)
     
-    # Determinar quais arquivos precisam ser processados
     arquivos_para_processar = [arquivo for arquivo in arquivos_disponiveis 
-                              if arquivo not in arquivos_processados] 
+                              if arquivo not in arquivos_processados or arquivo in arquivos_baixados
+                              or conteudo_mudou(arquivo)] 
+    arquivos_atualizados = [arquivo for arquivo in arquivos_para_processar if arquivo in arquivos_processados]
     
     # Se nenhum arquivo novo para processar, encerrar o ETL
-    if not arquivos_para_processar and not arquivos_baixados:
+    if not arquivos_para_processar:
         log.info("Todos os arquivos disponíveis já foram processados. Não há novos dados para inserir.")
         log.info("=== PROCESSO DE ETL CONCLUÍDO SEM ALTERAÇÕES ===")
         return True
@@ -627,75 +1623,133 @@ def executar_etl(pasta_dados, tipo_bd, usuario, senha, host, porta, nome_bd, url
     for arquivo in arquivos_para_processar:
         log.info(f"  - {arquivo}")
     
-    # EXTRAÇÃO - apenas dos novos arquivos
-    dados_brutos = extrair_dados(pasta_dados, arquivos_para_processar)
-    if dados_brutos.empty:
-        log.error("Nenhum dado extraído dos novos arquivos. Encerrando processo.")
-        return False
+    # Os dados antigos dos arquivos republicados são substituídos (ou mesclados) na transação da nova carga
+    if arquivos_atualizados:
+        log.info(f"{len(arquivos_atualizados)} arquivos foram republicados e serão reprocessados "
+                 f"(modo '{modo_reprocessamento}'): {', '.join(arquivos_atualizados)}")
     
-    # TRANSFORMAÇÃO
-    log.info(f"Iniciando transformações dos dados ({len(dados_brutos)} registros)...")
-    
-    # Processamento de datas
-    dados_datas = transformar_datas(dados_brutos)
+    # Verificar se a tabela existe
+    tabela_existe = 'dados_seguranca_publica' in inspector.get_table_names(schema='public')
     
-    # Ajuste de colunas e tipos de dados
-    dados_ajustados = ajustar_colunas(dados_datas)
+    # No modo de dimensões a tabela guarda as chaves de UF e município no lugar dos nomes;
+    # uma tabela já criada no outro modo precisa ser recriada (ex: DROP TABLE) para trocar de modo
+    tabelas_dimensao = CONFIG['tabelas_dimensao']
+    if tabela_existe:
+        colunas_existentes = {col['name'] for col in inspector.get_columns('dados_seguranca_publica', schema='public')}
+        if ('codigo_municipio' in colunas_existentes) != bool(tabelas_dimensao):
+            log.error(f"A tabela dados_seguranca_publica foi criada {'sem' if tabelas_dimensao else 'com'} as "
+                      f"tabelas de dimensão, diferente de CONFIG['tabelas_dimensao']={tabelas_dimensao}. "
+                      f"Recrie a tabela para trocar de modo. Encerrando processo.")
+            return False
     
-    # Categorização dos eventos
-    dados_categorizados = categorizar_eventos(dados_ajustados)
+    modo_insercao = 'append' if tabela_existe else 'replace'
     
-    # Dados finais
-    dados_finais = dados_categorizados
+    # Cada pipeline produz pares (nome do arquivo, blocos transformados do arquivo)
+    if num_processos > 1 and len(arquivos_para_processar) > 1:
+        # EXTRAÇÃO E TRANSFORMAÇÃO em paralelo, um processo por arquivo
+        dados_por_arquivo = transformar_em_paralelo(pasta_dados, arquivos_para_processar, num_processos, tamanho_bloco)
+    elif modo_extracao == 'blocos':
+        # EXTRAÇÃO E TRANSFORMAÇÃO em blocos - apenas dos novos arquivos
+        log.info(f"Iniciando extração e transformação em blocos de até {tamanho_bloco} registros...")
+        dados_por_arquivo = ((os.path.basename(arquivo),
+                              transformar_em_blocos(extrair_arquivo_em_blocos(arquivo, tamanho_bloco)))
+                             for arquivo in _listar_arquivos(pasta_dados, arquivos_para_processar))
+    else:
+        # EXTRAÇÃO - apenas dos novos arquivos
+        dados_brutos = extrair_dados(pasta_dados, arquivos_para_processar)
+        if dados_brutos.empty:
+            log.error("Nenhum dado extraído dos novos arquivos. Encerrando processo.")
+            return False
+        
+        # TRANSFORMAÇÃO (datas -> colunas -> eventos, sobre o próprio DataFrame)
+        log.info(f"Iniciando transformações dos dados ({len(dados_brutos)} registros)...")
+        dados_finais = transformar_dados(dados_brutos)
+        dados_por_arquivo = ((nome_arquivo, [df])
+                             for nome_arquivo, df in dados_finais.groupby('nome_arquivo', sort=False))
     
     # CARGA
     log.info(f"Iniciando carga dos dados no banco {tipo_bd}...")
+    log.info(f"Modo de inserção: {modo_insercao}")
     
-    # Verificar se a tabela existe
+    # Tabela principal criada do zero (particionada por ano, com tipos e índices definidos):
+    # as tabelas de resumo e de controle também recomeçam
+    if modo_insercao == 'replace':
+        limpar_agregacoes(engine)
+        limpar_controle_arquivos(engine)
+        criar_tabela_principal(engine, 'dados_seguranca_publica', dimensoes=tabelas_dimensao)
+    if tabelas_dimensao:
+        criar_tabelas_dimensao(engine, registros_uf())
     
-    inspector = sa.inspect(engine)
-    tabela_existe = 'dados_seguranca_publica' in inspector.get_table_names()
+    # Em cargas grandes (tabela nova, ou pelo menos tantos arquivos quanto os já carregados)
+    # os índices secundários são removidos e recriados no final, em vez de atualizados a cada bloco
+    carga_em_massa = modo_insercao == 'replace' or len(arquivos_para_processar) >= len(arquivos_processados)
+    if carga_em_massa:
+        remover_indices_secundarios(engine, 'dados_seguranca_publica')
     
-    modo_insercao = 'append' if tabela_existe else 'replace'
-    log.info(f"Modo de inserção: {modo_insercao}")
+    # Salvar dados no banco, um arquivo por transação (com escritores_banco > 1, vários arquivos
+    # ao mesmo tempo em conexões diferentes); um arquivo com erro não impede a carga dos demais
+    arquivos_com_erro = []
+    arquivos_carregados = 0
+    registros_carregados = 0
+    try:
+        resultados = carregar_arquivos(
+            engine, dados_por_arquivo,
+            hash_atual,
+            escritores_banco, blocos_em_espera, metodo_carga=metodo_carga,
+            modo_reprocessamento=modo_reprocessamento
+        )
+        for nome_arquivo, registros in resultados:
+            if registros is None:
+                arquivos_com_erro.append(nome_arquivo)
+                continue
+            arquivos_carregados += 1
+            registros_carregados += registros
+    finally:
+        if carga_em_massa:
+            recriar_indices(engine, 'dados_seguranca_publica')
     
-    # Salvar dados no banco
-    sucesso_carga = salvar_no_banco(dados_finais, 'dados_seguranca_publica', engine, modo_insercao)
+    sucesso_carga = not arquivos_com_erro
+    if sucesso_carga and registros_carregados == 0:
+        log.error("Nenhum dado extraído dos novos arquivos. Encerrando processo.")
+        return False
     
     # Verificar sucesso da operação
     if sucesso_carga:
         log.info(f"=== PROCESSO DE ETL CONCLUÍDO COM SUCESSO ===")
-        log.info(f"Dados de {len(arquivos_para_processar)} novos arquivos inseridos na tabela 'dados_seguranca_publica'")
+        log.info(f"Dados de {arquivos_carregados} novos arquivos inseridos na tabela 'dados_seguranca_publica' ({registros_carregados} registros)")
         
-        # Contagem de registros na tabela
+        # Total de registros pela tabela de controle (linhas de cada arquivo carregado), sem
+        # percorrer a tabela principal; na falta dela, a estimativa das estatísticas do PostgreSQL.
+        # A contagem exata com COUNT(*) só é feita quando pedida
         try:
-            contagem_sql = "SELECT COUNT(*) FROM dados_seguranca_publica"
-            contagem = pd.read_sql(contagem_sql, engine).iloc[0, 0]
-            log.info(f"Total de registros na tabela: {contagem}")
+            with engine.connect() as conexao:
+                try:
+                    total = total_registros_controle(conexao)
+                    log.bind(total_registros=total).info(f"Total de registros na tabela: {total}")
+                except Exception as e:
+                    conexao.rollback()
+                    log.warning(f"Tabela de controle indisponível ({str(e)}). Usando a estimativa do banco.")
+                    log.info(f"Total estimado de registros na tabela: {estimar_registros(conexao, 'dados_seguranca_publica')}")
+                
+                if contagem_exata:
+                    log.info(f"Contagem exata de registros na tabela: {contar_registros(conexao, 'dados_seguranca_publica')}")
         except Exception as e:
-            log.warning(f"Não foi possível contar os registros: {str(e)}")
+            log.warning(f"Não foi possível obter o total de registros: {str(e)}")
     else:
         log.error(f"=== PROCESSO DE ETL FALHOU ===")
-        log.error(f"Não foi possível salvar os novos dados na tabela.")
+        log.error(f"Não foi possível carregar os arquivos: {', '.join(arquivos_com_erro)}. "
+                  f"Eles serão reprocessados na próxima execução.")
+    
+    log.info(f"Uso do pool de conexões: {metricas_pool(engine)}")
     
     return sucesso_carga
 
 if __name__ == "__main__":
-    import argparse
-    
-    print("Iniciando ......../n")
-    
-    sucesso = executar_etl(
-        pasta_dados=CONFIG['pasta_dados'],
-        tipo_bd=CONFIG['tipo_bd'],
-        usuario=CONFIG['usuario'],
-        senha=CONFIG['senha'],
-        host=CONFIG['host'],
-        porta=CONFIG['porta'],
-        nome_bd=CONFIG['nome_bd'],
-        url_base=CONFIG['url_base']
-    )
+    # Sem a verificação rápida: para o agendamento, usar executar.py
+    from executar import parametros_etl
+    
+    log.info("Iniciando ...")
+    
+    sucesso = executar_etl(**parametros_etl())
     
     sys.exit(0 if sucesso else 1)
-
-  
\ No newline at end of file
@@ -0,0 +1,103 @@
+import time
+
+# Início do processo, antes de qualquer import, para medir o tempo até a decisão da verificação rápida
+INICIO = time.perf_counter()
+
+import sys
+import argparse
+import subprocess
+from config import CONFIG
+from log import logger as log
+from verificacao_rapida import ha_dados_novos
+
+# Módulos cujo tempo de importação é medido com --medir-importacoes
+MODULOS_PESADOS = ('pandas', 'sqlalchemy', 'requests', 'openpyxl', 'psycopg2', 'etl')
+
+
+def parametros_etl() -> dict:
+    """
+    Argumentos do executar_etl a partir do CONFIG
+    """
+    return dict(
+        pasta_dados=CONFIG['pasta_dados'],
+        tipo_bd=CONFIG['tipo_bd'],
+        usuario=CONFIG['usuario'],
+        senha=CONFIG['senha'],
+        host=CONFIG['host'],
+        porta=CONFIG['porta'],
+        nome_bd=CONFIG['nome_bd'],
+        url_base=CONFIG['url_base'],
+        modo_extracao=CONFIG['modo_extracao'],
+        tamanho_bloco=CONFIG['tamanho_bloco'],
+        num_processos=CONFIG['num_processos'],
+        metodo_carga=CONFIG['metodo_carga'],
+        downloads_simultaneos=CONFIG['downloads_simultaneos'],
+        escritores_banco=CONFIG['escritores_banco'],
+        blocos_em_espera=CONFIG['blocos_em_espera'],
+        contagem_exata=CONFIG['contagem_exata'],
+        modo_reprocessamento=CONFIG['modo_reprocessamento']
+    )
+
+
+def tempo_de_importacao(modulo:str) -> float:
+    """
+    Tempo (em segundos) para importar o módulo em um processo novo, pelo python -X importtime
+    """
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                               capture_output=True, text=True)
+    # Linhas "import time: <próprio> | <acumulado> | <módulo>", em microssegundos
+    for linha in resultado.stderr.splitlines():
+        partes = linha.split('|')
+        if resultado.returncode == 0 and len(partes) == 3 and partes[2].rstrip() == f" {modulo}":
+            return int(partes[1]) / 1e6
+    return None
+
+
+def main(verificacao_rapida:bool=True) -> int:
+    """
+    Ponto de entrada do agendamento
+
+    Antes de importar o ETL (pandas, SQLAlchemy, requests...), verifica se há algo novo na
+    página, na pasta ou na tabela de controle; se não houver, encerra sem carregar essas
+    bibliotecas. O tempo até essa decisão é comparado com CONFIG['orcamento_verificacao_rapida_s'].
+    """
+    if verificacao_rapida:
+        dados_novos = ha_dados_novos(CONFIG['pasta_dados'], CONFIG['url_base'], CONFIG['usuario'], CONFIG['senha'],
+                                     CONFIG['host'], CONFIG['porta'], CONFIG['nome_bd'], CONFIG['downloads_simultaneos'])
+        duracao = time.perf_counter() - INICIO
+        if duracao > CONFIG['orcamento_verificacao_rapida_s']:
+            log.warning(f"Verificação rápida levou {duracao:.3f}s, acima do orçamento de "
+                        f"{CONFIG['orcamento_verificacao_rapida_s']}s")
+
+        if not dados_novos:
+            log.info(f"Todos os arquivos disponíveis já foram processados. Não há novos dados para inserir "
+                     f"(verificação rápida em {duracao:.3f}s)")
+            return 0
+        log.info(f"Verificação rápida em {duracao:.3f}s: há dados novos, iniciando o ETL completo")
+
+    import etl
+    return 0 if etl.executar_etl(**parametros_etl()) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa o ETL do Sinesp VDE")
+    parser.add_argument('--completo', action='store_true',
+                        help="Executar o ETL completo sem a verificação rápida de dados novos")
+    parser.add_argument('--servico', action='store_true',
+                        help="Manter o ETL em execução, verificando novos dados periodicamente (ver servico.py)")
+    parser.add_argument('--modo-servico', choices=['pagina', 'pasta'], help="Padrão: CONFIG['servico_modo']")
+    parser.add_argument('--medir-importacoes', action='store_true',
+                        help="Mostrar o tempo de importação dos módulos pesados e sair")
+    argumentos = parser.parse_args()
+
+    if argumentos.medir_importacoes:
+        for modulo in MODULOS_PESADOS:
+            tempo = tempo_de_importacao(modulo)
+            print(f"{modulo:<12} {'não disponível' if tempo is None else f'{tempo:.3f}s'}")
+        sys.exit(0)
+
+    log.info("Iniciando ...")
+    if argumentos.servico:
+        import servico
+        sys.exit(0 if servico.executar_servico(parametros_etl(), argumentos.modo_servico) else 1)
+    sys.exit(main(verificacao_rapida=not argumentos.completo))
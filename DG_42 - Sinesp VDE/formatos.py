@@ -0,0 +1,31 @@
+import re
+
+# Extensões dos arquivos de dados e o formato de cada uma, para todo o ETL: leitura (leitores.py),
+# download e verificação rápida (verificacao_rapida.py) e modo serviço (servico.py).
+# Só usa a biblioteca padrão, para poder ser importado pela verificação rápida antes do pandas.
+# Novos formatos entram por leitores.registrar_leitor, que também registra as extensões aqui.
+EXTENSOES = {'.xlsx': 'xlsx', '.ods': 'ods', '.csv': 'csv', '.parquet': 'parquet'}
+
+
+def registrar_extensoes(formato:str, extensoes):
+    """
+    Associa as extensões (com ou sem o ponto) ao formato
+    """
+    for extensao in extensoes:
+        extensao = extensao.lower()
+        EXTENSOES[extensao if extensao.startswith('.') else f'.{extensao}'] = formato
+
+
+def extensoes_dados() -> tuple:
+    """
+    Extensões registradas, no formato aceito por str.endswith
+    """
+    return tuple(EXTENSOES)
+
+
+def padrao_nome_bancovde() -> re.Pattern:
+    """
+    Expressão do nome bancovde-AAAA.<extensão> com as extensões registradas (nomes em minúsculas)
+    """
+    extensoes = sorted(EXTENSOES, key=len, reverse=True)
+    return re.compile(r'bancovde-\d{4}(?:' + '|'.join(re.escape(extensao) for extensao in extensoes) + r')')
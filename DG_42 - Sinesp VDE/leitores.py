@@ -0,0 +1,391 @@
+import os
+import csv
+import zipfile
+import importlib.util
+from operator import itemgetter
+import pandas as pd
+from openpyxl import load_workbook
+from loguru import logger as log
+import metricas
+from cache import ler_com_cache, ler_em_blocos_com_cache, calcular_hash_arquivo
+from esquema import COLUNAS_OBRIGATORIAS, compilar_plano, mapear_cabecalho, aplicar_tipos, ano_do_arquivo
+from validacao import ler_cabecalho_xlsx, validar_xlsx
+from formatos import EXTENSOES, registrar_extensoes
+
+# Leitores de arquivos de dados: cada formato tem funções para ler o cabeçalho, o arquivo
+# inteiro e o arquivo em blocos. Todos devolvem o mesmo DataFrame canônico (colunas e
+# tipos do plano de leitura, ver esquema.compilar_plano), qualquer que seja o formato.
+
+PYARROW_DISPONIVEL = importlib.util.find_spec('pyarrow') is not None
+CALAMINE_DISPONIVEL = importlib.util.find_spec('python_calamine') is not None
+ODF_DISPONIVEL = importlib.util.find_spec('odf') is not None
+
+# Bytes lidos do início do arquivo para descobrir formato, codificação e separador
+TAMANHO_AMOSTRA = 64 * 1024
+
+
+# ---------------------------------------------------------------- xlsx / ods
+
+def _motor_planilha(formato:str) -> str:
+    """
+    Motor do pd.read_excel: calamine quando instalado (bem mais rápido), senão openpyxl/odf
+    """
+    if CALAMINE_DISPONIVEL:
+        return 'calamine'
+    if formato == 'ods':
+        if not ODF_DISPONIVEL:
+            raise ValueError("Leitura de .ods requer python-calamine ou odfpy instalados")
+        return 'odf'
+    return 'openpyxl'
+
+
+def _cabecalho_planilha(caminho:str, formato:str) -> list:
+    if formato == 'xlsx':
+        # Só a primeira linha, sem abrir a planilha inteira
+        return ler_cabecalho_xlsx(caminho)
+    return list(pd.read_excel(caminho, engine=_motor_planilha(formato), nrows=0).columns)
+
+
+def _ler_planilha(caminho:str, formato:str, plano:dict) -> pd.DataFrame:
+    df = pd.read_excel(caminho, engine=_motor_planilha(formato), header=0, names=plano['colunas'],
+                       usecols=plano['indices'],
+                       dtype={coluna: tipo for coluna, tipo in plano['tipos'].items() if tipo == 'str'})
+    return aplicar_tipos(df, plano)
+
+
+def _ler_xlsx_em_blocos(caminho:str, plano:dict, tamanho_bloco:int):
+    """
+    Lê a primeira planilha linha a linha (openpyxl em modo read_only), de forma que a memória
+    usada depende do tamanho do bloco e não do tamanho do arquivo
+    As células das colunas fora do plano não entram nos blocos, e as que ficam depois da
+    última coluna usada nem são lidas.
+    """
+    workbook = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        planilha = workbook.worksheets[0]
+        ultima_coluna = plano['indices'][-1] + 1
+        selecionar = itemgetter(*plano['indices'])
+
+        bloco = []
+        for linha in planilha.iter_rows(min_row=2, max_col=ultima_coluna, values_only=True):
+            # Completar linhas com menos células que a última coluna usada
+            if len(linha) < ultima_coluna:
+                linha = tuple(linha) + (None,) * (ultima_coluna - len(linha))
+            linha = selecionar(linha)
+            # Ignorar linhas totalmente vazias (o read_only pode devolver linhas em branco no final)
+            if all(valor is None for valor in linha):
+                continue
+            bloco.append(linha)
+            if len(bloco) >= tamanho_bloco:
+                yield aplicar_tipos(pd.DataFrame.from_records(bloco, columns=plano['colunas']), plano)
+                bloco = []
+
+        if bloco:
+            yield aplicar_tipos(pd.DataFrame.from_records(bloco, columns=plano['colunas']), plano)
+    finally:
+        workbook.close()
+
+
+def _ler_ods_em_blocos(caminho:str, plano:dict, tamanho_bloco:int):
+    # Nenhum motor de .ods lê em streaming: o arquivo é lido inteiro e entregue em fatias
+    df = _ler_planilha(caminho, 'ods', plano)
+    for inicio in range(0, len(df), tamanho_bloco):
+        yield df.iloc[inicio:inicio + tamanho_bloco].reset_index(drop=True)
+
+
+# ---------------------------------------------------------------- csv
+
+def _dialeto_csv(caminho:str) -> tuple:
+    """
+    Descobre a codificação (UTF-8, senão Latin-1) e o separador do CSV pela amostra inicial
+
+    Returns:
+        tuple: (codificação, separador)
+    """
+    with open(caminho, 'rb') as arquivo:
+        amostra = arquivo.read(TAMANHO_AMOSTRA)
+
+    try:
+        texto = amostra.decode('utf-8-sig')
+        codificacao = 'utf-8-sig' if amostra.startswith(b'\xef\xbb\xbf') else 'utf-8'
+    except UnicodeDecodeError as e:
+        # Amostra cortada no meio de um caractere multibyte ainda é UTF-8
+        if e.start >= len(amostra) - 3:
+            texto = amostra[:e.start].decode('utf-8-sig')
+            codificacao = 'utf-8'
+        else:
+            texto = amostra.decode('latin-1')
+            codificacao = 'latin-1'
+
+    primeira_linha = texto.splitlines()[0] if texto else ''
+    try:
+        separador = csv.Sniffer().sniff(primeira_linha, delimiters=';,\t|').delimiter
+    except csv.Error:
+        separador = ';' if primeira_linha.count(';') > primeira_linha.count(',') else ','
+    return codificacao, separador
+
+
+def _cabecalho_csv(caminho:str) -> list:
+    codificacao, separador = _dialeto_csv(caminho)
+    with open(caminho, encoding=codificacao, newline='') as arquivo:
+        return next(csv.reader(arquivo, delimiter=separador), [])
+
+
+def _normalizar_csv(df:pd.DataFrame, plano:dict, separador:str) -> pd.DataFrame:
+    """
+    Aplica os tipos do plano às colunas lidas como texto
+    Nos CSVs com ';' os decimais costumam vir com vírgula ('1,5' ou '1.234,5'), convertidos antes
+    dos números. O '.' só é tratado como separador de milhar nos valores que também têm vírgula;
+    os demais ('0.5') ficam como estão.
+    """
+    if separador == ';':
+        for coluna, tipo in plano['tipos'].items():
+            if tipo == 'float64' and coluna in df.columns:
+                valores = df[coluna]
+                com_virgula = valores.str.contains(',', regex=False).fillna(False).astype(bool)
+                if com_virgula.any():
+                    convertidos = valores.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+                    df[coluna] = valores.where(~com_virgula, convertidos)
+    return aplicar_tipos(df, plano)
+
+
+def _opcoes_pyarrow_csv(caminho:str, plano:dict, tamanho_cabecalho:int) -> tuple:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    codificacao, separador = _dialeto_csv(caminho)
+    # Colunas nomeadas pela posição (o cabeçalho pode ter nomes repetidos ou vazios)
+    nomes = [f"c{i}" for i in range(tamanho_cabecalho)]
+    lidas = [nomes[i] for i in plano['indices']]
+    opcoes = dict(
+        read_options=pacsv.ReadOptions(encoding=codificacao.replace('-sig', ''), skip_rows=1, column_names=nomes),
+        parse_options=pacsv.ParseOptions(delimiter=separador),
+        convert_options=pacsv.ConvertOptions(include_columns=lidas, column_types={nome: pa.string() for nome in lidas},
+                                             strings_can_be_null=True),
+    )
+    return opcoes, dict(zip(lidas, plano['colunas'])), separador
+
+
+def _ler_csv(caminho:str, plano:dict, cabecalho:list) -> pd.DataFrame:
+    if PYARROW_DISPONIVEL:
+        import pyarrow.csv as pacsv
+        opcoes, nomes, separador = _opcoes_pyarrow_csv(caminho, plano, len(cabecalho))
+        df = pacsv.read_csv(caminho, **opcoes).to_pandas().rename(columns=nomes)
+    else:
+        codificacao, separador = _dialeto_csv(caminho)
+        df = pd.read_csv(caminho, sep=separador, encoding=codificacao, header=0, names=plano['colunas'],
+                         usecols=plano['indices'], dtype=str)
+    return _normalizar_csv(df, plano, separador)
+
+
+def _ler_csv_em_blocos(caminho:str, plano:dict, tamanho_bloco:int, cabecalho:list):
+    if not PYARROW_DISPONIVEL:
+        codificacao, separador = _dialeto_csv(caminho)
+        with pd.read_csv(caminho, sep=separador, encoding=codificacao, header=0, names=plano['colunas'],
+                         usecols=plano['indices'], dtype=str, chunksize=tamanho_bloco) as blocos:
+            for bloco in blocos:
+                yield _normalizar_csv(bloco.reset_index(drop=True), plano, separador)
+        return
+
+    import pyarrow.csv as pacsv
+    opcoes, nomes, separador = _opcoes_pyarrow_csv(caminho, plano, len(cabecalho))
+    with pacsv.open_csv(caminho, **opcoes) as leitor:
+        for lote in leitor:
+            # Os lotes do pyarrow são definidos em bytes: fatiados para no máximo tamanho_bloco linhas
+            for inicio in range(0, lote.num_rows, tamanho_bloco):
+                bloco = lote.slice(inicio, tamanho_bloco).to_pandas().rename(columns=nomes)
+                yield _normalizar_csv(bloco, plano, separador)
+
+
+# ---------------------------------------------------------------- parquet
+
+def _cabecalho_parquet(caminho:str) -> list:
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(caminho).schema_arrow.names
+
+
+def _ler_parquet(caminho:str, plano:dict, cabecalho:list) -> pd.DataFrame:
+    import pyarrow.parquet as pq
+    lidas = [cabecalho[i] for i in plano['indices']]
+    df = pq.read_table(caminho, columns=lidas).to_pandas()
+    df.columns = plano['colunas']
+    return aplicar_tipos(df, plano)
+
+
+def _ler_parquet_em_blocos(caminho:str, plano:dict, tamanho_bloco:int, cabecalho:list):
+    import pyarrow.parquet as pq
+    lidas = [cabecalho[i] for i in plano['indices']]
+    for lote in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_bloco, columns=lidas):
+        bloco = lote.to_pandas()
+        bloco.columns = plano['colunas']
+        yield aplicar_tipos(bloco, plano)
+
+
+# ---------------------------------------------------------------- registro
+
+# Formato -> funções do leitor (cabecalho(caminho), ler(caminho, plano, cabecalho) e
+# ler_em_blocos(caminho, plano, tamanho_bloco, cabecalho)), motor usado e se a leitura
+# passa pelo cache Parquet. Novos formatos podem ser incluídos com registrar_leitor.
+LEITORES = {
+    'xlsx': {
+        'cabecalho': lambda caminho: _cabecalho_planilha(caminho, 'xlsx'),
+        'ler': lambda caminho, plano, cabecalho: _ler_planilha(caminho, 'xlsx', plano),
+        'ler_em_blocos': lambda caminho, plano, tamanho, cabecalho: _ler_xlsx_em_blocos(caminho, plano, tamanho),
+        'motor': lambda em_blocos: 'openpyxl' if em_blocos else _motor_planilha('xlsx'),
+        'cache': True,
+    },
+    'ods': {
+        'cabecalho': lambda caminho: _cabecalho_planilha(caminho, 'ods'),
+        'ler': lambda caminho, plano, cabecalho: _ler_planilha(caminho, 'ods', plano),
+        'ler_em_blocos': lambda caminho, plano, tamanho, cabecalho: _ler_ods_em_blocos(caminho, plano, tamanho),
+        'motor': lambda em_blocos: _motor_planilha('ods'),
+        'cache': True,
+    },
+    'csv': {
+        'cabecalho': _cabecalho_csv,
+        'ler': _ler_csv,
+        'ler_em_blocos': _ler_csv_em_blocos,
+        'motor': lambda em_blocos: 'pyarrow' if PYARROW_DISPONIVEL else 'pandas',
+        'cache': True,
+    },
+    'parquet': {
+        'cabecalho': _cabecalho_parquet,
+        'ler': _ler_parquet,
+        'ler_em_blocos': _ler_parquet_em_blocos,
+        'motor': lambda em_blocos: 'pyarrow',
+        # Já é Parquet: uma cópia no cache não tornaria a leitura mais rápida
+        'cache': False,
+    },
+}
+
+def registrar_leitor(formato:str, extensoes, cabecalho, ler, ler_em_blocos, motor:str, cache:bool=True):
+    """
+    Inclui (ou substitui) o leitor de um formato
+    As funções seguem a mesma assinatura dos leitores de LEITORES; o DataFrame devolvido deve
+    ter as colunas do plano, já com os nomes canônicos (ver esquema.aplicar_tipos).
+    As extensões são registradas em formatos.EXTENSOES, usado também pelo download, pela
+    verificação rápida e pelo modo serviço.
+    """
+    LEITORES[formato] = {'cabecalho': cabecalho, 'ler': ler, 'ler_em_blocos': ler_em_blocos,
+                         'motor': lambda em_blocos: motor, 'cache': cache}
+    registrar_extensoes(formato, extensoes)
+
+
+def arquivo_suportado(caminho:str) -> bool:
+    """
+    Indica se há leitor para a extensão do arquivo
+    """
+    return os.path.splitext(caminho)[1].lower() in EXTENSOES
+
+
+def detectar_formato(caminho:str, nome_arquivo:str=None) -> str:
+    """
+    Formato do arquivo pela extensão (de nome_arquivo, se informado, ex: para um .part)
+    ou, sem extensão conhecida, pelo conteúdo: ZIP de planilha (xlsx/ods), 'PAR1' (parquet)
+    ou texto (csv)
+    """
+    extensao = os.path.splitext(nome_arquivo or caminho)[1].lower()
+    if extensao in EXTENSOES:
+        return EXTENSOES[extensao]
+
+    with open(caminho, 'rb') as arquivo:
+        inicio = arquivo.read(8)
+
+    if inicio.startswith(b'PK\x03\x04'):
+        try:
+            with zipfile.ZipFile(caminho) as zip_arquivo:
+                if 'mimetype' in zip_arquivo.namelist() and b'opendocument.spreadsheet' in zip_arquivo.read('mimetype'):
+                    return 'ods'
+        except zipfile.BadZipFile:
+            pass
+        return 'xlsx'
+    if inicio.startswith(b'PAR1'):
+        return 'parquet'
+    return 'csv'
+
+
+def _preparar(caminho:str) -> tuple:
+    """
+    Leitor, cabeçalho, plano de leitura e nome do leitor (formato_motor) do arquivo
+    """
+    formato = detectar_formato(caminho)
+    leitor = LEITORES[formato]
+    cabecalho = leitor['cabecalho'](caminho)
+    plano = compilar_plano(tuple(cabecalho), ano_do_arquivo(caminho))
+    return leitor, cabecalho, plano, formato
+
+
+def ler_arquivo(caminho:str, pasta_cache:str=None) -> pd.DataFrame:
+    """
+    Lê o arquivo inteiro com o leitor do seu formato (pelo cache Parquet, se houver pasta_cache)
+    O tempo de leitura fica nas métricas da etapa 'leitura_<formato>_<motor>'.
+
+    Returns:
+        DataFrame: Colunas canônicas do plano de leitura
+    """
+    def ler(caminho):
+        leitor, cabecalho, plano, formato = _preparar(caminho)
+        nome = f"leitura_{formato}_{leitor['motor'](False)}"
+        with metricas.medir(nome, bytes_lidos=os.path.getsize(caminho)) as medicao:
+            df = leitor['ler'](caminho, plano, cabecalho)
+            medicao['linhas_saida'] = len(df)
+        log.info(f"Arquivo {os.path.basename(caminho)} lido com o leitor {nome}")
+        return df
+
+    if pasta_cache and LEITORES[detectar_formato(caminho)]['cache']:
+        return ler_com_cache(caminho, ler, pasta_cache)
+    return ler(caminho)
+
+
+def ler_arquivo_em_blocos(caminho:str, tamanho_bloco:int=50000, pasta_cache:str=None):
+    """
+    Lê o arquivo em blocos de até `tamanho_bloco` registros com o leitor do seu formato
+    (pelo cache Parquet, se houver pasta_cache)
+
+    Yields:
+        DataFrame: Blocos com as colunas canônicas do plano de leitura
+    """
+    def ler_em_blocos(caminho, tamanho_bloco):
+        leitor, cabecalho, plano, formato = _preparar(caminho)
+        nome = f"leitura_{formato}_{leitor['motor'](True)}"
+        log.info(f"Lendo {os.path.basename(caminho)} em blocos com o leitor {nome}")
+        yield from metricas.medir_blocos(nome, leitor['ler_em_blocos'](caminho, plano, tamanho_bloco, cabecalho),
+                                         bytes_lidos=os.path.getsize(caminho))
+
+    if pasta_cache and LEITORES[detectar_formato(caminho)]['cache']:
+        yield from ler_em_blocos_com_cache(caminho, ler_em_blocos, tamanho_bloco, pasta_cache)
+    else:
+        yield from ler_em_blocos(caminho, tamanho_bloco)
+
+
+def validar_arquivo(caminho:str, nome_arquivo:str=None, sha256_esperado:str=None) -> list:
+    """
+    Validação rápida de um arquivo baixado, de qualquer formato suportado
+    xlsx passa pela validar_xlsx (estrutura do ZIP e cabeçalho); os demais formatos têm o
+    cabeçalho lido pelo seu leitor e conferido com as colunas obrigatórias.
+
+    Returns:
+        list: Nomes das colunas do cabeçalho
+
+    Raises:
+        ValueError: Se alguma das verificações falhar
+    """
+    formato = detectar_formato(caminho, nome_arquivo)
+    if formato == 'xlsx':
+        return validar_xlsx(caminho, sha256_esperado=sha256_esperado)
+
+    if sha256_esperado:
+        sha256 = calcular_hash_arquivo(caminho)
+        if sha256.lower() != sha256_esperado.lower():
+            raise ValueError(f"sha256 do arquivo ({sha256}) diferente do publicado ({sha256_esperado})")
+
+    try:
+        cabecalho = LEITORES[formato]['cabecalho'](caminho)
+    except Exception as e:
+        raise ValueError(f"Não foi possível ler o cabeçalho do arquivo {formato}: {str(e)}")
+
+    colunas = set(mapear_cabecalho(cabecalho, ano_do_arquivo(nome_arquivo or caminho))[1])
+    faltantes = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in colunas]
+    if faltantes:
+        raise ValueError(f"Colunas esperadas não encontradas no cabeçalho: {', '.join(faltantes)}")
+    return cabecalho
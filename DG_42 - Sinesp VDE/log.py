@@ -1,6 +1,12 @@
 from loguru import logger
-from sys import stderr
+from sys import stderr, platform
 from functools import wraps
+import time
+
+try:
+    import resource
+except ImportError:  # Windows não tem o módulo resource
+    resource = None
 
 # Removendo os handlers existentes para evitar duplicação
 logger.remove()
@@ -19,15 +25,86 @@ logger.add(
                 level="CRITICAL"
             )
 
+# Tamanho máximo do repr de objetos sem resumo específico
+TAMANHO_MAXIMO_REPR = 200
+
+
+def pico_memoria_mb():
+    """
+    Retorna o pico de memória residente do processo em MB (None se não disponível)
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em bytes no macOS e em KB no Linux
+    return pico / (1024 * 1024) if platform == 'darwin' else pico / 1024
+
+
+def resumir(obj) -> str:
+    """
+    Representação curta de argumentos e retornos para o log
+    DataFrames e Series viram forma, tipos e memória; engines viram a URL sem senha;
+    coleções são resumidas item a item e os demais objetos têm o repr truncado.
+    """
+    # DataFrame (sem importar pandas aqui)
+    if hasattr(obj, 'dtypes') and hasattr(obj, 'memory_usage') and hasattr(obj, 'columns'):
+        linhas, colunas = obj.shape
+        tipos = obj.dtypes.astype(str).value_counts().to_dict()
+        memoria = obj.memory_usage(deep=False).sum() / (1024 * 1024)
+        return f"DataFrame({linhas} linhas x {colunas} colunas, {memoria:.1f} MB, tipos={tipos})"
+
+    # Series
+    if hasattr(obj, 'dtype') and hasattr(obj, 'memory_usage') and hasattr(obj, 'shape'):
+        memoria = obj.memory_usage(deep=False) / (1024 * 1024)
+        return f"Series({obj.shape[0]} linhas, {obj.dtype}, {memoria:.1f} MB)"
+
+    # Engine do SQLAlchemy
+    if hasattr(obj, 'dialect') and hasattr(obj, 'url'):
+        return f"Engine({obj.url.render_as_string(hide_password=True)})"
+
+    if isinstance(obj, dict):
+        return '{' + ', '.join(f"{chave!r}: {resumir(valor)}" for chave, valor in obj.items()) + '}'
+
+    if isinstance(obj, (list, tuple, set)):
+        if len(obj) > 10:
+            return f"{type(obj).__name__}({len(obj)} itens)"
+        itens = ', '.join(resumir(item) for item in obj)
+        return f"({itens})" if isinstance(obj, tuple) else f"[{itens}]"
+
+    texto = repr(obj)
+    if len(texto) > TAMANHO_MAXIMO_REPR:
+        texto = texto[:TAMANHO_MAXIMO_REPR] + '...'
+    return texto
+
+
 def log_decorator(func):
+    """
+    Registra chamada, retorno e exceções da função decorada
+
+    Os argumentos e o retorno são resumidos (ver resumir) e só são montados se o nível
+    do log estiver habilitado. Cada chamada registra também, como campos estruturados
+    (extra do loguru), o tempo de execução e o pico de memória do processo.
+    """
     @wraps(func)
     def wrapper(*args, **kwargs):
-        logger.info(f"Chamando função '{func.__name__}' com args {args} e kwargs {kwargs}")
+        logger.opt(lazy=True).debug("Chamando função '{}' com args {} e kwargs {}",
+                                    lambda: func.__name__, lambda: resumir(args), lambda: resumir(kwargs))
+        pico_inicial = pico_memoria_mb()
+        inicio = time.perf_counter()
         try:
             result = func(*args, **kwargs)
-            logger.info(f"Função '{func.__name__}' retornou {result}")
-            return result
         except Exception as e:
             logger.exception(f"Exceção capturada em '{func.__name__}': {e}")
             raise  # Re-lança a exceção para não alterar o comportamento da função decorada
-    return wrapper
\ No newline at end of file
+
+        duracao = time.perf_counter() - inicio
+        pico_final = pico_memoria_mb()
+        logger.bind(
+            funcao=func.__name__,
+            duracao_s=round(duracao, 4),
+            pico_memoria_mb=pico_final,
+            aumento_pico_memoria_mb=None if pico_final is None else pico_final - pico_inicial
+        ).opt(lazy=True).info("Função '{}' retornou {} em {}s",
+                              lambda: func.__name__, lambda: resumir(result), lambda: f"{duracao:.3f}")
+        return result
+    return wrapper
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from functools import wraps
+from loguru import logger as log
+from log import pico_memoria_mb
+from config import CONFIG
+
+# Métricas das etapas da execução atual: nome da etapa -> contadores acumulados
+_etapas = {}
+_trava = threading.Lock()
+
+CONTADORES = ('chamadas', 'duracao_s', 'linhas_entrada', 'linhas_saida', 'bytes_lidos')
+
+
+def _somar(destino:dict, etapa:str, valores:dict):
+    """
+    Acumula os contadores de uma medição na etapa (o pico de memória fica com o maior valor)
+    """
+    atual = destino.setdefault(etapa, {contador: 0 for contador in CONTADORES} | {'pico_rss_mb': None})
+    for contador in CONTADORES:
+        atual[contador] += valores.get(contador) or 0
+    pico = valores.get('pico_rss_mb')
+    if pico is not None and (atual['pico_rss_mb'] is None or pico > atual['pico_rss_mb']):
+        atual['pico_rss_mb'] = pico
+
+
+def registrar(etapa:str, **valores):
+    """
+    Soma valores (chamadas, duracao_s, linhas_entrada, linhas_saida, bytes_lidos, pico_rss_mb) a uma etapa
+    """
+    with _trava:
+        _somar(_etapas, etapa, valores)
+
+
+@contextmanager
+def medir(etapa:str, linhas_entrada:int=None, bytes_lidos:int=None):
+    """
+    Mede o tempo de um trecho e registra na etapa, com o pico de memória do processo no final
+
+    O dicionário entregue pode receber linhas_saida (e corrigir linhas_entrada/bytes_lidos)
+    dentro do bloco:
+
+        with medir('extracao') as medicao:
+            df = ler(...)
+            medicao['linhas_saida'] = len(df)
+
+    O tempo acumulado em medicao['espera_s'] (ver descontar_espera) não entra na duração.
+    """
+    medicao = {'linhas_entrada': linhas_entrada, 'bytes_lidos': bytes_lidos}
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    finally:
+        medicao['duracao_s'] = time.perf_counter() - inicio - medicao.pop('espera_s', 0)
+        medicao.setdefault('chamadas', 1)
+        medicao['pico_rss_mb'] = pico_memoria_mb()
+        registrar(etapa, **medicao)
+
+
+def medir_blocos(etapa:str, blocos, bytes_lidos:int=None):
+    """
+    Repassa os blocos de um generator medindo só o tempo gasto para produzir cada um
+    (o tempo de quem consome os blocos não entra na etapa)
+    """
+    blocos = iter(blocos)
+    primeiro = True
+    while True:
+        with medir(etapa, bytes_lidos=bytes_lidos if primeiro else None) as medicao:
+            bloco = next(blocos, None)
+            medicao['linhas_saida'] = 0 if bloco is None else len(bloco)
+            # Uma chamada por arquivo, não por bloco
+            medicao['chamadas'] = 1 if primeiro else 0
+        if bloco is None:
+            return
+        primeiro = False
+        yield bloco
+
+
+def descontar_espera(blocos, medicao:dict):
+    """
+    Repassa os blocos acumulando em medicao['espera_s'] o tempo gasto esperando cada um,
+    para que a etapa que os consome (ex: carga) não conte o tempo das etapas anteriores
+    """
+    blocos = iter(blocos)
+    while True:
+        inicio = time.perf_counter()
+        try:
+            bloco = next(blocos)
+        except StopIteration:
+            return
+        finally:
+            medicao['espera_s'] = medicao.get('espera_s', 0) + time.perf_counter() - inicio
+        yield bloco
+
+
+@contextmanager
+def capturar():
+    """
+    Desvia as métricas registradas dentro do bloco para um dicionário separado
+    Usado nos processos filhos: as métricas de cada arquivo voltam junto com o resultado
+    e são somadas às do processo principal com incorporar().
+    """
+    global _etapas
+    with _trava:
+        anteriores, _etapas = _etapas, {}
+    capturadas = {}
+    try:
+        yield capturadas
+    finally:
+        with _trava:
+            capturadas.update(_etapas)
+            _etapas = anteriores
+
+
+def incorporar(etapas:dict):
+    """
+    Soma às métricas da execução as métricas capturadas em outro processo
+    """
+    with _trava:
+        for etapa, valores in (etapas or {}).items():
+            _somar(_etapas, etapa, valores)
+
+
+def reiniciar():
+    """
+    Descarta as métricas acumuladas (início de uma nova execução)
+    """
+    with _trava:
+        _etapas.clear()
+
+
+def resumo() -> dict:
+    """
+    Retorna as métricas acumuladas por etapa, com a vazão em linhas por segundo
+    """
+    with _trava:
+        etapas = {etapa: dict(valores) for etapa, valores in _etapas.items()}
+    for valores in etapas.values():
+        linhas = valores['linhas_saida'] or valores['linhas_entrada']
+        valores['linhas_por_s'] = round(linhas / valores['duracao_s'], 1) if valores['duracao_s'] else None
+        valores['duracao_s'] = round(valores['duracao_s'], 4)
+    return etapas
+
+
+def _gravar_json_lines(caminho:str, relatorio:dict):
+    """
+    Acrescenta o relatório da execução como uma linha JSON no arquivo
+    """
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    with open(caminho, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(json.dumps(relatorio, ensure_ascii=False, default=str) + '\n')
+
+
+def _gravar_prometheus(caminho:str, relatorio:dict):
+    """
+    Grava o relatório no formato texto do Prometheus (para o textfile collector do node_exporter)
+    O arquivo é escrito em um temporário e renomeado, para o coletor nunca ler um arquivo pela metade.
+    """
+    metricas = {
+        'sinesp_etl_etapa_duracao_segundos': ('gauge', 'Tempo somado da etapa na última execução', 'duracao_s'),
+        'sinesp_etl_etapa_chamadas': ('gauge', 'Chamadas da etapa na última execução', 'chamadas'),
+        'sinesp_etl_etapa_linhas_entrada': ('gauge', 'Linhas recebidas pela etapa', 'linhas_entrada'),
+        'sinesp_etl_etapa_linhas_saida': ('gauge', 'Linhas produzidas pela etapa', 'linhas_saida'),
+        'sinesp_etl_etapa_linhas_por_segundo': ('gauge', 'Vazão da etapa em linhas por segundo', 'linhas_por_s'),
+        'sinesp_etl_etapa_bytes_lidos': ('gauge', 'Bytes lidos ou baixados pela etapa', 'bytes_lidos'),
+        'sinesp_etl_etapa_pico_rss_megabytes': ('gauge', 'Pico de memória residente do processo ao fim da etapa', 'pico_rss_mb'),
+    }
+
+    linhas = []
+    for nome, (tipo, descricao, chave) in metricas.items():
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for etapa, valores in relatorio['etapas'].items():
+            if valores.get(chave) is not None:
+                linhas.append(f'{nome}{{etapa="{etapa}"}} {valores[chave]}')
+
+    linhas += [
+        "# HELP sinesp_etl_execucao_duracao_segundos Duração total da última execução",
+        "# TYPE sinesp_etl_execucao_duracao_segundos gauge",
+        f"sinesp_etl_execucao_duracao_segundos {relatorio['duracao_s']}",
+        "# HELP sinesp_etl_execucao_sucesso 1 se a última execução terminou com sucesso",
+        "# TYPE sinesp_etl_execucao_sucesso gauge",
+        f"sinesp_etl_execucao_sucesso {int(bool(relatorio['sucesso']))}",
+        "# HELP sinesp_etl_execucao_timestamp_segundos Horário (epoch) do fim da última execução",
+        "# TYPE sinesp_etl_execucao_timestamp_segundos gauge",
+        f"sinesp_etl_execucao_timestamp_segundos {relatorio['fim_epoch']}",
+    ]
+
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    caminho_temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(caminho_temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write('\n'.join(linhas) + '\n')
+    os.replace(caminho_temporario, caminho)
+
+
+def gravar_relatorio(relatorio:dict, arquivo_jsonl:str=None, arquivo_prometheus:str=None):
+    """
+    Grava o relatório da execução no arquivo JSON lines e, se configurado, no textfile do Prometheus
+    Falhas na gravação são só registradas no log, para não derrubar o ETL por causa das métricas.
+    """
+    for gravar, caminho in ((_gravar_json_lines, arquivo_jsonl), (_gravar_prometheus, arquivo_prometheus)):
+        if not caminho:
+            continue
+        try:
+            gravar(caminho, relatorio)
+        except Exception as e:
+            log.warning(f"Não foi possível gravar as métricas em {caminho}: {str(e)}")
+
+
+def relatorio_de_execucao(func):
+    """
+    Decorator que mede a execução inteira da função decorada (ex: executar_etl)
+
+    Zera as métricas no início e, no fim, monta o relatório com o tempo total, o resultado
+    e as métricas de cada etapa registradas durante a execução, gravando-o nos arquivos
+    configurados em CONFIG['arquivo_metricas'] e CONFIG['arquivo_prometheus'].
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        reiniciar()
+        inicio = datetime.now(timezone.utc)
+        inicio_contador = time.perf_counter()
+        resultado = None
+        try:
+            resultado = func(*args, **kwargs)
+            return resultado
+        finally:
+            fim = datetime.now(timezone.utc)
+            relatorio = {
+                'funcao': func.__name__,
+                'inicio': inicio.isoformat(),
+                'fim': fim.isoformat(),
+                'fim_epoch': round(fim.timestamp(), 3),
+                'duracao_s': round(time.perf_counter() - inicio_contador, 4),
+                'sucesso': bool(resultado),
+                'pico_rss_mb': pico_memoria_mb(),
+                'etapas': resumo(),
+            }
+            gravar_relatorio(relatorio, CONFIG['arquivo_metricas'], CONFIG['arquivo_prometheus'])
+            log.bind(relatorio=relatorio).info(
+                f"Métricas da execução: {relatorio['duracao_s']}s, etapas: "
+                + ', '.join(f"{etapa}={valores['duracao_s']}s" for etapa, valores in relatorio['etapas'].items())
+            )
+    return wrapper
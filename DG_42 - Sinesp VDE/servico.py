@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import random
+import signal
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from loguru import logger as log
+from config import CONFIG
+from banco import metricas_pool
+import etl
+from formatos import extensoes_dados
+
+# Estado do serviço, lido pelo endpoint de saúde
+_estado = {
+    'iniciado_em': None,
+    'modo': None,
+    'em_execucao': False,
+    'execucoes': 0,
+    'falhas_consecutivas': 0,
+    'ultima_execucao': None,
+    'ultimo_sucesso': None,
+    'ultimo_resultado': None,
+    'ultima_duracao_s': None,
+    'proxima_verificacao': None,
+}
+_trava_estado = threading.Lock()
+
+# Sinaliza o fim do serviço (SIGTERM/SIGINT): a execução em andamento termina antes de sair
+_parar = threading.Event()
+
+
+def _agora() -> str:
+    """
+    Horário atual (UTC) em ISO 8601, para o estado do serviço
+    """
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _atualizar_estado(**valores):
+    """
+    Atualiza o estado do serviço (chamado pela thread do ETL)
+    """
+    with _trava_estado:
+        _estado.update(valores)
+
+
+def estado_servico() -> dict:
+    """
+    Retorna uma cópia do estado do serviço, com a saúde calculada:
+    'falhando' depois de CONFIG['servico_falhas_para_alerta'] execuções seguidas com erro
+    """
+    with _trava_estado:
+        estado = dict(_estado)
+    estado['saudavel'] = estado['falhas_consecutivas'] < CONFIG['servico_falhas_para_alerta']
+    estado['status'] = 'ok' if estado['saudavel'] else 'falhando'
+    return estado
+
+
+class _ManipuladorSaude(BaseHTTPRequestHandler):
+    """
+    Endpoint local de saúde: GET /saude (ou /status) responde o estado do serviço em JSON,
+    com 200 quando saudável e 503 quando as últimas execuções falharam
+    """
+    engine = None
+
+    def do_GET(self):
+        if self.path.rstrip('/') not in ('/saude', '/status'):
+            self.send_error(404)
+            return
+
+        estado = estado_servico()
+        if self.engine is not None:
+            estado['pool_conexoes'] = metricas_pool(self.engine)
+        corpo = json.dumps(estado, ensure_ascii=False, default=str).encode('utf-8')
+
+        self.send_response(200 if estado['saudavel'] else 503)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        # Pedidos de saúde não vão para o log do ETL
+        pass
+
+
+def iniciar_endpoint_saude(host:str, porta:int, engine=None) -> ThreadingHTTPServer:
+    """
+    Sobe o endpoint de saúde em uma thread daemon
+    """
+    _ManipuladorSaude.engine = engine
+    servidor = ThreadingHTTPServer((host, porta), _ManipuladorSaude)
+    threading.Thread(target=servidor.serve_forever, name='endpoint-saude', daemon=True).start()
+    log.info(f"Endpoint de saúde em http://{host}:{servidor.server_port}/saude")
+    return servidor
+
+
+def _retrato_pasta(pasta:str) -> dict:
+    """
+    Tamanho e data de modificação de cada arquivo de dados da pasta, para detectar arquivos novos ou alterados
+    """
+    retrato = {}
+    extensoes = extensoes_dados()
+    try:
+        with os.scandir(pasta) as entradas:
+            for entrada in entradas:
+                if entrada.name.lower().endswith(extensoes) and entrada.is_file():
+                    informacoes = entrada.stat()
+                    retrato[entrada.name] = (informacoes.st_size, informacoes.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return retrato
+
+
+def _proxima_espera(intervalo_s:float, variacao:float) -> float:
+    """
+    Intervalo até a próxima verificação, com variação aleatória de ±variacao (fração do intervalo)
+    para que várias instâncias não consultem a página no mesmo instante
+    """
+    return max(1.0, intervalo_s * random.uniform(1 - variacao, 1 + variacao))
+
+
+def _executar(parametros:dict):
+    """
+    Uma execução incremental do ETL, registrando o resultado no estado do serviço
+    
+    Returns:
+        bool: True se a execução terminou com sucesso
+    """
+    _atualizar_estado(em_execucao=True, ultima_execucao=_agora())
+    inicio = time.perf_counter()
+    try:
+        sucesso = etl.executar_etl(**parametros)
+    except Exception as e:
+        log.exception(f"Erro não tratado na execução do ETL: {str(e)}")
+        sucesso = False
+
+    with _trava_estado:
+        _estado['em_execucao'] = False
+        _estado['execucoes'] += 1
+        _estado['ultimo_resultado'] = 'sucesso' if sucesso else 'falha'
+        _estado['ultima_duracao_s'] = round(time.perf_counter() - inicio, 3)
+        if sucesso:
+            _estado['falhas_consecutivas'] = 0
+            _estado['ultimo_sucesso'] = _estado['ultima_execucao']
+        else:
+            _estado['falhas_consecutivas'] += 1
+    return sucesso
+
+
+def executar_servico(parametros:dict, modo:str=None, intervalo_s:float=None, variacao:float=None,
+                     host:str=None, porta:int=None):
+    """
+    Mantém o ETL em execução contínua, reaproveitando a engine (pool de conexões) e a sessão HTTP
+
+    Modos:
+    - 'pagina': a cada intervalo (com variação aleatória) roda o executar_etl, que revalida a
+      página do Sinesp VDE com pedidos condicionais e processa só os arquivos novos ou alterados;
+    - 'pasta': não consulta a página; a cada intervalo compara tamanho e data de modificação dos
+      arquivos de dados (xlsx, ods, csv, parquet) de pasta_dados e roda o ETL quando algum
+      arquivo aparece ou muda (e para de mudar, para não ler um arquivo ainda sendo copiado).
+    Os valores não informados vêm do CONFIG (servico_*).
+    """
+    modo = modo or CONFIG['servico_modo']
+    intervalo_s = intervalo_s or CONFIG['servico_intervalo_s']
+    variacao = CONFIG['servico_variacao'] if variacao is None else variacao
+    host = host or CONFIG['servico_host']
+    porta = CONFIG['servico_porta'] if porta is None else porta
+    if modo not in ('pagina', 'pasta'):
+        raise ValueError(f"Modo de serviço inválido: {modo} (use 'pagina' ou 'pasta')")
+
+    parametros = dict(parametros)
+    if modo == 'pasta':
+        parametros['url_base'] = None
+
+    # Engine e sessão HTTP criadas uma vez e usadas por todas as execuções
+    engine = etl.criar_conexao_bd(parametros['tipo_bd'], parametros['usuario'], parametros['senha'],
+                                  parametros['host'], parametros['porta'], parametros['nome_bd'])
+    sessao_http = etl.criar_sessao_http(parametros['downloads_simultaneos'])
+    parametros['sessao_http'] = sessao_http
+
+    for sinal in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sinal, lambda numero, quadro: _parar.set())
+
+    _atualizar_estado(iniciado_em=_agora(), modo=modo)
+    servidor = iniciar_endpoint_saude(host, porta, engine)
+    log.info(f"Serviço do ETL iniciado no modo '{modo}', verificando a cada ~{intervalo_s}s")
+
+    retrato_anterior = None  # modo 'pasta': arquivos da pasta na última execução
+    try:
+        while not _parar.is_set():
+            if modo == 'pagina':
+                _executar(parametros)
+            else:
+                retrato = _retrato_pasta(parametros['pasta_dados'])
+                if retrato != retrato_anterior:
+                    # Na primeira volta processa o que estiver pendente; depois espera a pasta
+                    # parar de mudar, para não ler um arquivo ainda sendo copiado
+                    if retrato_anterior is not None:
+                        _parar.wait(min(5.0, intervalo_s))
+                    if retrato_anterior is None or _retrato_pasta(parametros['pasta_dados']) == retrato:
+                        log.info("Verificando arquivos novos ou alterados em pasta_dados")
+                        # Com falha, o retrato não é atualizado e a próxima volta tenta de novo
+                        if _executar(parametros):
+                            retrato_anterior = _retrato_pasta(parametros['pasta_dados'])
+
+            espera = _proxima_espera(intervalo_s, variacao)
+            _atualizar_estado(proxima_verificacao=datetime.fromtimestamp(time.time() + espera, timezone.utc).isoformat())
+            _parar.wait(espera)
+    finally:
+        log.info("Encerrando o serviço do ETL")
+        servidor.shutdown()
+        sessao_http.close()
+        if engine is not None:
+            engine.dispose()
+
+    return estado_servico()['saudavel']
@@ -0,0 +1,177 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from etl import _atualizar_arquivo, _baixar_arquivo, criar_sessao_http
+
+# Testes do download condicional e da retomada com Range/If-Range contra um servidor HTTP local
+# Executar com: python -m pytest test_downloads.py (ou python -m unittest test_downloads)
+
+NOME_ARQUIVO = 'bancovde-2020.csv'
+CONTEUDO = ('uf;municipio;evento;data_referencia;total_vitima\n'
+            + 'SP;São Paulo;Homicídio doloso;2020-01-01;1\n' * 2000).encode('latin-1')
+ETAG = '"versao-1"'
+LAST_MODIFIED = 'Wed, 01 Jan 2020 00:00:00 GMT'
+
+
+class _ServidorArquivo(BaseHTTPRequestHandler):
+    """
+    Publica CONTEUDO com ETag e Last-Modified, respondendo a If-None-Match, Range e If-Range
+    Os headers de cada pedido ficam em `pedidos`; `cortar_em` encerra a próxima resposta no meio.
+    """
+    protocol_version = 'HTTP/1.1'
+    pedidos = []
+    cortar_em = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.pedidos.append(dict(self.headers))
+
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            return
+
+        inicio, status = 0, 200
+        intervalo = self.headers.get('Range')
+        if intervalo and self.headers.get('If-Range') in (ETAG, LAST_MODIFIED):
+            inicio = int(intervalo.split('=')[1].split('-')[0])
+            if inicio >= len(CONTEUDO):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(CONTEUDO)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        parte = CONTEUDO[inicio:]
+        self.send_response(status)
+        self.send_header('ETag', ETAG)
+        self.send_header('Last-Modified', LAST_MODIFIED)
+        self.send_header('Content-Length', str(len(parte)))
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {inicio}-{len(CONTEUDO) - 1}/{len(CONTEUDO)}")
+        self.end_headers()
+
+        if self.cortar_em is not None:
+            self.wfile.write(parte[:self.cortar_em])
+            type(self).cortar_em = None
+            self.close_connection = True
+            return
+        self.wfile.write(parte)
+
+
+class TestDownloads(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ServidorArquivo)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.servidor.server_port}/{NOME_ARQUIVO}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def setUp(self):
+        _ServidorArquivo.pedidos = []
+        _ServidorArquivo.cortar_em = None
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, NOME_ARQUIVO)
+        self.sessao = criar_sessao_http(1)
+
+    def tearDown(self):
+        self.sessao.close()
+        self.pasta.cleanup()
+
+    def _gravar(self, caminho, conteudo):
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(conteudo)
+
+    def _ler(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            return arquivo.read()
+
+    def test_304_mantem_arquivo_local(self):
+        self._gravar(self.caminho, CONTEUDO)
+        entrada = {'url': self.url, 'etag': ETAG, 'last_modified': LAST_MODIFIED, 'sha256': 'anterior'}
+
+        resultado = _atualizar_arquivo(self.sessao, self.url, self.pasta.name, NOME_ARQUIVO, entrada)
+
+        self.assertFalse(resultado['modificado'])
+        self.assertEqual(resultado['sha256'], 'anterior')
+        self.assertEqual(_ServidorArquivo.pedidos[0]['If-None-Match'], ETAG)
+
+    def test_206_retoma_part_com_if_range(self):
+        self._gravar(self.caminho + '.part', CONTEUDO[:1000])
+        entrada = {'parcial': {'etag': ETAG, 'last_modified': LAST_MODIFIED}}
+
+        resultado = _baixar_arquivo(self.sessao, self.url, self.pasta.name, NOME_ARQUIVO, entrada)
+
+        self.assertTrue(resultado['modificado'])
+        self.assertEqual(self._ler(self.caminho), CONTEUDO)
+        self.assertNotIn('parcial', resultado)
+        self.assertEqual(resultado['etag'], ETAG)
+        self.assertEqual(_ServidorArquivo.pedidos[0]['Range'], 'bytes=1000-')
+        self.assertEqual(_ServidorArquivo.pedidos[0]['If-Range'], ETAG)
+
+    def test_200_quando_if_range_nao_confere(self):
+        self._gravar(self.caminho + '.part', b'conteudo de outra versao')
+        entrada = {'parcial': {'etag': '"versao-0"', 'last_modified': None}}
+
+        resultado = _baixar_arquivo(self.sessao, self.url, self.pasta.name, NOME_ARQUIVO, entrada)
+
+        self.assertTrue(resultado['modificado'])
+        self.assertEqual(self._ler(self.caminho), CONTEUDO)
+        self.assertEqual(resultado['etag'], ETAG)
+        self.assertEqual(_ServidorArquivo.pedidos[0]['If-Range'], '"versao-0"')
+
+    def test_416_conclui_part_completo(self):
+        self._gravar(self.caminho + '.part', CONTEUDO)
+        entrada = {'parcial': {'etag': ETAG, 'last_modified': LAST_MODIFIED}}
+
+        resultado = _baixar_arquivo(self.sessao, self.url, self.pasta.name, NOME_ARQUIVO, entrada)
+
+        self.assertEqual(self._ler(self.caminho), CONTEUDO)
+        self.assertFalse(os.path.exists(self.caminho + '.part'))
+        self.assertEqual(resultado['etag'], ETAG)
+        self.assertEqual(resultado['last_modified'], LAST_MODIFIED)
+
+    def test_part_sem_validador_recomeca_do_inicio(self):
+        self._gravar(self.caminho + '.part', b'conteudo de origem desconhecida')
+
+        resultado = _baixar_arquivo(self.sessao, self.url, self.pasta.name, NOME_ARQUIVO)
+
+        self.assertEqual(self._ler(self.caminho), CONTEUDO)
+        self.assertTrue(resultado['modificado'])
+        self.assertNotIn('Range', _ServidorArquivo.pedidos[0])
+
+    def test_falha_guarda_validadores_do_part(self):
+        _ServidorArquivo.cortar_em = 10000
+
+        resultado = _baixar_arquivo(self.sessao, self.url, self.pasta.name, NOME_ARQUIVO,
+                                    max_tentativas=1, tamanho_buffer=1024)
+
+        # Só os chunks lidos por inteiro antes do corte ficam no .part
+        tamanho_parcial = os.path.getsize(self.caminho + '.part')
+        self.assertFalse(resultado['modificado'])
+        self.assertEqual(resultado['parcial'], {'etag': ETAG, 'last_modified': LAST_MODIFIED})
+        self.assertTrue(0 < tamanho_parcial <= 10000)
+
+        # Próxima execução: retoma o .part com o validador guardado no manifesto
+        resultado.pop('modificado')
+        resultado = _baixar_arquivo(self.sessao, self.url, self.pasta.name, NOME_ARQUIVO, resultado)
+
+        self.assertEqual(self._ler(self.caminho), CONTEUDO)
+        self.assertEqual(_ServidorArquivo.pedidos[-1]['Range'], f"bytes={tamanho_parcial}-")
+        self.assertEqual(_ServidorArquivo.pedidos[-1]['If-Range'], ETAG)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from cache import calcular_hash_arquivo
+from esquema import COLUNAS_OBRIGATORIAS, mapear_cabecalho, ano_do_arquivo
+
+
+def _nome_local(tag:str) -> str:
+    """
+    Remove o namespace de uma tag XML ('{ns}row' -> 'row'), para aceitar OOXML normal e strict
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def _caminho_primeira_planilha(zip_xlsx:zipfile.ZipFile) -> str:
+    """
+    Descobre o caminho do XML da primeira planilha pelo workbook.xml e suas relações
+    """
+    padrao = 'xl/worksheets/sheet1.xml'
+    try:
+        workbook = ET.fromstring(zip_xlsx.read('xl/workbook.xml'))
+        primeira = next(el for el in workbook.iter() if _nome_local(el.tag) == 'sheet')
+        id_relacao = next(valor for chave, valor in primeira.attrib.items() if _nome_local(chave) == 'id')
+
+        relacoes = ET.fromstring(zip_xlsx.read('xl/_rels/workbook.xml.rels'))
+        destino = next(el.get('Target') for el in relacoes.iter()
+                       if _nome_local(el.tag) == 'Relationship' and el.get('Id') == id_relacao)
+    except (KeyError, StopIteration):
+        return padrao
+
+    # O destino pode ser absoluto ('/xl/worksheets/sheet1.xml') ou relativo a xl/
+    if destino.startswith('/'):
+        return destino.lstrip('/')
+    return posixpath.normpath(posixpath.join('xl', destino))
+
+
+def _ler_primeira_linha(zip_xlsx:zipfile.ZipFile, caminho_planilha:str):
+    """
+    Lê apenas a primeira linha da planilha, parando o parse do XML assim que ela termina
+
+    Returns:
+        tuple: (células do cabeçalho como (tipo, valor), se existe uma segunda linha)
+    """
+    celulas = []
+    tipo = None
+    valor = None
+    no_cabecalho = False
+    lido_cabecalho = False
+
+    with zip_xlsx.open(caminho_planilha) as xml:
+        for evento, elemento in ET.iterparse(xml, events=('start', 'end')):
+            nome = _nome_local(elemento.tag)
+
+            if evento == 'start':
+                if nome == 'row':
+                    if lido_cabecalho:
+                        # Existe pelo menos uma linha de dados depois do cabeçalho
+                        return celulas, True
+                    no_cabecalho = True
+                elif nome == 'c' and no_cabecalho:
+                    tipo = elemento.get('t')
+                    valor = None
+                continue
+
+            if not no_cabecalho:
+                continue
+            if nome in ('v', 't'):
+                valor = (valor or '') + (elemento.text or '')
+            elif nome == 'c':
+                celulas.append((tipo, valor))
+                elemento.clear()
+            elif nome == 'row':
+                no_cabecalho = False
+                lido_cabecalho = True
+
+    return celulas, False
+
+
+def _textos_compartilhados(zip_xlsx:zipfile.ZipFile, indices:set) -> dict:
+    """
+    Lê do sharedStrings.xml apenas os textos até o maior índice usado no cabeçalho
+    """
+    textos = {}
+    if not indices:
+        return textos
+
+    maior_indice = max(indices)
+    indice = 0
+    partes = []
+
+    with zip_xlsx.open('xl/sharedStrings.xml') as xml:
+        for evento, elemento in ET.iterparse(xml, events=('end',)):
+            nome = _nome_local(elemento.tag)
+            if nome == 't':
+                partes.append(elemento.text or '')
+            elif nome == 'si':
+                if indice in indices:
+                    textos[indice] = ''.join(partes)
+                partes = []
+                elemento.clear()
+                indice += 1
+                if indice > maior_indice:
+                    break
+
+    return textos
+
+
+def ler_cabecalho_xlsx(caminho:str) -> list:
+    """
+    Lê o cabeçalho da primeira planilha de um xlsx sem carregar o arquivo
+    Abre o ZIP (diretório central), localiza a planilha e lê só os bytes da primeira linha
+
+    Returns:
+        list: Nomes das colunas, na ordem da planilha
+
+    Raises:
+        ValueError: Se o arquivo não for um xlsx válido ou não tiver linhas de dados
+    """
+    try:
+        zip_xlsx = zipfile.ZipFile(caminho)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Arquivo não é um ZIP válido (download incompleto?): {str(e)}")
+
+    with zip_xlsx:
+        nomes = set(zip_xlsx.namelist())
+        if 'xl/workbook.xml' not in nomes:
+            raise ValueError("Arquivo ZIP sem xl/workbook.xml: não é uma planilha xlsx")
+
+        caminho_planilha = _caminho_primeira_planilha(zip_xlsx)
+        if caminho_planilha not in nomes:
+            raise ValueError(f"Planilha {caminho_planilha} não encontrada no arquivo")
+
+        try:
+            celulas, tem_dados = _ler_primeira_linha(zip_xlsx, caminho_planilha)
+            if not celulas:
+                raise ValueError("Planilha sem cabeçalho")
+            if not tem_dados:
+                raise ValueError("Planilha sem linhas de dados")
+
+            # Células do tipo 's' guardam o índice do texto no sharedStrings.xml
+            indices = {int(valor) for tipo, valor in celulas if tipo == 's' and valor is not None}
+            textos = _textos_compartilhados(zip_xlsx, indices)
+        except (ET.ParseError, zipfile.BadZipFile, EOFError, KeyError) as e:
+            raise ValueError(f"Conteúdo da planilha corrompido: {str(e)}")
+
+    return [textos.get(int(valor)) if tipo == 's' and valor is not None else valor for tipo, valor in celulas]
+
+
+def validar_xlsx(caminho:str, colunas_obrigatorias=COLUNAS_OBRIGATORIAS, sha256_esperado:str=None) -> list:
+    """
+    Validação rápida de uma planilha do Sinesp VDE baixada
+    Verifica a estrutura do ZIP, a presença da planilha e as colunas do cabeçalho (pelos nomes
+    canônicos do registro do esquema), e opcionalmente o sha256 publicado para o arquivo
+
+    Returns:
+        list: Nomes das colunas do cabeçalho
+
+    Raises:
+        ValueError: Se alguma das verificações falhar
+    """
+    if sha256_esperado:
+        sha256 = calcular_hash_arquivo(caminho)
+        if sha256.lower() != sha256_esperado.lower():
+            raise ValueError(f"sha256 do arquivo ({sha256}) diferente do publicado ({sha256_esperado})")
+
+    cabecalho = ler_cabecalho_xlsx(caminho)
+
+    colunas = set(mapear_cabecalho(cabecalho, ano_do_arquivo(caminho))[1])
+    faltantes = [coluna for coluna in colunas_obrigatorias if coluna not in colunas]
+    if faltantes:
+        raise ValueError(f"Colunas esperadas não encontradas no cabeçalho: {', '.join(faltantes)}")
+
+    return cabecalho
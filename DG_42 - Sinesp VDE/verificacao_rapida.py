@@ -0,0 +1,273 @@
+import os
+import re
+import json
+import hashlib
+import urllib.request
+import urllib.error
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger as log
+from formatos import extensoes_dados, padrao_nome_bancovde
+
+# Verificação de "nada novo para carregar" feita antes de importar pandas, SQLAlchemy e requests
+# Usa apenas a biblioteca padrão (e o psycopg2 para ler a tabela de controle). Em qualquer dúvida
+# (página fora do ar, arquivo sem manifesto, banco inacessível...) responde que há dados novos,
+# e a decisão fica com o ETL completo.
+
+# Mesmos nomes usados pelo etl.py e pelo banco.py
+ARQUIVO_MANIFESTO = 'manifesto_downloads.json'
+TABELA_CONTROLE = 'arquivos_processados'
+
+# Headers para simular um navegador
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet, application/vnd.oasis.opendocument.spreadsheet, text/csv, application/octet-stream',
+    'Accept-Encoding': 'identity',
+}
+
+PADRAO_CARACTERES_INVALIDOS = re.compile(r'[^\w\-\. ]')
+
+
+class _ColetorLinks(HTMLParser):
+    """
+    Coleta o href de todas as tags <a> da página
+    """
+    def __init__(self):
+        super().__init__()
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href is not None:
+                self.hrefs.append(href)
+
+
+def arquivo_de_dados(nome:str) -> bool:
+    """
+    Indica se o nome (ou trecho de link) tem uma das extensões de dados registradas (ver formatos.py)
+    """
+    nome = nome.lower()
+    return any(extensao in nome for extensao in extensoes_dados())
+
+
+def listar_links_dados(html:str) -> list:
+    """
+    Retorna os links dos arquivos de dados do Sinesp VDE (xlsx, ods, csv, parquet ou
+    outro formato registrado) encontrados no HTML da página
+    """
+    coletor = _ColetorLinks()
+    coletor.feed(html)
+
+    links_dados = []
+    for href in coletor.hrefs:
+        # Verificar se é um link para arquivo do banco VDE
+        if 'bancovde-' in href.lower() and arquivo_de_dados(href):
+            links_dados.append(href)
+        # Verificar também os links com download/file
+        elif '/download/file' in href and arquivo_de_dados(href):
+            links_dados.append(href)
+    return links_dados
+
+
+def nome_arquivo_do_link(link:str, indice:int=0) -> str:
+    """
+    Extrai do link o nome com que o arquivo é gravado na pasta de dados
+    O índice só é usado para montar um nome quando o link não tem nenhum.
+    """
+    if "bancovde-" in link.lower():
+        # Formato: https://.../bancovde-2025.xlsx/...
+        match = padrao_nome_bancovde().search(link.lower())
+        if match:
+            nome_arquivo = match.group(0)
+        else:
+            # Extrair nome usando o padrão final do link
+            parts = link.split('/')
+            nome_arquivo = next((p for p in parts if arquivo_de_dados(p)), f"bancovde_{indice}.xlsx")
+    else:
+        # Último recurso: obter parte final do URL e remover parâmetros
+        parts = link.split('/')
+        nome_arquivo = next((p for p in reversed(parts) if p and arquivo_de_dados(p)), f"arquivo_{indice}.xlsx")
+        nome_arquivo = nome_arquivo.split('?')[0]
+
+    # Verificar se usamos @@download/file no final
+    if '@@download/file' in nome_arquivo:
+        nome_arquivo = nome_arquivo.replace('@@download/file', '')
+
+    # Limpar o nome do arquivo de caracteres inválidos
+    return PADRAO_CARACTERES_INVALIDOS.sub('_', nome_arquivo)
+
+
+def _carregar_manifesto(pasta_dados:str) -> dict:
+    """
+    Lê o manifesto de downloads (vazio se não existir ou estiver inválido)
+    """
+    try:
+        with open(os.path.join(pasta_dados, ARQUIVO_MANIFESTO), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+
+
+def calcular_hash_arquivo(caminho:str, tamanho_buffer:int=1024 * 1024) -> str:
+    """
+    Calcula o sha256 do conteúdo do arquivo, lendo em blocos para não carregar tudo na memória
+    """
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_buffer), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def assinatura_arquivo(caminho:str) -> dict:
+    """
+    Tamanho e data de modificação do arquivo, guardados no manifesto junto do sha256
+    """
+    informacoes = os.stat(caminho)
+    return {'tamanho': informacoes.st_size, 'modificado_em_ns': informacoes.st_mtime_ns}
+
+
+def hash_arquivo_local(pasta_dados:str, nome:str, entrada:dict=None) -> str:
+    """
+    sha256 do arquivo como está na pasta agora
+
+    O sha256 do manifesto só é usado se o tamanho e a data de modificação do arquivo forem os
+    registrados com ele. Um arquivo trocado na pasta sem passar pelo download (ex: modo serviço
+    'pasta'), ou com entrada antiga no manifesto (sem a data), é lido de novo para calcular o hash.
+    """
+    caminho = os.path.join(pasta_dados, nome)
+    if entrada and entrada.get('sha256'):
+        try:
+            assinatura = assinatura_arquivo(caminho)
+        except OSError:
+            return None
+        if all(entrada.get(chave) == valor for chave, valor in assinatura.items()):
+            return entrada['sha256']
+    return calcular_hash_arquivo(caminho)
+
+
+def _arquivo_inalterado(url:str, entrada:dict, timeout:int=30) -> bool:
+    """
+    Pedido condicional (If-None-Match/If-Modified-Since) para o arquivo: True só com um 304
+    Entradas sem validadores são conferidas com um HEAD: True só se o Content-Length publicado
+    for o tamanho registrado no manifesto.
+    """
+    headers = dict(HEADERS)
+    if entrada.get('etag'):
+        headers['If-None-Match'] = entrada['etag']
+    if entrada.get('last_modified'):
+        headers['If-Modified-Since'] = entrada['last_modified']
+    if len(headers) == len(HEADERS):
+        return _mesmo_tamanho_publicado(url, entrada, timeout)
+
+    try:
+        # Qualquer resposta que não seja 304 traz o arquivo: fechada sem ler o conteúdo
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout):
+            return False
+    except urllib.error.HTTPError as e:
+        return e.code == 304
+    except Exception as e:
+        log.debug(f"Falha ao revalidar {url}: {str(e)}")
+        return False
+
+
+def _mesmo_tamanho_publicado(url:str, entrada:dict, timeout:int=30) -> bool:
+    """
+    HEAD para o arquivo: True se o Content-Length publicado for o tamanho registrado no manifesto
+    """
+    if entrada.get('tamanho') is None:
+        return False
+
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=HEADERS, method='HEAD'),
+                                    timeout=timeout) as resposta:
+            tamanho_publicado = resposta.headers.get('Content-Length')
+        return tamanho_publicado is not None and int(tamanho_publicado) == entrada['tamanho']
+    except Exception as e:
+        log.debug(f"Falha ao verificar {url} com HEAD: {str(e)}")
+        return False
+
+
+def _arquivos_carregados(usuario, senha, host, porta, nome_bd) -> dict:
+    """
+    Lê da tabela de controle os arquivos carregados com sucesso e o hash de cada um
+
+    Returns:
+        dict: {nome do arquivo: hash}, ou None se o banco ou a tabela não estiverem acessíveis
+    """
+    try:
+        import psycopg2
+        with psycopg2.connect(host=host, port=porta, user=usuario, password=senha, dbname=nome_bd,
+                              connect_timeout=10) as conexao:
+            with conexao.cursor() as cursor:
+                cursor.execute(f"SELECT nome_arquivo, hash_arquivo FROM public.{TABELA_CONTROLE} "
+                               f"WHERE status = 'carregado'")
+                carregados = dict(cursor.fetchall())
+        conexao.close()
+        return carregados
+    except Exception as e:
+        log.debug(f"Tabela de controle indisponível para a verificação rápida: {str(e)}")
+        return None
+
+
+def ha_dados_novos(pasta_dados:str, url_base:str, usuario, senha, host, porta, nome_bd,
+                   downloads_simultaneos:int=4) -> bool:
+    """
+    Indica se o ETL completo precisa rodar
+
+    Responde False (nada a fazer) somente quando, como o executar_etl concluiria:
+    - todo arquivo listado na página já existe na pasta, tem entrada no manifesto e o
+      servidor responde 304 ao pedido condicional (nenhum download seria feito);
+    - todo arquivo de dados da pasta está na tabela de controle com status 'carregado' e com o
+      sha256 do conteúdo atual (ver hash_arquivo_local).
+    """
+    if not os.path.isdir(pasta_dados):
+        return True
+    arquivos_locais = [nome for nome in os.listdir(pasta_dados) if nome.lower().endswith(extensoes_dados())]
+    if not arquivos_locais:
+        return True
+
+    manifesto = _carregar_manifesto(pasta_dados)
+
+    if url_base:
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url_base, headers=HEADERS), timeout=30) as resposta:
+                html = resposta.read().decode(resposta.headers.get_content_charset() or 'utf-8', errors='replace')
+        except Exception as e:
+            log.info(f"Verificação rápida: não foi possível acessar a página ({str(e)})")
+            return True
+
+        links = {}
+        for indice, link in enumerate(listar_links_dados(html)):
+            links[nome_arquivo_do_link(link, indice)] = link if link.startswith('http') else urljoin(url_base, link)
+
+        novos = [nome for nome in links if nome not in arquivos_locais or nome not in manifesto]
+        if novos:
+            log.info(f"Verificação rápida: arquivos novos na página: {', '.join(novos)}")
+            return True
+
+        with ThreadPoolExecutor(max_workers=max(1, downloads_simultaneos)) as executor:
+            inalterados = executor.map(lambda nome: _arquivo_inalterado(links[nome], manifesto[nome]), links)
+            atualizados = [nome for nome, inalterado in zip(links, inalterados) if not inalterado]
+        if atualizados:
+            log.info(f"Verificação rápida: arquivos atualizados na página: {', '.join(atualizados)}")
+            return True
+
+    carregados = _arquivos_carregados(usuario, senha, host, porta, nome_bd)
+    if carregados is None:
+        return True
+
+    for nome in arquivos_locais:
+        if nome not in carregados:
+            log.info(f"Verificação rápida: {nome} ainda não foi carregado")
+            return True
+        if not carregados[nome]:
+            continue
+        hash_atual = hash_arquivo_local(pasta_dados, nome, manifesto.get(nome))
+        if hash_atual and hash_atual != carregados[nome]:
+            log.info(f"Verificação rápida: o conteúdo de {nome} mudou desde a carga")
+            return True
+
+    return False